@@ -1,15 +1,44 @@
+import os
+import threading
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.routes.admin import router as admin_router
+from api.routes.bulk import router as bulk_router
+from api.routes.comps import router as comps_router
+from api.routes.drift import router as drift_router
 from api.routes.health import router as health_router
+from api.routes.metrics import router as metrics_router
+from api.routes.parcels import router as parcels_router
+from api.routes.portfolio import router as portfolio_router
 from api.routes.predict import router as predict_router
+from api.services.admission import AdmissionController, AdmissionMiddleware
 from api.services.assess_table import AssessTable
+from api.services.assessment_history import AssessmentHistory
+from api.services.audit_log import AuditLog
+from api.services.bulk_scoring import BulkJobRegistry
+from api.services.comps import COMP_FEATURES, CompsIndex
+from api.services.deadline import DeadlinePolicy
+from api.services.drift_monitor import DriftMonitor
+from api.services.incremental import SessionRegistry
+from api.services.inference_config import InferenceLayout
 from api.services.model_store import ModelStore
+from api.services.profiler import AllocationTracker, SamplingProfiler
+from api.services.shadow import ShadowScorer
+from api.services.sharded_table import ShardedAssessTable
+from api.services.table_deltas import DeltaLog, TableSync
+from api.utils.geo_guard import load_boundary
 
 app = FastAPI(title="IREA V3 API", version="0.1.0")
 
+# added before CORS so that 429/503 rejections still carry CORS headers
+app.add_middleware(
+    AdmissionMiddleware,
+    paths=("/api/predict",),
+    client_header=os.getenv("IREA_CLIENT_HEADER", ""),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -22,31 +51,197 @@ app.add_middleware(
 )
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(predict_router, prefix="/api")
+app.include_router(comps_router, prefix="/api")
+app.include_router(bulk_router, prefix="/api")
+app.include_router(drift_router, prefix="/api")
+app.include_router(parcels_router, prefix="/api")
+app.include_router(portfolio_router, prefix="/api")
+app.include_router(admin_router, prefix="/admin")
+
+# admin diagnostics live outside _startup so they exist before models load
+app.state.profiler = SamplingProfiler()
+app.state.alloc_tracker = AllocationTracker()
+app.state.admission = AdmissionController.from_env()
 
 
 @app.on_event("startup")
 def _startup():
     root = Path(__file__).resolve().parent
 
+    # 0) city boundary for the geo guard (falls back to the bbox)
+    boundary_path = os.getenv(
+        "IREA_BOUNDARY_GEOJSON", str(root / "models" / "boston_boundary.geojson")
+    )
+    boundary = load_boundary(boundary_path)
+    if boundary is not None:
+        print(
+            f"[INFO] Boston boundary loaded: {boundary_path} | edges={boundary.n_edges}"
+        )
+    else:
+        print(f"[WARN] Boston boundary not found, using bbox only: {boundary_path}")
+
     # 1) load models
     store = ModelStore(
         baseline_path=str(root / "models" / "baseline_lgb.txt"),
         residual_path=str(root / "models" / "residual_lgb.txt"),
+        layout=InferenceLayout.from_env(),
     )
     app.state.model_store = store
+    app.state.bulk_jobs = BulkJobRegistry()
     print("[INFO] ModelStore loaded")
+    print(f"[INFO] Inference threads: {store.layout.describe()}")
+
+    # per-request latency budgets for /api/predict (X-Deadline-Ms or default)
+    app.state.deadlines = DeadlinePolicy.from_env()
+
+    # editing sessions; tree indexes are compiled off the startup path
+    app.state.sessions = SessionRegistry(
+        store,
+        max_sessions=int(os.getenv("IREA_SESSION_MAX", "10000")),
+        ttl_s=float(os.getenv("IREA_SESSION_TTL_S", "1800")),
+    )
+    threading.Thread(
+        target=app.state.sessions.indexes, name="irea-tree-index", daemon=True
+    ).start()
+
+    cand_b = os.getenv("IREA_SHADOW_BASELINE")
+    cand_r = os.getenv("IREA_SHADOW_RESIDUAL")
+    app.state.shadow = None
+    if cand_b and cand_r:
+        store.load_candidate(cand_b, cand_r)
+        admission = app.state.admission
+        app.state.shadow = ShadowScorer(
+            store,
+            sample_rate=float(os.getenv("IREA_SHADOW_SAMPLE", "0.1")),
+            queue_size=int(os.getenv("IREA_SHADOW_QUEUE", "1000")),
+            # production has requests waiting: skip the sample
+            busy=lambda: admission.waiting > 0,
+        )
+        print(f"[INFO] Shadow scoring candidate: {cand_b} + {cand_r}")
+
+    drift_ref = root / "models" / "drift_reference.json"
+    app.state.drift_monitor = DriftMonitor.load(str(drift_ref))
+    if app.state.drift_monitor.reference is None:
+        print(f"[WARN] Drift reference not found, PSI/KS disabled: {drift_ref}")
+
+    app.state.audit_log = AuditLog.from_env(str(root.parent / "logs" / "audit"))
+    if app.state.audit_log is not None:
+        print(f"[INFO] Audit log: {app.state.audit_log.directory}")
 
     # 2) load assess master table (final_table_12.csv)
     need_cols = set(["PID", "LATITUDE", "LONGITUDE"])
     need_cols.update(store.baseline_features)
     need_cols.update(store.residual_features)
+    need_cols.update(COMP_FEATURES)
 
     need_cols.discard("sale_year")
     need_cols.discard("sale_month")
 
+    manifest_path = Path(
+        os.getenv(
+            "IREA_ASSESS_MANIFEST",
+            str(root / "models" / "assess_shards" / "manifest.json"),
+        )
+    )
     csv_path = root / "models" / "final_table_12.csv"
-    app.state.assess_table = AssessTable.load(str(csv_path), usecols=sorted(need_cols))
-    print(
-        f"[INFO] AssessTable loaded: {csv_path} | rows={len(app.state.assess_table.df)}"
+    if manifest_path.exists():
+        # region shards load lazily; startup only reads the manifest
+        app.state.assess_table = ShardedAssessTable.load(
+            str(manifest_path),
+            usecols=sorted(need_cols),
+            memory_budget_mb=float(os.getenv("IREA_SHARD_BUDGET_MB", "512")),
+        )
+        print(
+            f"[INFO] ShardedAssessTable manifest loaded: {manifest_path} | "
+            f"shards={len(app.state.assess_table.shards)} "
+            f"rows={len(app.state.assess_table)}"
+        )
+    else:
+        app.state.assess_table = AssessTable.load(
+            str(csv_path), usecols=sorted(need_cols)
+        )
+        print(
+            f"[INFO] AssessTable loaded: {csv_path} | rows={len(app.state.assess_table)}"
+        )
+
+    # model inputs absent from the table (e.g. NB_* neighbourhood columns
+    # before build_neighbourhood_features.py has run) would be scored as NaN
+    table_cols = getattr(app.state.assess_table, "cols", None) or getattr(
+        app.state.assess_table, "usecols", None
+    )
+    if table_cols is not None:
+        missing = sorted(need_cols - set(table_cols) - set(COMP_FEATURES))
+        if missing:
+            print(f"[WARN] Model features missing from the assess table: {missing}")
+
+    # precomputed valuations for map markers / PID lookups, scored off the
+    # startup path; monolithic tables also replay assessment deltas and
+    # poll for new ones (sharded tables score each shard in the background
+    # after it loads)
+    precompute = os.getenv("IREA_PRECOMPUTE_VALUES", "1") == "1"
+    app.state.table_sync = None
+    table = app.state.assess_table
+    if isinstance(table, ShardedAssessTable):
+        if precompute:
+            table.value_store = store
+    else:
+        delta_dir = os.getenv(
+            "IREA_ASSESS_DELTA_DIR", str(root / "models" / "assess_deltas")
+        )
+        sync = TableSync(
+            app.state,
+            DeltaLog(delta_dir),
+            store,
+            precompute=precompute,
+            poll_s=float(os.getenv("IREA_DELTA_POLL_S", "5")),
+        )
+        version = sync.apply_pending()
+        sync.start()
+        app.state.table_sync = sync
+        print(f"[INFO] Assess table version {version} (deltas: {delta_dir})")
+
+    # 3) comparable-sales index over matched deeds (optional)
+    sales_path = Path(
+        os.getenv("IREA_SALES_CSV", str(root / "models" / "train_residual.csv"))
+    )
+    app.state.comps_index = None
+    if sales_path.exists():
+        # sharded tables have no single frame; sales must carry lat/lng then
+        assess_df = getattr(app.state.assess_table, "df", None)
+        try:
+            app.state.comps_index = CompsIndex.load(str(sales_path), assess_df)
+            print(
+                f"[INFO] CompsIndex loaded: {sales_path} | "
+                f"sales={len(app.state.comps_index)}"
+            )
+        except ValueError as e:
+            print(f"[WARN] {e}, /api/comps disabled: {sales_path}")
+    else:
+        print(f"[WARN] Sales table not found, /api/comps disabled: {sales_path}")
+
+    # 4) multi-year assessment history (optional)
+    history_dir = Path(
+        os.getenv("IREA_HISTORY_DIR", str(root / "models" / "assessment_history"))
     )
+    app.state.assessment_history = None
+    if (history_dir / "manifest.json").exists():
+        app.state.assessment_history = AssessmentHistory.load(str(history_dir))
+        st = app.state.assessment_history.stats()
+        print(
+            f"[INFO] AssessmentHistory loaded: {history_dir} | "
+            f"parcels={st['parcels']} years={st['years']}"
+        )
+    else:
+        print(f"[WARN] Assessment history not found, history disabled: {history_dir}")
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    sync = getattr(app.state, "table_sync", None)
+    if sync is not None:
+        sync.stop()
+    audit = getattr(app.state, "audit_log", None)
+    if audit is not None:
+        audit.close()
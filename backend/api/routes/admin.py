@@ -0,0 +1,145 @@
+import asyncio
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from api.utils.admin_guard import ensure_admin
+from api.utils.fast_json import FastJSONResponse
+
+router = APIRouter()
+
+
+def _services(request: Request, name: str):
+    svc = getattr(request.app.state, name, None)
+    if svc is None:
+        raise HTTPException(status_code=500, detail=f"Server not ready: {name}")
+    return svc
+
+
+@router.post("/profile")
+async def profile(
+    request: Request,
+    seconds: float = Query(default=10.0, gt=0, le=300),
+    requests: Optional[int] = Query(default=None, ge=1, le=100000),
+    intervalMs: float = Query(default=5.0, ge=1, le=1000),
+    format: Literal["collapsed", "json"] = "collapsed",
+):
+    """Sample all threads for `seconds`, or until `requests` predict calls finish.
+
+    Blocks until the window closes and returns collapsed stacks (text) or a
+    JSON summary of the hottest frames.
+    """
+    ensure_admin(request)
+    prof = _services(request, "profiler")
+
+    try:
+        prof.start(seconds=seconds, requests=requests, interval_ms=intervalMs)
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="Profiler already running")
+
+    try:
+        while prof.running:
+            await asyncio.sleep(0.05)
+    except asyncio.CancelledError:
+        prof.stop()
+        raise
+
+    if format == "json":
+        return prof.summary()
+    return PlainTextResponse(prof.collapsed())
+
+
+@router.get("/profile")
+def profile_status(request: Request) -> Dict[str, Any]:
+    ensure_admin(request)
+    return _services(request, "profiler").summary()
+
+
+@router.post("/alloc/snapshot")
+def alloc_snapshot(
+    request: Request, top: int = Query(default=25, ge=1, le=500)
+) -> Dict[str, Any]:
+    """First call starts tracemalloc; later calls return top sites and growth."""
+    ensure_admin(request)
+    return _services(request, "alloc_tracker").snapshot(top=top)
+
+
+@router.delete("/alloc")
+def alloc_stop(request: Request) -> Dict[str, Any]:
+    ensure_admin(request)
+    return _services(request, "alloc_tracker").stop()
+
+
+@router.get("/audit")
+def audit_stats(request: Request) -> Dict[str, Any]:
+    """Audit writer counters: queued, written, dropped, files."""
+    ensure_admin(request)
+    return _services(request, "audit_log").stats()
+
+
+@router.get("/admission")
+def admission_stats(request: Request) -> Dict[str, Any]:
+    """Admission control counters for this worker."""
+    ensure_admin(request)
+    return _services(request, "admission").stats()
+
+
+class TableDelta(BaseModel):
+    upserts: List[Dict[str, Any]] = []
+    deletes: List[Union[str, int]] = []
+
+
+def _table_sync(request: Request):
+    sync = getattr(request.app.state, "table_sync", None)
+    if sync is None:
+        raise HTTPException(
+            status_code=409, detail="Delta updates need the single-file assess table"
+        )
+    return sync
+
+
+@router.get("/table")
+def table_status(request: Request) -> Dict[str, Any]:
+    ensure_admin(request)
+    return _table_sync(request).stats()
+
+
+@router.post("/table/delta")
+def table_delta(delta: TableDelta, request: Request) -> Dict[str, Any]:
+    """Record an upsert/delete delta keyed by PID and swap in the new table.
+
+    Other workers pick the delta up from the shared delta directory.
+    """
+    ensure_admin(request)
+    sync = _table_sync(request)
+    if not delta.upserts and not delta.deletes:
+        raise HTTPException(status_code=400, detail="Empty delta")
+    if any("PID" not in r for r in delta.upserts):
+        raise HTTPException(status_code=400, detail="Every upsert needs a PID")
+    try:
+        sync.submit(delta.upserts, delta.deletes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sync.stats()
+
+
+@router.get("/shadow", response_class=FastJSONResponse)
+def shadow_report(request: Request, examples: bool = True) -> FastJSONResponse:
+    """Candidate-vs-production delta stats and the most diverging requests."""
+    ensure_admin(request)
+    shadow = getattr(request.app.state, "shadow", None)
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring not enabled")
+    return FastJSONResponse(shadow.report(examples=examples))
+
+
+@router.delete("/shadow")
+def shadow_reset(request: Request) -> Dict[str, Any]:
+    ensure_admin(request)
+    shadow = getattr(request.app.state, "shadow", None)
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring not enabled")
+    shadow.reset()
+    return {"reset": True}
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from api.services.bulk_scoring import MEDIA_TYPES, detect_format, stream_scored
+
+router = APIRouter()
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("IREA_BULK_MAX_MB", "2048")) * 1024 * 1024)
+
+
+async def _spool_body(request: Request, suffix: str) -> str:
+    # parquet needs its footer, so the upload is spooled to disk, not RAM
+    fd, path = tempfile.mkstemp(prefix="irea_bulk_", suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if size == 0:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail="Empty upload")
+    return path
+
+
+def _cleanup_after(gen, path: str):
+    try:
+        yield from gen
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+@router.post("/predict/bulk")
+async def predict_bulk(
+    request: Request,
+    format: Optional[str] = Query(default=None, pattern="^(arrow|parquet|csv)$"),
+    batchRows: int = Query(default=20000, ge=100, le=500000),
+) -> StreamingResponse:
+    store = getattr(request.app.state, "model_store", None)
+    table = getattr(request.app.state, "assess_table", None)
+    jobs = getattr(request.app.state, "bulk_jobs", None)
+    if store is None or table is None or jobs is None:
+        raise HTTPException(
+            status_code=500, detail="Server not ready: model/table not loaded"
+        )
+
+    fmt = detect_format(request.headers.get("content-type"), format)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send Arrow IPC, Parquet or CSV (Content-Type or ?format=)",
+        )
+
+    path = await _spool_body(request, suffix=f".{fmt}")
+    job = jobs.create(fmt)
+    print(f"[INFO] bulk job {job.id} started: format={fmt}")
+
+    gen = stream_scored(path, fmt, store, table, job, batch_rows=batchRows)
+    return StreamingResponse(
+        _cleanup_after(gen, path),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"X-Job-Id": job.id},
+    )
+
+
+@router.get("/predict/bulk/{job_id}")
+def bulk_progress(job_id: str, request: Request) -> Dict[str, Any]:
+    jobs = getattr(request.app.state, "bulk_jobs", None)
+    job = jobs.get(job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown bulk job")
+    return job.to_dict()
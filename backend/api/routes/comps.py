@@ -0,0 +1,62 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from api.services.comps import COMP_FEATURES
+from api.utils.fast_json import FastJSONResponse, to_columns
+from api.utils.geo_guard import ensure_in_boston
+
+router = APIRouter()
+
+
+class CompsRequest(BaseModel):
+    latitude: float
+    longitude: float
+
+    k: int = Field(default=5, ge=1, le=50)
+    maxDistanceM: Optional[float] = Field(default=None, gt=0)
+    # only sales from this year on
+    sinceYear: Optional[int] = Field(default=None, ge=1900, le=2100)
+    layout: Literal["records", "columns"] = "records"
+
+
+@router.post("/comps", response_class=FastJSONResponse)
+def comps(req: CompsRequest, request: Request) -> FastJSONResponse:
+    ensure_in_boston(req.latitude, req.longitude)
+
+    table = getattr(request.app.state, "assess_table", None)
+    index = getattr(request.app.state, "comps_index", None)
+    if table is None:
+        raise HTTPException(
+            status_code=500, detail="Server not ready: model/table not loaded"
+        )
+    if index is None:
+        raise HTTPException(status_code=503, detail="Comparable sales not loaded")
+
+    row, _, _ = table.snap(req.latitude, req.longitude)
+    pid = row.get("PID", None)
+
+    target = {c: row.get(c, None) for c in COMP_FEATURES}
+    snapped_lat = float(row["LATITUDE"])
+    snapped_lng = float(row["LONGITUDE"])
+
+    items = index.query(
+        snapped_lat,
+        snapped_lng,
+        target,
+        k=req.k,
+        max_distance_m=req.maxDistanceM,
+        exclude_pid=pid,
+        since_year=req.sinceYear,
+    )
+
+    return FastJSONResponse(
+        {
+            "pid": None if pid is None else str(pid),
+            "snappedLat": snapped_lat,
+            "snappedLng": snapped_lng,
+            "comps": to_columns(items) if req.layout == "columns" else items,
+            "meta": {"indexed_sales": len(index)},
+        }
+    )
@@ -0,0 +1,27 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, Request
+
+from api.utils.admin_guard import ensure_admin
+from api.utils.fast_json import FastJSONResponse
+
+router = APIRouter()
+
+
+def _monitor(request: Request):
+    mon = getattr(request.app.state, "drift_monitor", None)
+    if mon is None:
+        raise HTTPException(status_code=503, detail="Drift monitor not running")
+    return mon
+
+
+@router.get("/drift", response_class=FastJSONResponse)
+def drift(request: Request) -> FastJSONResponse:
+    return FastJSONResponse(_monitor(request).report())
+
+
+@router.delete("/drift")
+def drift_reset(request: Request) -> Dict[str, Any]:
+    ensure_admin(request)
+    _monitor(request).reset()
+    return {"reset": True}
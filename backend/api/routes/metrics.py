@@ -0,0 +1,42 @@
+import os
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics(request: Request) -> Dict[str, Any]:
+    """Per-worker runtime counters; sections are omitted until loaded."""
+    state = request.app.state
+    out: Dict[str, Any] = {"pid": os.getpid()}
+
+    store = getattr(state, "model_store", None)
+    if store is not None:
+        out["inference"] = store.layout.to_dict()
+
+    for name, attr in (
+        ("admission", "admission"),
+        ("audit", "audit_log"),
+        ("sessions", "sessions"),
+        ("deadlines", "deadlines"),
+    ):
+        svc = getattr(state, attr, None)
+        if svc is not None:
+            out[name] = svc.stats()
+
+    drift = getattr(state, "drift_monitor", None)
+    if drift is not None:
+        out["drift"] = {"observed": drift.observed, "dropped": drift.dropped}
+
+    shadow = getattr(state, "shadow", None)
+    if shadow is not None:
+        out["shadow"] = shadow.report(examples=False)
+
+    table = getattr(state, "assess_table", None)
+    if table is not None and hasattr(table, "stats"):
+        out["assess_shards"] = table.stats()
+    elif table is not None:
+        out["assess_table"] = {"version": table.version, "rows": len(table)}
+    return out
@@ -0,0 +1,112 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from api.utils.fast_json import FastJSONResponse
+
+router = APIRouter()
+
+PAGE_MAX = 5000
+# more parcels than this in one viewport are thinned evenly; zoom in for all
+VIEWPORT_MAX = int(os.getenv("IREA_VIEWPORT_MAX", "20000"))
+
+
+def _table(request: Request):
+    table = getattr(request.app.state, "assess_table", None)
+    if table is None:
+        raise HTTPException(
+            status_code=500, detail="Server not ready: table not loaded"
+        )
+    return table
+
+
+@router.get("/parcels", response_class=FastJSONResponse)
+def parcels_in_viewport(
+    request: Request,
+    latMin: float = Query(..., ge=-90, le=90),
+    latMax: float = Query(..., ge=-90, le=90),
+    lngMin: float = Query(..., ge=-180, le=180),
+    lngMax: float = Query(..., ge=-180, le=180),
+    limit: int = Query(default=2000, ge=1, le=PAGE_MAX),
+    cursor: int = Query(default=0, ge=0),
+    values: bool = False,
+) -> FastJSONResponse:
+    """Parcels inside the map viewport as columns: pid, lat, lng[, value].
+
+    Pages are `limit` rows; pass `nextCursor` back as `cursor` for the next
+    one. Viewports with more than IREA_VIEWPORT_MAX parcels are thinned
+    evenly and flagged `sampled`.
+    """
+    if latMin >= latMax or lngMin >= lngMax:
+        raise HTTPException(status_code=400, detail="Empty or inverted viewport")
+
+    cols = _table(request).parcels_in_bbox(latMin, latMax, lngMin, lngMax)
+    total = len(cols["lat"])
+
+    sampled = total > VIEWPORT_MAX
+    if sampled:
+        keep = np.linspace(0, total - 1, VIEWPORT_MAX).astype(np.int64)
+        cols = {k: v[keep] for k, v in cols.items()}
+    n = len(cols["lat"])
+
+    page = slice(cursor, min(cursor + limit, n))
+    columns = ["pid", "lat", "lng"]
+    if values and "value" in cols:
+        columns.append("value")
+    data = [cols["pid"][page].tolist()]
+    data += [cols[c][page] for c in columns[1:]]
+
+    end = page.stop
+    return FastJSONResponse(
+        {
+            "columns": columns,
+            "rows": max(0, end - cursor),
+            "data": data,
+            "total": total,
+            "sampled": sampled,
+            "nextCursor": end if end < n else None,
+            "valuesAvailable": "value" in cols,
+        }
+    )
+
+
+@router.get("/parcels/{pid}", response_class=FastJSONResponse)
+def parcel_by_pid(pid: str, request: Request) -> FastJSONResponse:
+    table = _table(request)
+    hit = table.lookup_pid(pid)
+    if hit is None:
+        raise HTTPException(status_code=404, detail=f"Unknown PID: {pid}")
+    row, value = hit
+
+    record = {k: (None if pd.isna(v) else v) for k, v in row.to_dict().items()}
+    return FastJSONResponse(
+        {
+            "pid": record.get("PID", pid),
+            "lat": record.get("LATITUDE"),
+            "lng": record.get("LONGITUDE"),
+            "value": value,
+            "record": record,
+        }
+    )
+
+
+@router.get("/parcels/{pid}/history", response_class=FastJSONResponse)
+def parcel_history(
+    pid: str,
+    request: Request,
+    columns: Optional[str] = Query(default=None, description="comma-separated"),
+) -> FastJSONResponse:
+    """Assessed values of a parcel for every fiscal year in the history store."""
+    hist = getattr(request.app.state, "assessment_history", None)
+    if hist is None:
+        raise HTTPException(status_code=503, detail="Assessment history not loaded")
+    cols = None if columns is None else [c.strip() for c in columns.split(",")]
+    records = hist.history(pid, cols)
+    if records is None:
+        raise HTTPException(status_code=404, detail=f"Unknown PID: {pid}")
+    return FastJSONResponse(
+        {"pid": pid, "years": [r["year"] for r in records], "history": records}
+    )
@@ -0,0 +1,116 @@
+import os
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from api.services.portfolio import (
+    DETAIL_COLUMNS,
+    pid_blocks,
+    polygon_blocks,
+    value_portfolio,
+)
+from api.utils.fast_json import FastJSONResponse
+from api.utils.geo_guard import BoundaryGrid, parse_ring, rings_from_geojson
+
+router = APIRouter()
+
+PAGE_MAX = 5000
+MAX_PIDS = int(os.getenv("IREA_PORTFOLIO_MAX_PIDS", "200000"))
+BATCH_ROWS = int(os.getenv("IREA_PORTFOLIO_BATCH_ROWS", "5000"))
+MAX_VERTICES = int(os.getenv("IREA_PORTFOLIO_MAX_VERTICES", "50000"))
+# missing PIDs echoed back; the count is always exact
+MISSING_ECHO = 100
+
+
+class PortfolioRequest(BaseModel):
+    # GeoJSON Polygon/MultiPolygon (bare, Feature or FeatureCollection) or a
+    # single [[lng, lat], ...] ring
+    polygon: Optional[Union[Dict[str, Any], List[List[float]]]] = None
+    pids: Optional[List[str]] = None
+
+    detail: bool = False
+    limit: int = Field(default=1000, ge=1, le=PAGE_MAX)
+    cursor: int = Field(default=0, ge=0)
+
+
+def _grid(polygon) -> BoundaryGrid:
+    try:
+        if isinstance(polygon, dict):
+            rings = rings_from_geojson(polygon)
+        else:
+            rings = [parse_ring(polygon)]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rings = [r for r in rings if len(r) >= 3]
+    if not rings:
+        raise HTTPException(
+            status_code=400, detail="polygon needs a ring of at least 3 points"
+        )
+    n_points = sum(len(r) for r in rings)
+    if n_points > MAX_VERTICES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_VERTICES} polygon vertices"
+        )
+    if not all(-180 <= x <= 180 and -90 <= y <= 90 for r in rings for x, y in r):
+        raise HTTPException(
+            status_code=400, detail="polygon coordinates must be [lng, lat] degrees"
+        )
+    grid = BoundaryGrid(rings)
+    if grid.x0 >= grid.x1 or grid.y0 >= grid.y1:
+        raise HTTPException(status_code=400, detail="polygon has no area")
+    return grid
+
+
+@router.post("/portfolio", response_class=FastJSONResponse)
+def portfolio(req: PortfolioRequest, request: Request) -> FastJSONResponse:
+    """Total and distribution of estimated value over a polygon or PID list.
+
+    Aggregates (sum, percentiles, per-ZIP breakdown) cover every selected
+    parcel; with `detail` one page of `limit` parcels is returned as columns,
+    pass `nextCursor` back as `cursor` for the next one.
+    """
+    if (req.polygon is None) == (req.pids is None):
+        raise HTTPException(status_code=400, detail="Send exactly one of polygon, pids")
+    if req.pids is not None and len(req.pids) > MAX_PIDS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_PIDS} PIDs per request"
+        )
+
+    store = getattr(request.app.state, "model_store", None)
+    table = getattr(request.app.state, "assess_table", None)
+    if store is None or table is None:
+        raise HTTPException(
+            status_code=500, detail="Server not ready: model/table not loaded"
+        )
+
+    t0 = time.perf_counter()
+    missing: List[Any] = []
+    if req.polygon is not None:
+        blocks = polygon_blocks(table, _grid(req.polygon))
+    else:
+        blocks = pid_blocks(table, req.pids, missing)
+
+    summary, detail = value_portfolio(
+        store,
+        blocks,
+        batch_rows=BATCH_ROWS,
+        detail_offset=req.cursor,
+        detail_limit=req.limit if req.detail else 0,
+    )
+
+    out = summary.report()
+    out["tableVersion"] = getattr(table, "version", 0)
+    out["missingPidCount"] = len(missing)
+    out["missingPids"] = missing[:MISSING_ECHO]
+    if req.detail:
+        end = req.cursor + len(detail["pid"])
+        out["detail"] = {
+            "columns": DETAIL_COLUMNS,
+            "rows": len(detail["pid"]),
+            "data": [detail["pid"].tolist()] + [detail[c] for c in DETAIL_COLUMNS[1:]],
+            "nextCursor": end if end < summary.parcels else None,
+        }
+    out["elapsedMs"] = (time.perf_counter() - t0) * 1000.0
+    return FastJSONResponse(out)
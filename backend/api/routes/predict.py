@@ -1,9 +1,22 @@
-from typing import Any, Dict, Optional
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
 
-import numpy as np
-from fastapi import APIRouter, HTTPException, Request
-from pydantic import BaseModel
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
 
+from api.services.deadline import HEADER as DEADLINE_HEADER
+from api.services.model_store import BLEND_K, BLEND_RADIUS_M
+from api.utils.fast_json import FastJSONResponse, dumps
 from api.utils.geo_guard import ensure_in_boston
 
 router = APIRouter()
@@ -25,34 +38,8 @@ def to01(v: Any) -> Optional[int]:
     return None
 
 
-def json_safe(x: Any) -> Any:
-
-    if x is None:
-        return None
-    if isinstance(x, (str, int, float, bool)):
-        return x
-
-    if isinstance(x, np.generic):
-        return x.item()
-
-    if isinstance(x, np.ndarray):
-        return x.tolist()
-
-    if isinstance(x, dict):
-        return {str(k): json_safe(v) for k, v in x.items()}
-
-    if isinstance(x, (list, tuple, set)):
-        return [json_safe(v) for v in x]
-
-    try:
-        return str(x)
-    except Exception:
-        return None
-
-
-class PredictRequest(BaseModel):
-    latitude: float
-    longitude: float
+class FormFields(BaseModel):
+    """The valuation form's fields; model column names pass through."""
 
     areaSqft: Optional[float] = None
     lotSqft: Optional[float] = None
@@ -72,8 +59,34 @@ class PredictRequest(BaseModel):
         extra = "allow"
 
 
-@router.post("/predict")
-def predict(req: PredictRequest, request: Request) -> Dict[str, Any]:
+class PredictRequest(FormFields):
+    latitude: float
+    longitude: float
+
+    # distance-weighted blend over nearby parcels instead of a single snap
+    blend: bool = False
+    blendK: int = Field(default=BLEND_K, ge=1, le=32)
+    blendRadiusM: float = Field(default=BLEND_RADIUS_M, gt=0, le=2000)
+
+
+class PredictResponse(BaseModel):
+    predictedPrice: float
+    finalPrice: float
+    assessPrice: float
+    residual: float
+    snappedLat: float
+    snappedLng: float
+    modelVersion: str
+    trend: Optional[Dict[str, Any]] = None
+    meta: Dict[str, Any]
+
+
+@router.post(
+    "/predict", response_model=PredictResponse, response_class=FastJSONResponse
+)
+def predict(
+    req: PredictRequest, request: Request, background: BackgroundTasks
+) -> FastJSONResponse:
     ensure_in_boston(req.latitude, req.longitude)
 
     store = getattr(request.app.state, "model_store", None)
@@ -95,7 +108,49 @@ def predict(req: PredictRequest, request: Request) -> Dict[str, Any]:
         else:
             payload.pop("renovated", None)
 
-    out = store.predict(payload, table)
+    t0 = time.perf_counter()
+    try:
+        deadline = None
+        policy = getattr(request.app.state, "deadlines", None)
+        if policy is not None:
+            deadline = policy.start(
+                request.headers.get(DEADLINE_HEADER),
+                arrival=getattr(request.state, "arrival", None),
+            )
+        if req.blend:
+            out = store.predict_blended(
+                payload,
+                table,
+                k=req.blendK,
+                radius_m=req.blendRadiusM,
+                deadline=deadline,
+            )
+        else:
+            out = store.predict(payload, table, deadline=deadline)
+        if deadline is not None:
+            policy.observe(out)
+    finally:
+        prof = getattr(request.app.state, "profiler", None)
+        if prof is not None:
+            prof.tick()
+
+    drift = getattr(request.app.state, "drift_monitor", None)
+    if drift is not None and isinstance(out, dict):
+        drift.observe(payload, out)
+
+    audit = getattr(request.app.state, "audit_log", None)
+    if audit is not None and isinstance(out, dict):
+        audit.record(
+            payload,
+            out,
+            latency_ms=(time.perf_counter() - t0) * 1000.0,
+            model=getattr(store, "fingerprint", None),
+        )
+
+    shadow = getattr(request.app.state, "shadow", None)
+    if shadow is not None and isinstance(out, dict):
+        # runs after the response is sent; only enqueues
+        background.add_task(shadow.submit, payload, out, table)
 
     if isinstance(out, dict):
         slat = out.get("snappedLat", None)
@@ -103,4 +158,233 @@ def predict(req: PredictRequest, request: Request) -> Dict[str, Any]:
         if slat is not None and slng is not None:
             ensure_in_boston(float(slat), float(slng))
 
-    return json_safe(out)
+    return FastJSONResponse(out)
+
+
+def _edit_fields(fields: Any) -> Dict[str, Any]:
+    """Session field deltas checked against the form field types.
+
+    Returns only the fields sent (null restores the parcel's value); raises
+    ValueError when a value does not fit its field.
+    """
+    if not isinstance(fields, dict):
+        raise ValueError("fields must be a JSON object")
+    try:
+        out = FormFields(**fields).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        raise ValueError(
+            "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )
+        ) from None
+    if out.get("renovated") is not None:
+        norm = to01(out["renovated"])
+        if norm is None:
+            raise ValueError("renovated must be 0/1")
+        out["renovated"] = norm
+    return out
+
+
+def _sessions(request: Request):
+    reg = getattr(request.app.state, "sessions", None)
+    table = getattr(request.app.state, "assess_table", None)
+    if reg is None or table is None:
+        raise HTTPException(
+            status_code=500, detail="Server not ready: model/table not loaded"
+        )
+    return reg, table
+
+
+def _session(request: Request, sid: str):
+    reg, _ = _sessions(request)
+    s = reg.get(sid)
+    if s is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return s
+
+
+@router.post("/predict/session", response_class=FastJSONResponse)
+def create_session(req: PredictRequest, request: Request) -> FastJSONResponse:
+    """Snap to a parcel and open an editing session on its feature row.
+
+    The body is the same as /predict; the form fields it sets are applied
+    as the session's first edit, exactly as a PATCH with them would be. The
+    response is the /predict body with meta.session.id for the PATCH calls
+    that follow.
+    """
+    ensure_in_boston(req.latitude, req.longitude)
+    reg, table = _sessions(request)
+    # everything but the pin and the blend options is a field edit
+    skip = set(PredictRequest.model_fields) - set(FormFields.model_fields)
+    sent = req.model_dump(exclude_unset=True)
+    try:
+        edits = _edit_fields(
+            {k: v for k, v in sent.items() if k not in skip and v is not None}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    session = reg.create({"latitude": req.latitude, "longitude": req.longitude}, table)
+    try:
+        out = session.update(edits) if edits else session.result()
+    except ValueError as e:
+        reg.drop(session.id)
+        raise HTTPException(status_code=422, detail=str(e))
+    ensure_in_boston(float(out["snappedLat"]), float(out["snappedLng"]))
+    ensure_in_boston(float(out["snappedLat"]), float(out["snappedLng"]))
+    return FastJSONResponse(out)
+
+
+@router.get("/predict/session/{sid}", response_class=FastJSONResponse)
+def get_session(sid: str, request: Request) -> FastJSONResponse:
+    return FastJSONResponse(_session(request, sid).result())
+
+
+@router.patch("/predict/session/{sid}", response_class=FastJSONResponse)
+def edit_session(
+    sid: str, fields: Dict[str, Any], request: Request
+) -> FastJSONResponse:
+    """Apply field edits (form names or model columns; null restores the
+    parcel's value) and return the updated prediction.
+
+    Only the trees that split on the edited features are re-evaluated.
+    Values that do not fit their field are rejected with 422.
+    """
+    s = _session(request, sid)
+    try:
+        return FastJSONResponse(s.update(_edit_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.delete("/predict/session/{sid}")
+def close_session(sid: str, request: Request) -> Dict[str, Any]:
+    reg, _ = _sessions(request)
+    return {"closed": reg.drop(sid)}
+
+
+class _SocketInput:
+    """Input of one WebSocket session not yet applied.
+
+    Field deltas merge into one pending dict and a new pin replaces the old
+    one, so a burst of slider moves costs a single update.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.pin: Optional[Dict[str, Any]] = None
+        self.seq = 0
+        self.superseded = 0
+        self.wake = asyncio.Event()
+
+    def push(self, msg: Dict[str, Any]) -> None:
+        # validate before touching any state, so a bad message changes nothing
+        fields = _edit_fields(msg.get("fields") or {})
+        self.seq = int(msg.get("seq") or self.seq + 1)
+        if msg.get("latitude") is not None and msg.get("longitude") is not None:
+            self.pin = {"latitude": msg["latitude"], "longitude": msg["longitude"]}
+        self.fields.update(fields)
+        self.wake.set()
+
+    def take(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], int]:
+        out = (self.fields, self.pin, self.seq)
+        self.fields, self.pin = {}, None
+        return out
+
+
+def _advance(reg, state, session, pin, fields):
+    """Apply one batch of input; a pin opens a session on that parcel,
+    carrying the previous session's edits over. The previous session is
+    only dropped once the new one has answered; on failure the new one is
+    closed and the previous one stays current."""
+    if pin is None:
+        if session is None:
+            raise HTTPException(status_code=400, detail="Send latitude/longitude first")
+        out = session.update(fields) if fields else session.result()
+        ensure_in_boston(float(out["snappedLat"]), float(out["snappedLng"]))
+        return session, out
+
+    ensure_in_boston(pin["latitude"], pin["longitude"])
+    new = reg.create(pin, state.assess_table)
+    try:
+        if session is not None and session.edits:
+            new.update(session.edits)
+        out = new.update(fields) if fields else new.result()
+        ensure_in_boston(float(out["snappedLat"]), float(out["snappedLng"]))
+    except Exception:
+        reg.drop(new.id)
+        raise
+    if session is not None:
+        reg.drop(session.id)
+    return new, out
+
+
+@router.websocket("/predict/ws")
+async def predict_ws(ws: WebSocket):
+    """Interactive valuation over one connection.
+
+    Client messages are JSON objects with an optional increasing "seq".
+    latitude/longitude snap the session to a parcel (again on a later
+    message, keeping the edits); "fields" carries field deltas as in
+    PATCH /predict/session. The server answers {"type": "price", "seq", ...}
+    with the /predict body for the newest input only: deltas arriving while
+    an update runs are merged into the next one, and a result overtaken by
+    newer input is dropped instead of sent.
+    """
+    await ws.accept()
+    state = ws.app.state
+    reg = getattr(state, "sessions", None)
+    if reg is None or getattr(state, "assess_table", None) is None:
+        await ws.close(code=1013, reason="Server not ready")
+        return
+
+    inp = _SocketInput()
+    session = None
+
+    async def send(msg: Dict[str, Any]) -> None:
+        await ws.send_text(dumps(msg).decode("utf-8"))
+
+    async def read() -> None:
+        while True:
+            text = await ws.receive_text()
+            try:
+                msg = json.loads(text)
+                if not isinstance(msg, dict):
+                    raise ValueError("message must be a JSON object")
+                inp.push(msg)
+            except (ValueError, TypeError, AttributeError) as e:
+                await send({"type": "error", "seq": None, "detail": str(e)})
+
+    async def work() -> None:
+        nonlocal session
+        while True:
+            await inp.wake.wait()
+            inp.wake.clear()
+            fields, pin, seq = inp.take()
+            try:
+                session, out = await run_in_threadpool(
+                    _advance, reg, state, session, pin, fields
+                )
+            except HTTPException as e:
+                await send({"type": "error", "seq": seq, "detail": e.detail})
+                continue
+            except Exception as e:
+                await send({"type": "error", "seq": seq, "detail": str(e)[:400]})
+                continue
+            if inp.seq != seq:
+                # newer input arrived meanwhile; its update follows
+                inp.superseded += 1
+                continue
+            out["meta"]["session"]["superseded"] = inp.superseded
+            await send({"type": "price", "seq": seq, **out})
+
+    tasks = [asyncio.create_task(read()), asyncio.create_task(work())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            if not isinstance(t.exception(), WebSocketDisconnect):
+                t.result()
+    finally:
+        for t in tasks:
+            t.cancel()
+        if session is not None:
+            reg.drop(session.id)
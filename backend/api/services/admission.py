@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from api.utils.fast_json import dumps
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is free."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-worker admission for expensive routes.
+
+    At most `max_concurrency` requests run at once. Up to `max_queue` more
+    wait (on the event loop, not in the threadpool) for at most
+    `queue_budget_s`; anything beyond that is rejected immediately so the
+    admitted requests keep their latency. A request whose expected wait
+    (queue depth over concurrency, times the service-time EWMA) already
+    exceeds the budget is rejected up front instead of holding a queue slot
+    for the whole budget. With `rate_per_s` > 0 each client also has a token
+    bucket of that rate and `burst` capacity; off by default, since behind a
+    proxy without IREA_CLIENT_HEADER every request shares one peer address.
+
+    Not thread-safe: all calls happen on the event loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int = 64,
+        queue_budget_s: float = 2.0,
+        rate_per_s: float = 0.0,
+        burst: float = 20.0,
+        max_clients: int = 10000,
+    ):
+        self.max_concurrency = int(max_concurrency)
+        self.max_queue = int(max_queue)
+        self.queue_budget_s = float(queue_budget_s)
+        self.rate_per_s = float(rate_per_s)
+        self.burst = float(burst)
+        self.max_clients = int(max_clients)
+
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_queue_full = 0
+        self.rejected_expected_wait = 0
+        self.rejected_timeout = 0
+        # EWMA of service time, used for the expected wait and Retry-After
+        self.service_s = 0.05
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        default_conc = max(2, 2 * (os.cpu_count() or 1))
+        return cls(
+            max_concurrency=int(os.getenv("IREA_MAX_CONCURRENCY", str(default_conc))),
+            max_queue=int(os.getenv("IREA_ADMIT_QUEUE", "64")),
+            queue_budget_s=float(os.getenv("IREA_QUEUE_BUDGET_MS", "2000")) / 1000.0,
+            rate_per_s=float(os.getenv("IREA_CLIENT_RATE", "0")),
+            burst=float(os.getenv("IREA_CLIENT_BURST", "20")),
+        )
+
+    def _bucket(self, client: str) -> TokenBucket:
+        b = self._buckets.get(client)
+        if b is None:
+            b = TokenBucket(self.rate_per_s, self.burst)
+            self._buckets[client] = b
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return b
+
+    def _expected_wait(self) -> float:
+        return (self.waiting + 1) / max(1, self.max_concurrency) * self.service_s
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._expected_wait()))
+
+    async def acquire(self, client: str) -> Optional[Tuple[int, str, int]]:
+        """None when admitted, else (status, reason, retry_after_s)."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+
+        if self.rate_per_s > 0:
+            wait = self._bucket(client).take(time.monotonic())
+            if wait > 0:
+                self.rejected_rate += 1
+                return 429, "Too many requests from this client", math.ceil(wait)
+
+        if self._sem.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                return 503, "Server busy", self._retry_after()
+            if self._expected_wait() > self.queue_budget_s:
+                self.rejected_expected_wait += 1
+                return 503, "Server busy", self._retry_after()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.queue_budget_s)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                return 503, "Server busy", self._retry_after()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._sem.acquire()
+
+        self.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def release(self, service_s: float) -> None:
+        self.in_flight -= 1
+        self.service_s = 0.9 * self.service_s + 0.1 * service_s
+        self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_budget_ms": self.queue_budget_s * 1000.0,
+            "client_rate_per_s": self.rate_per_s,
+            "client_burst": self.burst,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_rate": self.rejected_rate,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_expected_wait": self.rejected_expected_wait,
+            "rejected_timeout": self.rejected_timeout,
+            "service_ms_ewma": self.service_s * 1000.0,
+            "clients_tracked": len(self._buckets),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying app.state.admission to the given paths.
+
+    Also stamps the request's arrival time (perf_counter) into the scope
+    state before any queueing, for DeadlinePolicy.start.
+    """
+
+    def __init__(self, app, paths=("/api/predict",), client_header: str = ""):
+        self.app = app
+        self.paths = set(paths)
+        self.client_header = client_header.lower().encode()
+
+    def _client(self, scope) -> str:
+        if self.client_header:
+            for k, v in scope.get("headers") or []:
+                if k == self.client_header:
+                    # first hop of X-Forwarded-For style lists
+                    return v.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # request.state.arrival: deadlines count from here, queue wait included
+        scope.setdefault("state", {})["arrival"] = time.perf_counter()
+
+        ctl = getattr(scope["app"].state, "admission", None)
+        if ctl is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejected = await ctl.acquire(self._client(scope))
+        if rejected is not None:
+            status, reason, retry_after = rejected
+            body = dumps({"detail": reason})
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(retry_after).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ctl.release(time.perf_counter() - t0)
@@ -1,12 +1,48 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
+from api.services.spatial_index import SpatialIndex
+
+
+def pid_key(v: Any) -> str:
+    """Normalize a PID for lookup: "0100001000", 100001000 and 100001000.0 match."""
+    if isinstance(v, (float, np.floating)) and float(v).is_integer():
+        v = int(v)
+    return str(v).strip().lstrip("0") or "0"
+
+
+def _coerce_upserts(upd: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+    """Upsert values as scalars of each column's type.
+
+    Nested values (dicts, lists) and text in numeric columns raise
+    ValueError; blank strings count as not sent.
+    """
+    out = {}
+    for c in upd.columns:
+        s = upd[c]
+        nested = s.map(lambda v: isinstance(v, (dict, list, tuple, set)))
+        if nested.any():
+            pid = upd["PID"][nested].iloc[0]
+            raise ValueError(f"PID {pid}: {c} must be a single value")
+        s = s.mask(s.map(lambda v: isinstance(v, str) and not v.strip()))
+        if c != "PID" and dtypes[c].kind in "iuf":
+            num = pd.to_numeric(s, errors="coerce")
+            wrong = num.isna() & s.notna()
+            if wrong.any():
+                pid = upd["PID"][wrong].iloc[0]
+                raise ValueError(
+                    f"PID {pid}: {c} must be a number, got {s[wrong].iloc[0]!r}"
+                )
+            s = num
+        out[c] = s
+    return pd.DataFrame(out, index=upd.index)
+
 
 @dataclass
 class AssessTable:
@@ -14,6 +50,12 @@ class AssessTable:
     lat: np.ndarray
     lng: np.ndarray
     cols: List[str]
+    index: Optional[SpatialIndex] = field(default=None, repr=False)
+    # precomputed finalPrice per row (see attach_values), NaN where unknown
+    values: Optional[np.ndarray] = field(default=None, repr=False)
+    _pid_pos: Optional[Dict[str, int]] = field(default=None, repr=False)
+    # bumped by apply_delta; the base table loaded from disk is version 0
+    version: int = 0
 
     @classmethod
     def load(cls, csv_path: str, usecols: List[str]) -> "AssessTable":
@@ -21,8 +63,15 @@ class AssessTable:
         if not p.exists():
             raise FileNotFoundError(f"Assess table not found: {p}")
 
+        df0 = pd.read_csv(p, nrows=0)
+        available = set(df0.columns)
+        usecols = [c for c in usecols if c in available]
         df = pd.read_csv(p, usecols=usecols, low_memory=False)
 
+        return cls.from_frame(df)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AssessTable":
         df["LATITUDE"] = pd.to_numeric(df["LATITUDE"], errors="coerce")
         df["LONGITUDE"] = pd.to_numeric(df["LONGITUDE"], errors="coerce")
 
@@ -30,12 +79,204 @@ class AssessTable:
 
         lat = df["LATITUDE"].to_numpy(dtype=np.float32)
         lng = df["LONGITUDE"].to_numpy(dtype=np.float32)
-        df0 = pd.read_csv(p, nrows=0)
-        available = set(df0.columns)
-        usecols = [c for c in usecols if c in available]
-        df = pd.read_csv(p, usecols=usecols, low_memory=False)
+        index = SpatialIndex(lat, lng)
+
+        return cls(df=df, lat=lat, lng=lng, cols=list(df.columns), index=index)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def nearest_idx(self, lat: float, lng: float) -> int:
+        if self.index is None:
+            self.index = SpatialIndex(self.lat, self.lng)
+        idx, _ = self.index.nearest(lat, lng, k=1)
+        return int(idx[0])
+
+    def snap(self, lat: float, lng: float) -> Tuple[pd.Series, int, float]:
+        """Nearest parcel as (row, row index, squared distance in degrees)."""
+        idx = self.nearest_idx(lat, lng)
+        d2 = (float(self.lat[idx]) - lat) ** 2 + (float(self.lng[idx]) - lng) ** 2
+        return self.df.iloc[idx], idx, d2
+
+    def snap_k(
+        self, lat: float, lng: float, k: int, radius_m: float
+    ) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Up to k nearest parcels within radius_m as (rows, row indices,
+        distances in metres), nearest first. The nearest parcel is always
+        included, even beyond the radius."""
+        if self.index is None:
+            self.index = SpatialIndex(self.lat, self.lng)
+        idx, dist = self.index.nearest(lat, lng, k=k)
+        keep = dist <= radius_m
+        keep[0] = True
+        idx, dist = idx[keep], dist[keep]
+        return self.df.iloc[idx].reset_index(drop=True), idx, dist
+
+    def snap_many(
+        self, lat: np.ndarray, lng: np.ndarray
+    ) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Vectorized snap: (rows, row indices, squared distances in degrees)."""
+        if self.index is None:
+            self.index = SpatialIndex(self.lat, self.lng)
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        idx, _ = self.index.nearest_many(lat, lng)
+        d2 = (self.lat[idx].astype(np.float64) - lat) ** 2 + (
+            self.lng[idx].astype(np.float64) - lng
+        ) ** 2
+        return self.df.iloc[idx].reset_index(drop=True), idx, d2
+
+    def row_of_pid(self, pid: Any) -> Optional[int]:
+        """Row index for a PID via a hash index built on first use."""
+        if self._pid_pos is None:
+            if "PID" not in self.df.columns:
+                return None
+            keys = [pid_key(v) for v in self.df["PID"].tolist()]
+            self._pid_pos = dict(zip(keys, range(len(keys))))
+        return self._pid_pos.get(pid_key(pid))
+
+    def lookup_pid(self, pid: Any) -> Optional[Tuple[pd.Series, Optional[float]]]:
+        """(row, precomputed value or None) for a PID, None if unknown."""
+        i = self.row_of_pid(pid)
+        if i is None:
+            return None
+        value = None
+        if self.values is not None and np.isfinite(self.values[i]):
+            value = float(self.values[i])
+        return self.df.iloc[i], value
+
+    def within_bbox(
+        self, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> np.ndarray:
+        """Row indices inside the box, in table order."""
+        if self.index is None:
+            self.index = SpatialIndex(self.lat, self.lng)
+        return np.sort(self.index.within_bbox(lat_min, lat_max, lng_min, lng_max))
+
+    def parcels_in_bbox(
+        self, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> Dict[str, np.ndarray]:
+        """Columnar PID/lat/lng (and value, if attached) for rows in the box."""
+        idx = self.within_bbox(lat_min, lat_max, lng_min, lng_max)
+        out = {
+            "pid": (
+                self.df["PID"].to_numpy()[idx]
+                if "PID" in self.df.columns
+                else idx.astype(str)
+            ),
+            "lat": self.lat[idx],
+            "lng": self.lng[idx],
+        }
+        if self.values is not None:
+            out["value"] = self.values[idx]
+        return out
+
+    def attach_values(self, store, chunk_rows: int = 50_000) -> None:
+        """Score every row once with store.predict_frame and keep finalPrice."""
+        vals = np.full(len(self.df), np.nan)
+        for i in range(0, len(self.df), chunk_rows):
+            part = self.df.iloc[i : i + chunk_rows]
+            vals[i : i + len(part)] = store.predict_frame(part)["finalPrice"].to_numpy(
+                dtype=float
+            )
+        self.values = vals
+
+    def apply_delta(
+        self,
+        upserts: Optional[pd.DataFrame] = None,
+        deletes: Sequence[Any] = (),
+        store=None,
+        version: Optional[int] = None,
+    ) -> Tuple["AssessTable", Dict[str, Any]]:
+        """Copy-on-write update keyed by PID; this table is left untouched.
+
+        Upserted fields are merged onto the existing row with the same PID:
+        fields that are left out (or null) keep their current value, so a
+        correction only needs the columns it changes. Rows for unknown PIDs
+        are appended and need coordinates. Fields the table does not load
+        are dropped and listed in the stats as `ignored_columns`. Values must
+        be single values, numbers in numeric columns (ValueError otherwise).
+        Deleted PIDs are dropped. The spatial index is rebuilt for the new frame,
+        precomputed values are carried over for unchanged rows and, given
+        `store`, scored for upserted ones. Swap the returned table in with a
+        single assignment.
+        """
+        if "PID" not in self.df.columns:
+            raise ValueError("delta updates need a PID column")
+
+        upd = pd.DataFrame(columns=self.cols) if upserts is None else upserts
+        if len(upd) and "PID" not in upd.columns:
+            raise ValueError("upsert rows need a PID")
+        ignored = sorted(set(upd.columns) - set(self.cols))
+        upd = upd.reindex(columns=self.cols).reset_index(drop=True)
+        upd = upd[~upd["PID"].map(pid_key).duplicated(keep="last")]
+        upd = _coerce_upserts(upd, self.df.dtypes)
+
+        # partial rows: fill the fields not sent from the current row
+        old_i = np.array(
+            [self.row_of_pid(p) for p in upd["PID"].tolist()], dtype=object
+        )
+        known = np.array([i is not None for i in old_i], dtype=bool)
+        if known.any():
+            sent = upd[known]
+            current = self.df.iloc[old_i[known].astype(np.int64)].set_axis(sent.index)
+            merged = sent.astype(object).combine_first(current.astype(object))
+            upd = pd.concat([merged, upd[~known]]).sort_index()
+            upd = upd.reindex(columns=self.cols)
+
+        upd["LATITUDE"] = pd.to_numeric(upd["LATITUDE"], errors="coerce")
+        upd["LONGITUDE"] = pd.to_numeric(upd["LONGITUDE"], errors="coerce")
+        ok = upd["LATITUDE"].notna() & upd["LONGITUDE"].notna()
+        rejected = int((~ok).sum())
+        upd = upd[ok]
+
+        upd_keys = {pid_key(p) for p in upd["PID"].tolist()}
+        del_keys = {pid_key(p) for p in deletes} - upd_keys
+        old_keys = [pid_key(v) for v in self.df["PID"].tolist()]
+        keep = np.fromiter(
+            (k not in upd_keys and k not in del_keys for k in old_keys),
+            dtype=bool,
+            count=len(old_keys),
+        )
+
+        upd = upd.astype(
+            {
+                c: t
+                for c, t in self.df.dtypes.items()
+                if t.kind == "f" or upd[c].notna().all()
+            },
+            errors="ignore",
+        )
+        df = pd.concat([self.df[keep], upd], ignore_index=True)
+
+        lat = df["LATITUDE"].to_numpy(dtype=np.float32)
+        lng = df["LONGITUDE"].to_numpy(dtype=np.float32)
+        table = AssessTable(
+            df=df,
+            lat=lat,
+            lng=lng,
+            cols=list(df.columns),
+            index=SpatialIndex(lat, lng),
+            version=self.version + 1 if version is None else int(version),
+        )
+
+        if self.values is not None:
+            new_vals = np.full(len(upd), np.nan)
+            if store is not None and len(upd):
+                new_vals = store.predict_frame(upd)["finalPrice"].to_numpy(dtype=float)
+            table.values = np.concatenate([self.values[keep], new_vals])
 
-        return cls(df=df, lat=lat, lng=lng, cols=usecols)
+        old_set = set(old_keys)
+        updated = len(upd_keys & old_set)
+        stats = {
+            "updated": updated,
+            "inserted": len(upd_keys) - updated,
+            "deleted": len(del_keys & old_set),
+            "rejected": rejected,
+            "rows": int(len(df)),
+            "ignored_columns": ignored,
+        }
+        return table, stats
 
     def nearest_row_dict(self, lat: float, lng: float) -> Dict[str, Any]:
 
@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from api.services.assess_table import pid_key
+
+STORE_VERSION = 1
+
+# older snapshots name the same measures differently
+COLUMN_ALIASES = {
+    "AV_TOTAL": "TOTAL_VALUE",
+    "TOTAL_VAL": "TOTAL_VALUE",
+    "AV_LAND": "LAND_VALUE",
+    "AV_BLDG": "BLDG_VALUE",
+    "LU": "LAND_USE",
+    "R_BDRMS": "BED_RMS",
+    "R_FULL_BTH": "FULL_BTH",
+    "R_HALF_BTH": "HLF_BTH",
+    "R_INT_CND": "INT_COND",
+    "R_EXT_CND": "EXT_COND",
+    "R_OVRALL_CND": "OVERALL_COND",
+    "R_KITCH": "KITCHENS",
+    "R_TOTAL_RMS": "TT_RMS",
+}
+_YEAR_SUFFIX = re.compile(r"_(19|20)\d\d$")
+
+HISTORY_COLUMNS = [
+    "TOTAL_VALUE",
+    "LAND_VALUE",
+    "BLDG_VALUE",
+    "LAND_USE",
+    "LIVING_AREA",
+    "GROSS_AREA",
+    "LAND_SF",
+    "YR_BUILT",
+    "YR_REMODEL",
+    "BED_RMS",
+    "FULL_BTH",
+    "HLF_BTH",
+    "OVERALL_COND",
+    "INT_COND",
+    "EXT_COND",
+]
+
+
+def canonical_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename one year's snapshot to the store's column names
+    (TOTAL_VALUE_2025 -> TOTAL_VALUE, AV_TOTAL -> TOTAL_VALUE, ...)."""
+    names = {}
+    for c in df.columns:
+        name = _YEAR_SUFFIX.sub("", c.strip().upper())
+        names[c] = COLUMN_ALIASES.get(name, name)
+    out = df.rename(columns=names)
+    return out.loc[:, ~out.columns.duplicated()]
+
+
+def _parse_numeric(s: pd.Series) -> Optional[np.ndarray]:
+    """float64 values if every non-empty cell is a number ("1,150" too)."""
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        s = s.astype("string").str.replace(",", "", regex=False).str.strip()
+        s = s.mask(s == "")
+    v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.isfinite(v).sum() != s.notna().sum():
+        return None
+    return v
+
+
+def _changed(a: np.ndarray, b: np.ndarray, kind: str) -> np.ndarray:
+    if kind == "cat":
+        return a != b
+    return ~((a == b) | (np.isnan(a) & np.isnan(b)))
+
+
+class AssessmentHistory:
+    """Multi-year assessment snapshots as one base year plus sparse deltas.
+
+    Every parcel ever seen gets one row (keyed by PID). The base year (the
+    latest by default, since it is read most) is stored in full, one array
+    per column; each other year keeps only the rows whose value differs from
+    the base, per column, plus a presence mask. String columns are
+    dictionary-encoded into int32 codes shared by all years (-1 = missing).
+    An as-of read is a copy of the base column plus one scatter; a point
+    lookup is a binary search per (year, column).
+    """
+
+    def __init__(
+        self,
+        pids: np.ndarray,
+        base_year: int,
+        years: List[int],
+        kinds: Dict[str, str],
+        categories: Dict[str, List[str]],
+        base: Dict[str, np.ndarray],
+        present: Dict[int, np.ndarray],
+        deltas: Dict[int, Dict[str, tuple]],
+    ):
+        self.pids = pids
+        self.base_year = int(base_year)
+        self.years = sorted(int(y) for y in years)
+        self.kinds = kinds
+        self.categories = categories
+        self.columns = list(kinds)
+        self.base = base
+        self.present = present
+        self.deltas = deltas
+        self._pid_pos = {pid_key(p): i for i, p in enumerate(pids.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.pids)
+
+    @classmethod
+    def build(
+        cls,
+        frames: Dict[int, pd.DataFrame],
+        columns: Optional[Sequence[str]] = None,
+        base_year: Optional[int] = None,
+    ) -> "AssessmentHistory":
+        """Build from {fiscal year: snapshot frame with a PID column}."""
+        if not frames:
+            raise ValueError("no snapshots given")
+        years = sorted(frames)
+        base_year = years[-1] if base_year is None else int(base_year)
+        if base_year not in frames:
+            raise ValueError(f"base year {base_year} is not among {years}")
+
+        snaps = {}
+        # PIDs as written ("0100001000"); pid_key only matches them up
+        written: Dict[str, str] = {}
+        for y in years:
+            df = canonical_columns(frames[y])
+            if "PID" not in df.columns:
+                raise ValueError(f"FY{y} snapshot has no PID column")
+            keys = df["PID"].map(pid_key)
+            last = ~keys.duplicated(keep="last")
+            snaps[y] = df[last].set_index(keys[last])
+            if df["PID"].dtype == object or pd.api.types.is_string_dtype(
+                df["PID"].dtype
+            ):
+                text = df["PID"][last].astype("string").str.strip()
+                ok = text.notna()
+                # the latest snapshot's spelling wins
+                written.update(zip(keys[last][ok].tolist(), text[ok].tolist()))
+
+        wanted = HISTORY_COLUMNS if columns is None else list(columns)
+        cols = [c for c in wanted if any(c in s.columns for s in snaps.values())]
+
+        # PID universe: base year order first, then parcels only seen earlier
+        order = list(snaps[base_year].index)
+        seen = set(order)
+        for y in reversed(years):
+            for k in snaps[y].index:
+                if k not in seen:
+                    seen.add(k)
+                    order.append(k)
+        universe = pd.Index(order)
+        n = len(universe)
+
+        kinds: Dict[str, str] = {}
+        for c in cols:
+            parsed = {}
+            for y in years:
+                if c in snaps[y].columns:
+                    parsed[y] = _parse_numeric(snaps[y][c])
+            kinds[c] = "num" if all(v is not None for v in parsed.values()) else "cat"
+
+        categories: Dict[str, List[str]] = {}
+        for c in cols:
+            if kinds[c] == "cat":
+                vals = set()
+                for y in years:
+                    if c in snaps[y].columns:
+                        s = snaps[y][c].dropna().astype(str).str.strip()
+                        vals.update(s[s != ""].tolist())
+                categories[c] = sorted(vals)
+
+        def dense(y: int) -> Dict[str, np.ndarray]:
+            s = snaps[y]
+            pos = universe.get_indexer(s.index)
+            out = {}
+            for c in cols:
+                if kinds[c] == "num":
+                    col = np.full(n, np.nan)
+                    if c in s.columns:
+                        col[pos] = _parse_numeric(s[c])
+                else:
+                    col = np.full(n, -1, dtype=np.int32)
+                    if c in s.columns:
+                        v = s[c].astype("string").str.strip()
+                        col[pos] = pd.Categorical(
+                            v.mask(v == ""), categories=categories[c]
+                        ).codes
+                out[c] = col
+            return out
+
+        present = {}
+        for y in years:
+            m = np.zeros(n, dtype=bool)
+            m[universe.get_indexer(snaps[y].index)] = True
+            present[y] = m
+
+        # only one non-base year is held densely at a time
+        base = dense(base_year)
+        deltas: Dict[int, Dict[str, tuple]] = {}
+        for y in years:
+            if y == base_year:
+                continue
+            cur = dense(y)
+            deltas[y] = {}
+            for c in cols:
+                # rows absent that year are never read, so they need no delta
+                diff = _changed(cur[c], base[c], kinds[c]) & present[y]
+                rows = np.flatnonzero(diff)
+                deltas[y][c] = (rows.astype(np.int32), cur[c][rows])
+
+        return cls(
+            pids=np.asarray([written.get(k, k) for k in order], dtype=str),
+            base_year=base_year,
+            years=years,
+            kinds=kinds,
+            categories=categories,
+            base=base,
+            present=present,
+            deltas=deltas,
+        )
+
+    # ------------------------------------------------------------------
+    # reads
+    # ------------------------------------------------------------------
+
+    def row_of_pid(self, pid: Any) -> Optional[int]:
+        return self._pid_pos.get(pid_key(pid))
+
+    def _check(self, year: int, column: Optional[str] = None) -> None:
+        if year not in self.present:
+            raise KeyError(f"no FY{year} snapshot (have {self.years})")
+        if column is not None and column not in self.kinds:
+            raise KeyError(f"unknown history column: {column}")
+
+    def codes_as_of(self, column: str, year: int) -> np.ndarray:
+        """Raw column for one year over all rows (float64 or int32 codes)."""
+        self._check(year, column)
+        out = self.base[column].copy()
+        if year != self.base_year:
+            rows, vals = self.deltas[year][column]
+            out[rows] = vals
+        return out
+
+    def column_as_of(self, column: str, year: int) -> np.ndarray:
+        """Decoded column for one year, aligned with `pids`; NaN/None where
+        the parcel is absent or the value missing."""
+        out = self.codes_as_of(column, year)
+        absent = ~self.present[year]
+        if self.kinds[column] == "num":
+            out[absent] = np.nan
+            return out
+        out[absent] = -1
+        cats = np.asarray(self.categories[column] + [None], dtype=object)
+        return cats[out]
+
+    def frame_as_of(
+        self, year: int, columns: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """The FY`year` snapshot as a frame (parcels present that year)."""
+        self._check(year)
+        keep = self.present[year]
+        data = {"PID": self.pids[keep]}
+        for c in columns or self.columns:
+            data[c] = self.column_as_of(c, year)[keep]
+        return pd.DataFrame(data)
+
+    def _value(self, column: str, year: int, i: int) -> Any:
+        v = self.base[column][i]
+        if year != self.base_year:
+            rows, vals = self.deltas[year][column]
+            j = np.searchsorted(rows, i)
+            if j < len(rows) and rows[j] == i:
+                v = vals[j]
+        if self.kinds[column] == "num":
+            return float(v) if np.isfinite(v) else None
+        return self.categories[column][v] if v >= 0 else None
+
+    def history(
+        self, pid: Any, columns: Optional[Sequence[str]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """One record per year the parcel was assessed, oldest first."""
+        i = self.row_of_pid(pid)
+        if i is None:
+            return None
+        cols = [c for c in (columns or self.columns) if c in self.kinds]
+        return [
+            {"year": y, **{c: self._value(c, y, i) for c in cols}}
+            for y in self.years
+            if self.present[y][i]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        n_delta = sum(len(r) for d in self.deltas.values() for r, _ in d.values())
+        return {
+            "parcels": len(self.pids),
+            "years": self.years,
+            "baseYear": self.base_year,
+            "columns": len(self.columns),
+            "deltaCells": int(n_delta),
+            "denseCells": len(self.pids) * len(self.columns) * len(self.years),
+        }
+
+    # ------------------------------------------------------------------
+    # persistence: manifest.json + arrays.npz (no pickled objects)
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        d = Path(directory)
+        d.mkdir(parents=True, exist_ok=True)
+        arrays = {"pids": self.pids}
+        for c, v in self.base.items():
+            arrays[f"base__{c}"] = v
+        for y, m in self.present.items():
+            arrays[f"present__{y}"] = m
+        for y, cols in self.deltas.items():
+            for c, (rows, vals) in cols.items():
+                arrays[f"delta__{y}__{c}__rows"] = rows
+                arrays[f"delta__{y}__{c}__values"] = vals
+        tmp = d / "arrays.tmp.npz"
+        np.savez(tmp, **arrays)
+        tmp.replace(d / "arrays.npz")
+        manifest = {
+            "version": STORE_VERSION,
+            "base_year": self.base_year,
+            "years": self.years,
+            "columns": {
+                c: {
+                    "kind": k,
+                    **({"categories": self.categories[c]} if k == "cat" else {}),
+                }
+                for c, k in self.kinds.items()
+            },
+        }
+        with open(d / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+
+    @classmethod
+    def load(cls, directory: str) -> "AssessmentHistory":
+        d = Path(directory)
+        with open(d / "manifest.json", encoding="utf-8") as f:
+            man = json.load(f)
+        if int(man.get("version", 0)) != STORE_VERSION:
+            raise ValueError(f"Unsupported assessment history version in {d}")
+        with np.load(d / "arrays.npz", allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        years = [int(y) for y in man["years"]]
+        base_year = int(man["base_year"])
+        kinds = {c: spec["kind"] for c, spec in man["columns"].items()}
+        return cls(
+            pids=arrays["pids"],
+            base_year=base_year,
+            years=years,
+            kinds=kinds,
+            categories={
+                c: spec["categories"]
+                for c, spec in man["columns"].items()
+                if spec["kind"] == "cat"
+            },
+            base={c: arrays[f"base__{c}"] for c in kinds},
+            present={y: arrays[f"present__{y}"] for y in years},
+            deltas={
+                y: {
+                    c: (
+                        arrays[f"delta__{y}__{c}__rows"],
+                        arrays[f"delta__{y}__{c}__values"],
+                    )
+                    for c in kinds
+                }
+                for y in years
+                if y != base_year
+            },
+        )
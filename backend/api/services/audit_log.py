@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from api.utils.fast_json import dumps
+
+AUDIT_VERSION = 2
+
+# fields copied from the predict output into the record
+OUTPUT_FIELDS = [
+    "predictedPrice",
+    "finalPrice",
+    "assessPrice",
+    "residual",
+    "snappedLat",
+    "snappedLng",
+]
+
+
+class AuditLog:
+    """Append-only valuation log written off the request path.
+
+    `record()` only puts a dict on a bounded queue. A daemon thread takes up
+    to `batch_size` records (or whatever arrived within `flush_interval_s`),
+    encodes them as JSON lines and appends them to the current file as one
+    gzip member, so a crash loses at most the batch in flight and every file
+    stays readable. Files rotate at `max_file_mb` compressed bytes.
+
+    When the queue is full the "drop" policy discards the record, "block"
+    waits up to `block_timeout_s` and then discards; both are counted.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval_s: float = 1.0,
+        max_file_mb: float = 64.0,
+        policy: str = "drop",
+        block_timeout_s: float = 0.05,
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"unknown audit queue policy: {policy}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = int(batch_size)
+        self.flush_interval_s = float(flush_interval_s)
+        self.max_file_bytes = int(max_file_mb * 1024 * 1024)
+        self.policy = policy
+        self.block_timeout_s = float(block_timeout_s)
+
+        self._q: "queue.Queue" = queue.Queue(maxsize=int(queue_size))
+        self._stop = threading.Event()
+        self._path: Optional[Path] = None
+        self._seq = 0
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.batches = 0
+        self.files = 0
+        self.last_flush_at: Optional[float] = None
+
+        self._thread = threading.Thread(
+            target=self._run, name="irea-audit", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, default_dir: str) -> Optional["AuditLog"]:
+        directory = os.getenv("IREA_AUDIT_DIR", default_dir)
+        if not directory or directory.lower() in ("off", "none", "0"):
+            return None
+        return cls(
+            directory,
+            queue_size=int(os.getenv("IREA_AUDIT_QUEUE", "10000")),
+            batch_size=int(os.getenv("IREA_AUDIT_BATCH", "500")),
+            max_file_mb=float(os.getenv("IREA_AUDIT_FILE_MB", "64")),
+            policy=os.getenv("IREA_AUDIT_POLICY", "drop"),
+        )
+
+    # ---- request side ----
+
+    def record(
+        self,
+        payload: Dict[str, Any],
+        out: Dict[str, Any],
+        latency_ms: Optional[float] = None,
+        model: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Queue one valuation; `model` is the serving ModelStore.fingerprint
+        (file paths and content hashes), so a record names the exact models."""
+        meta = out.get("meta") or {}
+        rec = {
+            "v": AUDIT_VERSION,
+            "id": uuid.uuid4().hex,
+            "ts": time.time(),
+            "payload": payload,
+            "pid": meta.get("pid"),
+            "assessSource": meta.get("assess_source"),
+            "latencyMs": latency_ms,
+            "model": model,
+        }
+        for k in OUTPUT_FIELDS:
+            rec[k] = out.get(k)
+
+        try:
+            if self.policy == "block":
+                self._q.put(rec, timeout=self.block_timeout_s)
+            else:
+                self._q.put_nowait(rec)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    # ---- writer side ----
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        try:
+            batch.append(self._q.get(timeout=self.flush_interval_s))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval_s
+        while len(batch) < self.batch_size:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _current_path(self) -> Path:
+        if self._path is None or (
+            self._path.exists() and self._path.stat().st_size >= self.max_file_bytes
+        ):
+            self._seq += 1
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            self._path = (
+                self.directory / f"audit-{stamp}-{os.getpid()}-{self._seq:04d}.jsonl.gz"
+            )
+            self.files += 1
+        return self._path
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        data = b"".join(dumps(r) + b"\n" for r in batch)
+        try:
+            with open(self._current_path(), "ab") as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_at = time.time()
+        except Exception as e:
+            self.write_errors += 1
+            self.dropped += len(batch)
+            print(f"[ERROR] audit write failed: {e}")
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._q.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop the writer."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "policy": self.policy,
+            "queued": self._q.qsize(),
+            "queue_size": self._q.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "batches": self.batches,
+            "files": self.files,
+            "current_file": str(self._path) if self._path else None,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+def audit_files(paths: Iterable[str]) -> List[Path]:
+    """Expand directories to their audit files, oldest first."""
+    out: List[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            out.extend(sorted(p.glob("audit-*.jsonl.gz")))
+        else:
+            out.append(p)
+    return out
+
+
+def read_audit(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield records from audit files or directories, for replay/offline eval."""
+    for p in audit_files(paths):
+        with gzip.open(p, "rb") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except EOFError:
+                # file still being written, or truncated by a crash
+                continue
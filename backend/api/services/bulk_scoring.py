@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import csv
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from api.utils.geo_guard import in_boston_many
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+CONTENT_TYPE_ALIASES = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-arrow": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "text/csv": "csv",
+}
+
+LAT_CANDIDATES = ["latitude", "LATITUDE", "lat"]
+LNG_CANDIDATES = ["longitude", "LONGITUDE", "lng", "lon"]
+
+# what Arrow's string -> float64 cast accepts; anything else becomes null
+NUMBER_RE = r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$"
+
+OUTPUT_SCHEMA = [
+    ("ok", pa.bool_()),
+    ("pid", pa.string()),
+    ("snappedLat", pa.float64()),
+    ("snappedLng", pa.float64()),
+    ("assessPrice", pa.float64()),
+    ("residual", pa.float64()),
+    ("finalPrice", pa.float64()),
+]
+
+
+def detect_format(content_type: Optional[str], fmt: Optional[str]) -> Optional[str]:
+    if fmt:
+        fmt = fmt.strip().lower()
+        return fmt if fmt in MEDIA_TYPES else None
+    ct = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_ALIASES.get(ct)
+
+
+@dataclass
+class BulkJob:
+    id: str
+    format: str
+    status: str = "running"
+    rows_done: int = 0
+    rows_ok: int = 0
+    batches_done: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        end = self.finished_at or time.time()
+        d["elapsed_s"] = end - self.started_at
+        d["rows_per_s"] = self.rows_done / d["elapsed_s"] if d["elapsed_s"] else 0.0
+        return d
+
+
+class BulkJobRegistry:
+    """Progress of recent bulk jobs, bounded to the last max_jobs."""
+
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = int(max_jobs)
+        self._jobs: "OrderedDict[str, BulkJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, fmt: str) -> BulkJob:
+        job = BulkJob(id=uuid.uuid4().hex[:16], format=fmt)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken incrementally."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        b = bytes(b)
+        self._chunks.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _csv_header(path: str) -> List[str]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def open_record_batches(
+    path: str, fmt: str, batch_rows: int
+) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """Schema of the input and an iterator over its batches in that schema.
+
+    CSV columns are all read as text: Arrow infers CSV types from the first
+    block only, so a later "1,150" in an integer column would fail the read.
+    """
+    if fmt == "parquet":
+        f = pq.ParquetFile(path)
+        return f.schema_arrow, f.iter_batches(batch_size=batch_rows)
+
+    if fmt == "arrow":
+        src = pa.memory_map(path, "r")
+        try:
+            reader = ipc.open_stream(src)
+            schema, batches = reader.schema, iter(reader)
+        except pa.ArrowInvalid:
+            src.seek(0)
+            f = ipc.open_file(src)
+            schema = f.schema
+            batches = (f.get_batch(i) for i in range(f.num_record_batches))
+
+        def sliced():
+            with src:
+                for b in batches:
+                    for off in range(0, b.num_rows, batch_rows):
+                        yield b.slice(off, batch_rows)
+
+        return schema, sliced()
+
+    if fmt == "csv":
+        names = _csv_header(path)
+        schema = pa.schema([(c, pa.string()) for c in names])
+        # block_size bounds each batch in bytes rather than rows
+        opts = pacsv.ReadOptions(block_size=max(1 << 20, batch_rows * 256))
+        conv = pacsv.ConvertOptions(column_types=schema)
+        return schema, iter(
+            pacsv.open_csv(path, read_options=opts, convert_options=conv)
+        )
+
+    raise ValueError(f"unsupported format: {fmt}")
+
+
+def _find_column(batch: pa.RecordBatch, names) -> Optional[str]:
+    cols = set(batch.schema.names)
+    return next((c for c in names if c in cols), None)
+
+
+def _coordinates(col: pa.Array) -> np.ndarray:
+    """Coordinate column as float64, NaN where a value is not a number."""
+    try:
+        num = pc.cast(col, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # text such as "abc" or "" fails the cast for the whole column
+        txt = pc.cast(col, pa.string())
+        keep = pc.match_substring_regex(txt, NUMBER_RE)
+        num = pc.cast(pc.if_else(keep, txt, pa.scalar(None, pa.string())), pa.float64())
+    return np.asarray(num.to_numpy(zero_copy_only=False), dtype=float)
+
+
+def score_record_batch(store, assess_table, batch: pa.RecordBatch) -> pa.RecordBatch:
+    """Snap + baseline + residual for one batch; input columns pass through."""
+    lat_col = _find_column(batch, LAT_CANDIDATES)
+    lng_col = _find_column(batch, LNG_CANDIDATES)
+    if lat_col is None or lng_col is None:
+        raise ValueError("input needs latitude/longitude columns")
+
+    n = batch.num_rows
+    lat = _coordinates(batch.column(lat_col))
+    lng = _coordinates(batch.column(lng_col))
+    inside = in_boston_many(lat, lng)
+
+    pid = np.full(n, None, dtype=object)
+    out = {name: np.full(n, np.nan) for name, _ in OUTPUT_SCHEMA[2:]}
+
+    if inside.any():
+        rows, _, _ = assess_table.snap_many(lat[inside], lng[inside])
+        scored = store.predict_frame(rows)
+        out["snappedLat"][inside] = rows["LATITUDE"].to_numpy(dtype=float)
+        out["snappedLng"][inside] = rows["LONGITUDE"].to_numpy(dtype=float)
+        for k in ("assessPrice", "residual", "finalPrice"):
+            out[k][inside] = scored[k].to_numpy(dtype=float)
+        if "PID" in rows.columns:
+            pid[inside] = rows["PID"].astype("string").to_numpy(dtype=object)
+    # a row is ok when it produced a price, not merely when it is in Boston
+    ok = np.isfinite(out["finalPrice"])
+
+    arrays = list(batch.columns)
+    names = list(batch.schema.names)
+    for name, typ in OUTPUT_SCHEMA:
+        if name == "ok":
+            arr = pa.array(ok, type=typ)
+        elif name == "pid":
+            arr = pa.array(pid, type=typ)
+        else:
+            arr = pa.array(out[name], type=typ, from_pandas=True)
+        if name in names:
+            arrays[names.index(name)] = arr
+        else:
+            arrays.append(arr)
+            names.append(name)
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def output_schema(input_schema: pa.Schema) -> pa.Schema:
+    """Schema of score_record_batch's output for input in `input_schema`."""
+    fields = list(input_schema)
+    names = list(input_schema.names)
+    for name, typ in OUTPUT_SCHEMA:
+        if name in names:
+            fields[names.index(name)] = pa.field(name, typ)
+        else:
+            fields.append(pa.field(name, typ))
+            names.append(name)
+    return pa.schema(fields)
+
+
+def _conform(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    if batch.schema.equals(schema):
+        return batch
+    return pa.RecordBatch.from_arrays(
+        [pc.cast(batch.column(f.name), f.type) for f in schema], schema=schema
+    )
+
+
+def _open_writer(fmt: str, sink: _DrainSink, schema: pa.Schema):
+    if fmt == "arrow":
+        return ipc.new_stream(sink, schema)
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema)
+    if fmt == "csv":
+        return pacsv.CSVWriter(sink, schema)
+    raise ValueError(f"unsupported format: {fmt}")
+
+
+def stream_scored(
+    path: str,
+    fmt: str,
+    store,
+    assess_table,
+    job: BulkJob,
+    batch_rows: int = 20000,
+) -> Iterator[bytes]:
+    """Score the spooled input batch by batch, yielding encoded output as it goes.
+
+    Only one input batch and its scored copy are alive at a time. Every batch
+    is cast to the schema declared from the input up front, so the writer
+    sees one schema throughout.
+    """
+    sink = _DrainSink()
+    writer = None
+    try:
+        input_schema, batches = open_record_batches(path, fmt, batch_rows)
+        schema = output_schema(input_schema)
+        writer = _open_writer(fmt, sink, schema)
+        for batch in batches:
+            scored = _conform(score_record_batch(store, assess_table, batch), schema)
+
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([scored]))
+            else:
+                writer.write_batch(scored)
+
+            job.rows_done += scored.num_rows
+            job.rows_ok += int(pc.sum(scored.column("ok")).as_py() or 0)
+            job.batches_done += 1
+
+            data = sink.drain()
+            if data:
+                yield data
+
+        if writer is not None:
+            writer.close()
+        data = sink.drain()
+        if data:
+            yield data
+        job.status = "done"
+    except GeneratorExit:
+        job.status = "cancelled"
+        raise
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)[:400]
+        print(f"[ERROR] bulk job {job.id} failed: {job.error}")
+        raise
+    finally:
+        job.finished_at = time.time()
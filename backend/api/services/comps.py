@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from api.services.assess_table import pid_key
+from api.services.spatial_index import SpatialIndex
+
+COMP_FEATURES = ["LIVING_AREA", "BED_RMS", "FULL_BTH", "YR_BUILT"]
+
+# relative weight of each normalized feature difference in the score
+COMP_WEIGHTS = np.array([1.0, 0.5, 0.5, 0.25], dtype=np.float32)
+
+# distance (m) that costs as much as one std of feature difference
+DEFAULT_DISTANCE_SCALE_M = 400.0
+
+# geographic candidates re-ranked per query
+DEFAULT_CANDIDATES = 64
+
+# sale age (years before the newest indexed sale) that costs as much as one
+# std of feature difference
+DEFAULT_RECENCY_SCALE_Y = 5.0
+
+PRICE_CANDIDATES = ["consideration", "sale_price", "price"]
+
+
+def _numeric(s: pd.Series) -> pd.Series:
+    if s.dtype == "object" or str(s.dtype).startswith("string"):
+        s = s.astype("string").str.replace(",", "", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _optional_numeric(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return _numeric(df[col])
+
+
+@dataclass
+class CompsIndex:
+    """Prebuilt index over deed sales matched to assessment parcels.
+
+    Sales are joined to the assessment table by PID once, at build time, so a
+    query is one KD-tree lookup plus a re-rank of a few dozen candidates.
+    """
+
+    pid: np.ndarray
+    price: np.ndarray
+    sale_year: np.ndarray
+    sale_month: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    feats: np.ndarray
+    feat_scale: np.ndarray
+    index: SpatialIndex
+
+    def __post_init__(self):
+        # sale time in fractional years (mid-year when the month is unknown)
+        month = np.where(np.isfinite(self.sale_month), self.sale_month - 1, 5.5)
+        self._sale_time = self.sale_year + month / 12.0
+        known = np.isfinite(self._sale_time)
+        self._newest = float(self._sale_time[known].max()) if known.any() else np.nan
+
+    @classmethod
+    def build(
+        cls, sales: pd.DataFrame, assess_df: Optional[pd.DataFrame] = None
+    ) -> "CompsIndex":
+        """Build from matched sales.
+
+        Coordinates and COMP_FEATURES are joined from assess_df by PID; pass
+        None when the sales table already carries them (train_residual.csv).
+        """
+        if "PID" not in sales.columns:
+            raise ValueError("sales table needs a PID column")
+        price_col = next((c for c in PRICE_CANDIDATES if c in sales.columns), None)
+        if price_col is None:
+            raise ValueError(f"sales table needs one of {PRICE_CANDIDATES}")
+
+        s = pd.DataFrame(
+            {
+                "PID": sales["PID"].astype("string"),
+                "price": _numeric(sales[price_col]),
+                "sale_year": _optional_numeric(sales, "sale_year"),
+                "sale_month": _optional_numeric(sales, "sale_month"),
+            }
+        )
+        s = s[s["price"] > 0]
+
+        if assess_df is not None:
+            a_cols = ["PID", "LATITUDE", "LONGITUDE"] + [
+                c for c in COMP_FEATURES if c in assess_df.columns
+            ]
+            a = assess_df[a_cols].copy()
+            a["PID"] = a["PID"].astype("string")
+            a = a.drop_duplicates(subset=["PID"])
+            m = s.merge(a, on="PID", how="inner")
+        else:
+            missing = [c for c in ["LATITUDE", "LONGITUDE"] if c not in sales.columns]
+            if missing:
+                raise ValueError(f"sales table without assess_df needs {missing}")
+            m = s.join(
+                sales[
+                    ["LATITUDE", "LONGITUDE"]
+                    + [c for c in COMP_FEATURES if c in sales.columns]
+                ].apply(_numeric)
+            )
+        m = m.dropna(subset=["LATITUDE", "LONGITUDE"]).reset_index(drop=True)
+        if len(m) == 0:
+            raise ValueError("no sales matched the assessment table by PID")
+
+        feats = np.full((len(m), len(COMP_FEATURES)), np.nan, dtype=np.float32)
+        for j, c in enumerate(COMP_FEATURES):
+            if c in m.columns:
+                feats[:, j] = _numeric(m[c]).to_numpy(dtype=np.float32)
+
+        scale = np.nanstd(feats, axis=0)
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+
+        lat = m["LATITUDE"].to_numpy(dtype=np.float64)
+        lng = m["LONGITUDE"].to_numpy(dtype=np.float64)
+
+        return cls(
+            pid=m["PID"].to_numpy(dtype=object),
+            price=m["price"].to_numpy(dtype=np.float64),
+            sale_year=m["sale_year"].to_numpy(dtype=np.float64),
+            sale_month=m["sale_month"].to_numpy(dtype=np.float64),
+            lat=lat,
+            lng=lng,
+            feats=feats,
+            feat_scale=scale.astype(np.float32),
+            index=SpatialIndex(lat, lng),
+        )
+
+    @classmethod
+    def load(
+        cls, csv_path: str, assess_df: Optional[pd.DataFrame] = None
+    ) -> "CompsIndex":
+        p = Path(csv_path)
+        if not p.exists():
+            raise FileNotFoundError(f"Sales table not found: {p}")
+        sales = pd.read_csv(p, low_memory=False)
+        return cls.build(sales, assess_df)
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def query(
+        self,
+        lat: float,
+        lng: float,
+        target: Dict[str, Any],
+        k: int = 5,
+        max_distance_m: Optional[float] = None,
+        exclude_pid: Optional[str] = None,
+        since_year: Optional[int] = None,
+        distance_scale_m: float = DEFAULT_DISTANCE_SCALE_M,
+        recency_scale_y: Optional[float] = DEFAULT_RECENCY_SCALE_Y,
+        candidates: int = DEFAULT_CANDIDATES,
+    ) -> List[Dict[str, Any]]:
+        """k best comps near (lat, lng), ranked by distance, feature match
+        and sale age.
+
+        `exclude_pid` drops sales of the subject parcel itself; `since_year`
+        keeps sales from that year on (sales without a year are dropped).
+        The nearest-neighbour search widens until `candidates` sales pass
+        these filters (or the index or `max_distance_m` runs out), so a
+        filter that removes most nearby sales still finds k farther ones.
+        `recency_scale_y=None` ranks without sale age.
+        """
+        want = max(int(k) * 4, int(candidates))
+        n_cand = want
+        while True:
+            idx, dist = self.index.nearest(lat, lng, k=n_cand)
+            keep = np.ones(len(idx), dtype=bool)
+            if max_distance_m is not None:
+                keep &= dist <= float(max_distance_m)
+            if since_year is not None:
+                keep &= self.sale_year[idx] >= int(since_year)
+            if exclude_pid is not None:
+                key = pid_key(exclude_pid)
+                keep &= np.array([pid_key(p) != key for p in self.pid[idx]], dtype=bool)
+            exhausted = len(idx) >= len(self) or (
+                max_distance_m is not None and dist[-1] > float(max_distance_m)
+            )
+            if keep.sum() >= want or exhausted:
+                break
+            n_cand *= 4
+        idx, dist = idx[keep], dist[keep]
+        if len(idx) == 0:
+            return []
+
+        t = np.array(
+            [_to_float(target.get(c)) for c in COMP_FEATURES], dtype=np.float32
+        )
+        diff = (self.feats[idx] - t) / self.feat_scale
+        # unknown on either side: charge one std rather than ignore it
+        diff = np.where(np.isfinite(diff), diff, 1.0)
+        score = (dist / distance_scale_m) ** 2 + (diff**2) @ COMP_WEIGHTS
+        if recency_scale_y:
+            age = self._newest - self._sale_time[idx]
+            score += np.where(np.isfinite(age), age / recency_scale_y, 1.0) ** 2
+
+        order = np.argsort(score, kind="stable")[: int(k)]
+        out = []
+        for o in order:
+            i = int(idx[o])
+            out.append(
+                {
+                    "pid": self.pid[i],
+                    "salePrice": float(self.price[i]),
+                    "saleYear": _int_or_none(self.sale_year[i]),
+                    "saleMonth": _int_or_none(self.sale_month[i]),
+                    "lat": float(self.lat[i]),
+                    "lng": float(self.lng[i]),
+                    "distanceM": float(dist[o]),
+                    "score": float(score[o]),
+                    **{
+                        c: _float_or_none(self.feats[i, j])
+                        for j, c in enumerate(COMP_FEATURES)
+                    },
+                }
+            )
+        return out
+
+
+def _to_float(v: Any) -> float:
+    try:
+        if isinstance(v, str):
+            v = v.replace(",", "")
+        return float(v)
+    except Exception:
+        return float("nan")
+
+
+def _float_or_none(v: Any) -> Optional[float]:
+    v = float(v)
+    return v if np.isfinite(v) else None
+
+
+def _int_or_none(v: Any) -> Optional[int]:
+    v = float(v)
+    return int(v) if np.isfinite(v) else None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# stages of ModelStore.predict, in order; feature building is timed with the
+# model call it feeds
+STAGES = ["snap", "baseline", "residual"]
+
+HEADER = "X-Deadline-Ms"
+
+
+class Deadline:
+    """Latency budget of one request, checked between predict stages.
+
+    `affords(*stages)` compares the time left with the policy's running
+    estimate of those stages; `mark(stage)` closes a stage and feeds its
+    duration back into the estimate. The budget runs from `start` (the
+    request's arrival, so queueing counts against it); stage timing starts
+    when the deadline is created.
+    """
+
+    __slots__ = ("policy", "budget_s", "start", "_last")
+
+    def __init__(
+        self, policy: "DeadlinePolicy", budget_s: float, start: Optional[float] = None
+    ):
+        self.policy = policy
+        self.budget_s = float(budget_s)
+        self._last = time.perf_counter()
+        self.start = self._last if start is None else float(start)
+
+    def left(self) -> float:
+        return self.budget_s - (time.perf_counter() - self.start)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000.0
+
+    def affords(self, *stages: str) -> bool:
+        return self.left() >= sum(self.policy.estimate(s) for s in stages)
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.policy.record(stage, now - self._last)
+        self._last = now
+
+
+class DeadlinePolicy:
+    """Per-worker deadline settings, stage cost estimates and counters.
+
+    The budget comes from the request header (X-Deadline-Ms) or, failing
+    that, `default_ms`; 0 disables deadlines. Header budgets are capped at
+    `max_ms`. Stage costs are EWMAs of recent timings, so a slow period
+    raises the estimate and degrades earlier instead of overrunning. A
+    skipped stage is not timed, so each skip decays its estimate instead;
+    otherwise one slow spell would keep degrading every later request.
+    """
+
+    def __init__(self, default_ms: float = 0.0, max_ms: float = 10_000.0, alpha=0.1):
+        self.default_ms = float(default_ms)
+        self.max_ms = float(max_ms)
+        self.alpha = float(alpha)
+        self._lock = threading.Lock()
+        self._cost_s: Dict[str, Optional[float]] = {s: None for s in STAGES}
+        self.requests = 0
+        self.degraded = 0
+        self.by_mode: Dict[str, int] = {}
+        self.by_stage: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "DeadlinePolicy":
+        return cls(
+            default_ms=float(os.getenv("IREA_PREDICT_DEADLINE_MS", "0")),
+            max_ms=float(os.getenv("IREA_PREDICT_DEADLINE_MAX_MS", "10000")),
+        )
+
+    def start(
+        self, header: Optional[str] = None, arrival: Optional[float] = None
+    ) -> Optional[Deadline]:
+        """Deadline for a request (None: no budget applies).
+
+        `arrival` is the perf_counter() time the request came in (recorded by
+        AdmissionMiddleware); the budget runs from now when it is unknown.
+        """
+        ms = self.default_ms
+        if header:
+            try:
+                ms = min(float(header), self.max_ms)
+            except ValueError:
+                pass
+        if not ms > 0:
+            return None
+        return Deadline(self, ms / 1000.0, start=arrival)
+
+    def estimate(self, stage: str) -> float:
+        c = self._cost_s.get(stage)
+        return 0.0 if c is None else c
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            c = self._cost_s.get(stage)
+            self._cost_s[stage] = (
+                seconds if c is None else c + self.alpha * (seconds - c)
+            )
+
+    def observe(self, out: Dict[str, Any]) -> None:
+        """Count one response produced under a deadline."""
+        deg = (out.get("meta") or {}).get("degraded")
+        with self._lock:
+            self.requests += 1
+            if deg:
+                self.degraded += 1
+                self.by_mode[deg["mode"]] = self.by_mode.get(deg["mode"], 0) + 1
+                self.by_stage[deg["stage"]] = self.by_stage.get(deg["stage"], 0) + 1
+                for s in deg["skipped"]:
+                    if self._cost_s.get(s) is not None:
+                        self._cost_s[s] *= 1.0 - self.alpha
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "default_ms": self.default_ms,
+                "requests": self.requests,
+                "degraded": self.degraded,
+                "by_mode": dict(self.by_mode),
+                "by_stage": dict(self.by_stage),
+                "stage_ms": {
+                    s: None if c is None else c * 1000.0
+                    for s, c in self._cost_s.items()
+                },
+            }
+
+
+def skipped_after(stage: str) -> List[str]:
+    return STAGES[STAGES.index(stage) + 1 :]
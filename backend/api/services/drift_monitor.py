@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from api.services.sketches import (
+    BinnedCounts,
+    FrequentItems,
+    QuantileSketch,
+    binned_ks,
+    psi,
+)
+
+REFERENCE_VERSION = 1
+
+# monitored name -> where the live value comes from
+INPUT_NUMERIC = [
+    "latitude",
+    "longitude",
+    "areaSqft",
+    "lotSqft",
+    "bedrooms",
+    "bathrooms",
+    "builtYear",
+    "parkingSpaces",
+]
+OUTPUT_NUMERIC = ["residual", "finalPrice"]
+INPUT_CATEGORICAL = ["renovated"]
+OUTPUT_CATEGORICAL = ["assessSource"]
+
+REPORT_QUANTILES = [0.05, 0.5, 0.95]
+
+# 1% relative error is ~0.4 deg on a coordinate; these need a finer sketch
+SKETCH_REL_ACC = {"latitude": 1e-5, "longitude": 1e-5}
+
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+
+
+def _num(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except Exception:
+        return None
+    return f if np.isfinite(f) else None
+
+
+class _FeatureState:
+    def __init__(self, name: str, ref: Optional[Dict[str, Any]], kind: str):
+        self.name = name
+        self.ref = ref
+        self.kind = kind
+        if kind == "numeric":
+            self.sketch = QuantileSketch(rel_acc=SKETCH_REL_ACC.get(name, 0.01))
+            self.bins = BinnedCounts(ref["edges"]) if ref else None
+        else:
+            self.items = FrequentItems()
+
+    def add(self, v: Any) -> None:
+        if self.kind == "numeric":
+            f = _num(v)
+            if f is None:
+                return
+            self.sketch.add(f)
+            if self.bins is not None:
+                self.bins.add(f)
+        elif v is not None:
+            self.items.add(v)
+
+    def report(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"kind": self.kind}
+        if self.kind == "numeric":
+            out["n"] = self.sketch.n
+            out["live_quantiles"] = dict(
+                zip(map(str, REPORT_QUANTILES), self.sketch.quantiles(REPORT_QUANTILES))
+            )
+            if self.ref is not None:
+                out["ref_quantiles"] = self.ref.get("quantiles")
+            if self.bins is not None and self.bins.n > 0:
+                out["psi"] = psi(self.ref["proportions"], self.bins.counts)
+                out["ks"] = binned_ks(self.ref["proportions"], self.bins.counts)
+        else:
+            out["n"] = self.items.n
+            live = self.items.frequencies()
+            out["live_top"] = dict(sorted(live.items(), key=lambda kv: -kv[1])[:10])
+            if self.ref is not None and self.items.n > 0:
+                ref = self.ref["frequencies"]
+                cats = list(ref)
+                e = [ref[c] for c in cats] + [max(0.0, 1.0 - sum(ref.values()))]
+                a = [live.get(c, 0.0) for c in cats]
+                a.append(max(0.0, 1.0 - sum(a)))
+                out["psi"] = psi(e, a)
+
+        if "psi" in out:
+            p = out["psi"]
+            out["status"] = (
+                "alert" if p >= PSI_ALERT else "warn" if p >= PSI_WARN else "ok"
+            )
+        return out
+
+
+class DriftMonitor:
+    """Online input/output drift monitor with fixed memory.
+
+    Requests hand (payload, output) to a bounded queue and return at once; a
+    daemon thread updates per-feature sketches. Numeric features keep a
+    quantile sketch plus counts over the reference bin edges (for PSI and a
+    binned KS). Categoricals keep Misra-Gries counters. When the queue is full
+    the record is dropped and counted.
+    """
+
+    def __init__(self, reference: Optional[Dict[str, Any]], queue_size: int = 10000):
+        self.reference = reference
+        ref_feats = (reference or {}).get("features", {})
+        self._q: "queue.Queue" = queue.Queue(maxsize=int(queue_size))
+        self._lock = threading.Lock()
+
+        self.features: Dict[str, _FeatureState] = {}
+        for name in INPUT_NUMERIC + OUTPUT_NUMERIC:
+            self.features[name] = _FeatureState(name, ref_feats.get(name), "numeric")
+        for name in INPUT_CATEGORICAL + OUTPUT_CATEGORICAL:
+            self.features[name] = _FeatureState(
+                name, ref_feats.get(name), "categorical"
+            )
+
+        self.observed = 0
+        self.dropped = 0
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="irea-drift", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def load(cls, reference_path: str, queue_size: int = 10000) -> "DriftMonitor":
+        ref = None
+        p = Path(reference_path)
+        if p.exists():
+            with open(p, encoding="utf-8") as f:
+                ref = json.load(f)
+            if int(ref.get("version", 0)) != REFERENCE_VERSION:
+                raise ValueError(f"Unsupported drift reference version in {p}")
+        return cls(ref, queue_size=queue_size)
+
+    def observe(self, payload: Dict[str, Any], out: Dict[str, Any]) -> None:
+        try:
+            self._q.put_nowait((payload, out))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            payload, out = self._q.get()
+            with self._lock:
+                for name in INPUT_NUMERIC + INPUT_CATEGORICAL:
+                    self.features[name].add(payload.get(name))
+                for name in OUTPUT_NUMERIC:
+                    self.features[name].add(out.get(name))
+                meta = out.get("meta") or {}
+                self.features["assessSource"].add(meta.get("assess_source"))
+                self.observed += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            for name, st in list(self.features.items()):
+                self.features[name] = _FeatureState(name, st.ref, st.kind)
+            self.observed = 0
+            self.dropped = 0
+            self.started_at = time.time()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            feats = {name: st.report() for name, st in self.features.items()}
+            return {
+                "has_reference": self.reference is not None,
+                "reference_created": (self.reference or {}).get("created"),
+                "since": self.started_at,
+                "observed": self.observed,
+                "dropped": self.dropped,
+                "queued": self._q.qsize(),
+                "features": feats,
+            }
+
+
+def numeric_reference(values: np.ndarray, n_bins: int = 10) -> Optional[Dict[str, Any]]:
+    v = np.asarray(values, dtype=float)
+    v = v[np.isfinite(v)]
+    if len(v) == 0:
+        return None
+    qs = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = np.unique(np.quantile(v, qs))
+    counts = np.bincount(
+        np.searchsorted(edges, v, side="right"), minlength=len(edges) + 1
+    )
+    return {
+        "kind": "numeric",
+        "n": int(len(v)),
+        "edges": edges.tolist(),
+        "proportions": (counts / counts.sum()).tolist(),
+        "quantiles": {str(q): float(np.quantile(v, q)) for q in REPORT_QUANTILES},
+    }
+
+
+def categorical_reference(values) -> Optional[Dict[str, Any]]:
+    s = [str(x) for x in values if x is not None]
+    if not s:
+        return None
+    keys, counts = np.unique(np.asarray(s, dtype=object), return_counts=True)
+    return {
+        "kind": "categorical",
+        "n": int(counts.sum()),
+        "frequencies": {str(k): float(c / counts.sum()) for k, c in zip(keys, counts)},
+    }
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from api.services.feature_builder import FORBIDDEN, _apply_frontend_aliases
+
+K_ZERO = 1e-35  # LightGBM's kZeroThreshold
+
+# model columns each form field sets (see _apply_frontend_aliases); a None
+# edit restores them to the parcel's values
+FORM_COLUMNS = {
+    "areaSqft": ["LIVING_AREA", "GROSS_AREA"],
+    "lotSqft": ["LAND_SF"],
+    "bedrooms": ["BED_RMS"],
+    "bathrooms": ["FULL_BTH", "HLF_BTH"],
+    "builtYear": ["YR_BUILT"],
+    "parkingSpaces": ["NUM_PARKING"],
+    "renovated": ["HAS_REMODEL"],
+}
+
+# moving the pin means another parcel: start a new session instead
+FIXED_COLUMNS = {"LATITUDE", "LONGITUDE"}
+
+
+class CompiledTree:
+    """One LightGBM tree as flat lists, walked the way LightGBM walks it.
+
+    Children >= 0 are internal nodes, negative children are ~leaf_index.
+    """
+
+    __slots__ = (
+        "feature",
+        "threshold",
+        "cat_set",
+        "left",
+        "right",
+        "default_left",
+        "missing",
+        "leaf_value",
+        "features",
+    )
+
+    def __init__(self, root: Dict[str, Any]):
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.cat_set: List[Optional[frozenset]] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.default_left: List[bool] = []
+        self.missing: List[str] = []
+        self.leaf_value: Dict[int, float] = {}
+
+        if "leaf_index" not in root and "split_feature" not in root:
+            self.leaf_value[0] = float(root.get("leaf_value", 0.0))  # stump
+        else:
+            self._add(root)
+        self.features: Set[int] = set(self.feature)
+
+    def _add(self, node: Dict[str, Any]) -> int:
+        if "leaf_index" in node:
+            self.leaf_value[int(node["leaf_index"])] = float(node["leaf_value"])
+            return ~int(node["leaf_index"])
+        i = len(self.feature)
+        self.feature.append(int(node["split_feature"]))
+        if node["decision_type"] == "==":
+            self.threshold.append(math.nan)
+            self.cat_set.append(
+                frozenset(int(v) for v in str(node["threshold"]).split("||"))
+            )
+        else:
+            self.threshold.append(float(node["threshold"]))
+            self.cat_set.append(None)
+        self.default_left.append(bool(node["default_left"]))
+        self.missing.append(str(node["missing_type"]))
+        self.left.append(0)
+        self.right.append(0)
+        self.left[i] = self._add(node["left_child"])
+        self.right[i] = self._add(node["right_child"])
+        return i
+
+    def leaf(self, x: Sequence[float]) -> int:
+        if not self.feature:
+            return 0
+        i = 0
+        while i >= 0:
+            v = x[self.feature[i]]
+            cats = self.cat_set[i]
+            if cats is not None:
+                # NaN and negative codes always go right
+                go_left = v == v and v >= 0 and int(v) in cats
+            else:
+                missing = self.missing[i]
+                if v != v and missing != "NaN":
+                    v = 0.0
+                if (missing == "Zero" and -K_ZERO <= v <= K_ZERO) or (
+                    missing == "NaN" and v != v
+                ):
+                    go_left = self.default_left[i]
+                else:
+                    go_left = v <= self.threshold[i]
+            i = self.left[i] if go_left else self.right[i]
+        return ~i
+
+
+class TreeIndex:
+    """Compiled trees of one booster plus the feature -> trees map."""
+
+    def __init__(self, booster, categoricals: List[str]):
+        dump = booster.dump_model()
+        if dump.get("average_output") or int(dump.get("num_class", 1)) != 1:
+            raise ValueError("incremental scoring needs a single-output GBDT")
+        self.booster = booster
+        self.feature_names: List[str] = list(dump["feature_names"])
+        self.trees = [CompiledTree(t["tree_structure"]) for t in dump["tree_info"]]
+
+        self.depends: Dict[int, np.ndarray] = {}
+        by_feature: Dict[int, List[int]] = {}
+        for t, tree in enumerate(self.trees):
+            for f in tree.features:
+                by_feature.setdefault(f, []).append(t)
+        for f, ts in by_feature.items():
+            self.depends[f] = np.asarray(ts, dtype=np.int64)
+
+        # pandas categoricals are passed to LightGBM as their index in the
+        # training category list, in column order of the categorical columns
+        cat_cols = [c for c in self.feature_names if c in set(categoricals)]
+        lists = dump.get("pandas_categorical") or [None] * len(cat_cols)
+        self.codes: Dict[int, Optional[Dict[Any, int]]] = {}
+        for c, cats in zip(cat_cols, lists):
+            self.codes[self.feature_names.index(c)] = (
+                None if cats is None else {v: k for k, v in enumerate(cats)}
+            )
+
+    def __len__(self) -> int:
+        return len(self.trees)
+
+    def encode(self, i: int, value: Any) -> float:
+        """One feature value in LightGBM's numeric input space."""
+        if i in self.codes:
+            mapping = self.codes[i]
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                return math.nan
+            if mapping is None:
+                try:
+                    return float(int(value))
+                except (TypeError, ValueError):
+                    return math.nan
+            try:
+                code = mapping.get(value)
+            except TypeError:
+                code = None
+            return math.nan if code is None else float(code)
+        # same coercion as _sanitize_for_lgbm, so sessions match /api/predict
+        v = pd.to_numeric(value, errors="coerce")
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return math.nan
+
+    def leaf_outputs(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(leaf index, leaf output) per tree, from one native pred_leaf call."""
+        leaves = np.asarray(
+            self.booster.predict(x.reshape(1, -1), pred_leaf=True, num_threads=1)
+        ).reshape(-1)
+        leaves = leaves.astype(np.int64)
+        out = np.fromiter(
+            (tree.leaf_value[int(k)] for tree, k in zip(self.trees, leaves)),
+            dtype=np.float64,
+            count=len(self.trees),
+        )
+        return leaves, out
+
+    def trees_for(self, features: Sequence[int]) -> np.ndarray:
+        parts = [self.depends[f] for f in features if f in self.depends]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+
+class _ModelState:
+    """Feature row and per-tree cache of one booster within a session."""
+
+    def __init__(self, index: TreeIndex, row: pd.Series):
+        self.index = index
+        self.base = np.array(
+            [
+                index.encode(i, row[c] if c in row.index else None)
+                for i, c in enumerate(index.feature_names)
+            ],
+            dtype=np.float64,
+        )
+        self.x = self.base.copy()
+        self.leaves, self.out = index.leaf_outputs(self.x)
+        self.total = float(self.out.sum())
+
+    def apply(self, values: Dict[str, Any]) -> int:
+        """Set features (None restores the parcel's value); returns trees walked."""
+        changed = []
+        for name, value in values.items():
+            try:
+                i = self.index.feature_names.index(name)
+            except ValueError:
+                continue
+            v = self.base[i] if value is None else self.index.encode(i, value)
+            if not (v == self.x[i] or (v != v and self.x[i] != self.x[i])):
+                self.x[i] = v
+                changed.append(i)
+
+        trees = self.index.trees_for(changed)
+        xs = self.x.tolist()
+        for t in trees:
+            tree = self.index.trees[t]
+            leaf = tree.leaf(xs)
+            if leaf != self.leaves[t]:
+                new = tree.leaf_value[leaf]
+                self.total += new - self.out[t]
+                self.out[t] = new
+                self.leaves[t] = leaf
+        return len(trees)
+
+
+class ValuationSession:
+    """A snapped parcel whose features the user edits one field at a time.
+
+    Each edit re-walks only the trees that split on the edited features and
+    adjusts the cached per-tree outputs; the response body is the same as
+    /api/predict for the edited row.
+    """
+
+    def __init__(self, sid: str, store, indexes, payload, assess_table):
+        self.id = sid
+        self.store = store
+        self.payload = dict(payload)
+        self.row, self.row_i, self.d2 = store.snap(payload, assess_table)
+        self.table_version = getattr(assess_table, "version", None)
+        self.baseline = _ModelState(indexes[0], self.row)
+        self.residual = _ModelState(indexes[1], self.row)
+        self.edits: Dict[str, Any] = {}
+        self.updates = 0
+        self.trees_walked = 0
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+
+    def _features(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        # form names (areaSqft, renovated, ...) -> model columns
+        p = _apply_frontend_aliases(
+            {k: v for k, v in fields.items() if k not in ("latitude", "longitude")}
+        )
+        for k, v in fields.items():
+            if v is None:
+                for c in FORM_COLUMNS.get(k, ()):
+                    p[c] = None
+        names = set(self.baseline.index.feature_names) | set(
+            self.residual.index.feature_names
+        )
+        return {
+            k: v
+            for k, v in p.items()
+            if k in names and k not in FORBIDDEN and k not in FIXED_COLUMNS
+        }
+
+    def _check(self, feats: Dict[str, Any]) -> None:
+        """ValueError for a value its feature cannot take; nothing is applied."""
+        for k, v in feats.items():
+            if v is None:
+                continue
+            if isinstance(v, (dict, list, tuple, set)):
+                raise ValueError(f"{k} must be a single value")
+            for index in (self.baseline.index, self.residual.index):
+                if k not in index.feature_names:
+                    continue
+                i = index.feature_names.index(k)
+                nan_in = isinstance(v, float) and math.isnan(v)
+                if (
+                    i not in index.codes
+                    and not nan_in
+                    and math.isnan(index.encode(i, v))
+                ):
+                    raise ValueError(f"{k} must be a number, got {v!r}")
+
+    def update(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply field edits; ValueError (and no change) for unusable values."""
+        t0 = time.perf_counter()
+        with self.lock:
+            feats = self._features(fields)
+            self._check(feats)
+            for k, v in feats.items():
+                if v is None:
+                    self.edits.pop(k, None)
+                else:
+                    self.edits[k] = v
+            walked = self.baseline.apply(feats) + self.residual.apply(feats)
+            self.updates += 1
+            self.trees_walked += walked
+            out = self._result(walked, t0)
+        return out
+
+    def result(self) -> Dict[str, Any]:
+        with self.lock:
+            return self._result(len(self.baseline.index) + len(self.residual.index))
+
+    def _result(self, walked: int, t0: Optional[float] = None) -> Dict[str, Any]:
+        out = self.store.compose(
+            self.payload,
+            self.row,
+            self.row_i,
+            self.d2,
+            self.baseline.total,
+            self.residual.total,
+            self.table_version,
+        )
+        out["meta"]["session"] = {
+            "id": self.id,
+            "edits": dict(self.edits),
+            "treesWalked": walked,
+            "treesTotal": len(self.baseline.index) + len(self.residual.index),
+            "updates": self.updates,
+            "updateMs": (time.perf_counter() - t0) * 1000.0 if t0 else None,
+        }
+        return out
+
+
+class SessionRegistry:
+    """Live valuation sessions, least recently used first out.
+
+    Tree indexes are built from the model dump on first use; sessions idle
+    for `ttl_s` or beyond `max_sessions` are dropped.
+    """
+
+    def __init__(self, store, max_sessions: int = 10000, ttl_s: float = 1800.0):
+        self.store = store
+        self.max_sessions = int(max_sessions)
+        self.ttl_s = float(ttl_s)
+        self._sessions: "OrderedDict[str, ValuationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexes: Optional[Tuple[TreeIndex, TreeIndex]] = None
+        self.created = 0
+        self.expired = 0
+
+    def indexes(self) -> Tuple[TreeIndex, TreeIndex]:
+        with self._lock:
+            if self._indexes is None:
+                self._indexes = (
+                    TreeIndex(self.store.baseline, self.store.baseline_categoricals),
+                    TreeIndex(self.store.residual, self.store.residual_categoricals),
+                )
+            return self._indexes
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.ttl_s
+        while self._sessions:
+            sid, s = next(iter(self._sessions.items()))
+            if s.touched >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[sid]
+            self.expired += 1
+
+    def create(self, payload: Dict[str, Any], assess_table) -> ValuationSession:
+        s = ValuationSession(
+            uuid.uuid4().hex[:16], self.store, self.indexes(), payload, assess_table
+        )
+        with self._lock:
+            self._sessions[s.id] = s
+            self.created += 1
+            self._evict()
+        return s
+
+    def get(self, sid: str) -> Optional[ValuationSession]:
+        with self._lock:
+            self._evict()
+            s = self._sessions.get(sid)
+            if s is not None:
+                s.touched = time.monotonic()
+                self._sessions.move_to_end(sid)
+            return s
+
+    def drop(self, sid: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(sid, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idx = self._indexes
+            return {
+                "active": len(self._sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "max_sessions": self.max_sessions,
+                "ttl_s": self.ttl_s,
+                "trees": None if idx is None else [len(idx[0]), len(idx[1])],
+            }
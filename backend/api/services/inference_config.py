@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+
+def _parse_cpu_list(s: str) -> Set[int]:
+    """Parse a sysfs CPU list such as "0-3,8,10-11" into a set of ids."""
+    out: Set[int] = set()
+    for part in s.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            out.update(range(int(a), int(b) + 1))
+        else:
+            out.add(int(part))
+    return out
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    # cgroup v2, then v1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except Exception:
+        pass
+    try:
+        q = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        p = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if q > 0 and p > 0:
+            return q / p
+    except Exception:
+        pass
+    return None
+
+
+@dataclass
+class CpuTopology:
+    logical: int  # CPUs in the machine
+    usable: int  # CPUs this process may run on (affinity)
+    physical: int  # distinct cores among the usable CPUs
+    cgroup_quota: Optional[float]  # container CPU limit, if any
+
+    @property
+    def effective_cores(self) -> int:
+        """Cores worth of compute: physical cores, capped by the cgroup quota."""
+        n = self.physical
+        if self.cgroup_quota is not None:
+            n = min(n, max(1, math.floor(self.cgroup_quota)))
+        return max(1, n)
+
+
+def detect_topology() -> CpuTopology:
+    logical = os.cpu_count() or 1
+    try:
+        cpus = set(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cpus = set(range(logical))
+
+    # hyperthread siblings share a core; LightGBM gains little from them
+    cores = set()
+    for c in cpus:
+        p = Path(f"/sys/devices/system/cpu/cpu{c}/topology/thread_siblings_list")
+        try:
+            cores.add(min(_parse_cpu_list(p.read_text())))
+        except Exception:
+            cores.add(c)
+
+    return CpuTopology(
+        logical=logical,
+        usable=len(cpus),
+        physical=len(cores),
+        cgroup_quota=_cgroup_cpu_quota(),
+    )
+
+
+@dataclass
+class InferenceLayout:
+    """How many LightGBM threads each Booster.predict call may use.
+
+    Single-row requests always run on one thread: at that size OpenMP start-up
+    costs more than it saves, and the server already runs many requests in
+    parallel. Calls with at least `batch_min_rows` rows get the worker's
+    budget, and only `batch_slots` of them run at once so concurrent batch
+    jobs do not oversubscribe the budget.
+    """
+
+    topology: CpuTopology
+    workers: int
+    budget_threads: int
+    batch_min_rows: int = 256
+    batch_slots: int = 1
+    _slots: threading.BoundedSemaphore = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._slots = threading.BoundedSemaphore(max(1, self.batch_slots))
+
+    @classmethod
+    def plan(
+        cls,
+        topology: Optional[CpuTopology] = None,
+        workers: Optional[int] = None,
+        budget_threads: Optional[int] = None,
+        batch_min_rows: int = 256,
+    ) -> "InferenceLayout":
+        topo = topology or detect_topology()
+        workers = max(1, int(workers or 1))
+        if budget_threads is None:
+            budget_threads = max(1, topo.effective_cores // workers)
+        return cls(
+            topology=topo,
+            workers=workers,
+            budget_threads=int(budget_threads),
+            batch_min_rows=int(batch_min_rows),
+        )
+
+    @classmethod
+    def from_env(cls) -> "InferenceLayout":
+        # WEB_CONCURRENCY is what uvicorn/gunicorn use for the worker count
+        workers = os.getenv("IREA_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"
+        budget = os.getenv("IREA_INFER_THREADS")
+        return cls.plan(
+            workers=int(workers),
+            budget_threads=int(budget) if budget else None,
+            batch_min_rows=int(os.getenv("IREA_BATCH_MIN_ROWS", "256")),
+        )
+
+    def threads_for(self, n_rows: int) -> int:
+        return self.budget_threads if n_rows >= self.batch_min_rows else 1
+
+    def batch_slot(self, n_rows: int):
+        """Context manager gating budgeted calls; a no-op for small inputs."""
+        return self._slots if n_rows >= self.batch_min_rows else _NULL_SLOT
+
+    def describe(self) -> str:
+        t = self.topology
+        quota = f"{t.cgroup_quota:g}" if t.cgroup_quota is not None else "none"
+        return (
+            f"cpus={t.usable}/{t.logical} cores={t.physical} quota={quota} "
+            f"workers={self.workers} -> single-row threads=1, "
+            f"batch(>={self.batch_min_rows} rows) threads={self.budget_threads}"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "topology": asdict(self.topology),
+            "effective_cores": self.topology.effective_cores,
+            "workers": self.workers,
+            "single_row_threads": 1,
+            "batch_threads": self.budget_threads,
+            "batch_min_rows": self.batch_min_rows,
+            "batch_slots": self.batch_slots,
+        }
+
+
+class _NullSlot:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SLOT = _NullSlot()
@@ -1,12 +1,16 @@
 # backend/api/services/model_store.py
 from __future__ import annotations
 
+import hashlib
 from typing import Any, Dict, List, Optional, Tuple
 
 import lightgbm as lgb
 import numpy as np
 import pandas as pd
 
+from api.services.deadline import Deadline, skipped_after
+from api.services.inference_config import InferenceLayout
+
 BASELINE_CATEGORICALS = [
     "CITY",
     "ZIP_CODE",
@@ -34,6 +38,12 @@ ASSESS_VALUE_CANDIDATES = [
     "TOTAL_VAL",
 ]
 
+# blended mode (predict_blended): neighbours, search radius, and the distance
+# added before inverse-square weighting so a click on a centroid stays finite
+BLEND_K = 8
+BLEND_RADIUS_M = 150.0
+BLEND_SMOOTH_M = 15.0
+
 
 def _safe_float(x: Any) -> Optional[float]:
     try:
@@ -116,8 +126,56 @@ def _baseline_to_usd(baseline_pred: float, row_assess: Optional[float]) -> float
     return float(baseline_pred)
 
 
+def _precomputed_value(table: Any, row: pd.Series, row_i: int) -> Optional[float]:
+    """finalPrice precomputed for a snapped row (attach_values), if any."""
+    values = getattr(table, "values", None)
+    if values is not None:
+        v = values[row_i]
+    elif hasattr(table, "lookup_pid") and "PID" in row.index:
+        # sharded tables: row_i is shard-local, go through the PID index
+        hit = table.lookup_pid(row["PID"])
+        v = None if hit is None else hit[1]
+    else:
+        return None
+    return float(v) if v is not None and np.isfinite(v) else None
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _pick_assess_from_frame(rows: pd.DataFrame) -> np.ndarray:
+    """Vectorized _pick_assess_from_row; NaN where no positive value exists."""
+    out = np.full(len(rows), np.nan)
+    for col in ASSESS_VALUE_CANDIDATES:
+        if col not in rows.columns:
+            continue
+        v = pd.to_numeric(rows[col], errors="coerce").to_numpy(dtype=float)
+        take = np.isnan(out) & np.isfinite(v) & (v > 0)
+        out[take] = v[take]
+    return out
+
+
 class ModelStore:
-    def __init__(self, baseline_path: str, residual_path: str):
+    def __init__(
+        self,
+        baseline_path: str,
+        residual_path: str,
+        layout: Optional[InferenceLayout] = None,
+    ):
+        self.layout = layout or InferenceLayout.plan()
+        self.source = {"baseline": baseline_path, "residual": residual_path}
+        # model files and content hashes, recorded with every audited request
+        self.fingerprint = {
+            name: {"path": str(path), "sha256": _file_sha256(path)}
+            for name, path in self.source.items()
+        }
+        # shadow model pair (see load_candidate / services/shadow.py)
+        self.candidate: Optional["ModelStore"] = None
         self.baseline = lgb.Booster(model_file=baseline_path)
         self.residual = lgb.Booster(model_file=residual_path)
 
@@ -131,27 +189,284 @@ class ModelStore:
             c for c in RESIDUAL_CATEGORICALS if c in self.residual_features
         ]
 
-    def predict(self, payload: Dict[str, Any], assess_table: Any) -> Dict[str, Any]:
-        df = getattr(assess_table, "df", None)
-        if df is None or not hasattr(df, "__len__"):
-            raise RuntimeError("AssessTable.df not found")
-
+    def load_candidate(self, baseline_path: str, residual_path: str) -> "ModelStore":
+        """Load a candidate model pair next to production, for shadow scoring."""
+        cand = ModelStore(baseline_path, residual_path, layout=self.layout)
+        missing = set(cand.baseline_features + cand.residual_features) - set(
+            self.baseline_features + self.residual_features
+        )
+        if missing - {"sale_year", "sale_month"}:
+            # the table is only loaded with production's feature columns
+            print(f"[WARN] Candidate uses features not in the table: {missing}")
+        self.candidate = cand
+        return cand
+
+    def _predict(self, booster: lgb.Booster, X: pd.DataFrame) -> np.ndarray:
+        n = len(X)
+        with self.layout.batch_slot(n):
+            return booster.predict(X, num_threads=self.layout.threads_for(n))
+
+    def snap(
+        self, payload: Dict[str, Any], assess_table: Any
+    ) -> Tuple[pd.Series, int, float]:
+        """Nearest assessment row to the payload's coordinates."""
         lat = _safe_float(payload.get("latitude"))
         lng = _safe_float(payload.get("longitude"))
         if lat is None or lng is None:
             raise RuntimeError("latitude/longitude missing")
 
-        row_i, d2 = _nearest_row_by_latlng(df, lat, lng)
-        row = df.iloc[row_i]
+        if hasattr(assess_table, "snap"):
+            row, row_i, d2 = assess_table.snap(lat, lng)
+        else:
+            df = getattr(assess_table, "df", None)
+            if df is None or not hasattr(df, "__len__"):
+                raise RuntimeError("AssessTable.df not found")
+            row_i, d2 = _nearest_row_by_latlng(df, lat, lng)
+            row = df.iloc[row_i]
+        return row, row_i, d2
+
+    def predict(
+        self,
+        payload: Dict[str, Any],
+        assess_table: Any,
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, Any]:
+        """Snap, baseline, residual. With a `deadline`, a stage that no longer
+        fits the budget is skipped and the best answer so far is returned
+        (see _degraded); meta.degraded is then set, and None otherwise."""
+        row, row_i, d2 = self.snap(payload, assess_table)
+        if deadline is not None:
+            deadline.mark("snap")
+        return self._predict_snapped(payload, row, row_i, d2, assess_table, deadline)
+
+    def _predict_snapped(
+        self,
+        payload: Dict[str, Any],
+        row: pd.Series,
+        row_i: int,
+        d2: float,
+        assess_table: Any,
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, Any]:
+        """predict() from an already snapped row."""
+        if deadline is not None and not deadline.affords("baseline", "residual"):
+            out = self._degraded(
+                payload, row, row_i, d2, None, assess_table, deadline, "snap"
+            )
+            if out is not None:
+                return out
 
-        snapped_lat = _safe_float(row.get("LATITUDE")) or lat
-        snapped_lng = _safe_float(row.get("LONGITUDE")) or lng
+        Xb = _to_one_row_frame(row, self.baseline_features)
+        Xb = _sanitize_for_lgbm(Xb, self.baseline_categoricals)
+        baseline_pred = float(self._predict(self.baseline, Xb)[0])
+        if deadline is not None:
+            deadline.mark("baseline")
+            if not deadline.affords("residual"):
+                return self._degraded(
+                    payload,
+                    row,
+                    row_i,
+                    d2,
+                    baseline_pred,
+                    assess_table,
+                    deadline,
+                    "baseline",
+                )
 
+        Xr = _to_one_row_frame(row, self.residual_features)
+        Xr = _sanitize_for_lgbm(Xr, self.residual_categoricals)
+        residual_pred = float(self._predict(self.residual, Xr)[0])  # log residual
+
+        out = self.compose(
+            payload,
+            row,
+            row_i,
+            d2,
+            baseline_pred,
+            residual_pred,
+            getattr(assess_table, "version", None),
+        )
+        if deadline is not None:
+            deadline.mark("residual")
+            out["meta"]["degraded"] = None
+        return out
+
+    def _degraded(
+        self,
+        payload: Dict[str, Any],
+        row: pd.Series,
+        row_i: int,
+        d2: float,
+        baseline_pred: Optional[float],
+        assess_table: Any,
+        deadline: Deadline,
+        stage: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Best answer available after `stage`, or None if there is none yet.
+
+        In order: the parcel's precomputed valuation, the table's assessed
+        value, the baseline converted to dollars (once the baseline ran).
+        The residual is set so that finalPrice = assessPrice * exp(residual)
+        still holds.
+        """
+        value = _precomputed_value(assess_table, row, row_i)
         row_assess = _pick_assess_from_row(row)
+        if value is not None:
+            mode, price = "precomputed", value
+        elif row_assess is not None and row_assess > 0:
+            mode, price = "table_assess", float(row_assess)
+        elif baseline_pred is not None:
+            mode, price = "baseline_assess", _baseline_to_usd(baseline_pred, None)
+        else:
+            return None
+
+        out = self.compose(
+            payload,
+            row,
+            row_i,
+            d2,
+            float("nan") if baseline_pred is None else baseline_pred,
+            0.0,
+            getattr(assess_table, "version", None),
+        )
+        assess = out["assessPrice"]
+        if not (np.isfinite(assess) and assess > 0):
+            assess = out["assessPrice"] = price
+        out["predictedPrice"] = out["finalPrice"] = float(price)
+        out["residual"] = float(np.log(price / assess))
+        out["meta"]["degraded"] = {
+            "mode": mode,
+            "stage": stage,
+            "skipped": skipped_after(stage),
+            "budgetMs": deadline.budget_s * 1000.0,
+            "elapsedMs": deadline.elapsed_ms(),
+        }
+        return out
+
+    def predict_blended(
+        self,
+        payload: Dict[str, Any],
+        assess_table: Any,
+        k: int = BLEND_K,
+        radius_m: float = BLEND_RADIUS_M,
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, Any]:
+        """Inverse-distance blend of the k nearest parcels within radius_m.
+
+        All neighbours are scored in one predict_frame call. The response is
+        predict()'s for the nearest parcel with finalPrice/predictedPrice
+        replaced by the weighted geometric mean; meta.blend carries the
+        neighbours, the weighted log-price spread (uncertainty) and whether
+        the nearest parcel lies outside the radius (`farSnap`). When the
+        nearest parcel itself has no usable price there is nothing to anchor
+        the blend on, so the plain predict() response is returned with
+        meta.blend.fallback set. The same happens under a `deadline` that
+        cannot afford scoring the neighbours; that answer may degrade further
+        as in predict(), and meta.degraded has mode "single" when only the
+        blend was dropped.
+        """
+        lat = _safe_float(payload.get("latitude"))
+        lng = _safe_float(payload.get("longitude"))
+        if lat is None or lng is None:
+            raise RuntimeError("latitude/longitude missing")
+        rows, idx, dist = assess_table.snap_k(lat, lng, k, radius_m)
+        nearest, nearest_i = rows.iloc[0], int(idx[0])
+        d2 = (float(nearest["LATITUDE"]) - lat) ** 2 + (
+            float(nearest["LONGITUDE"]) - lng
+        ) ** 2
+
+        def single(reason: str) -> Dict[str, Any]:
+            out = self._predict_snapped(
+                payload, nearest, nearest_i, d2, assess_table, deadline
+            )
+            if reason == "deadline" and not out["meta"].get("degraded"):
+                out["meta"]["degraded"] = {
+                    "mode": "single",
+                    "stage": "snap",
+                    "skipped": [],
+                    "budgetMs": deadline.budget_s * 1000.0,
+                    "elapsedMs": deadline.elapsed_ms(),
+                }
+            out["meta"]["blend"] = {
+                "k": 0,
+                "radiusM": float(radius_m),
+                "nearestDistM": float(dist[0]),
+                "farSnap": bool(dist[0] > radius_m),
+                "fallback": reason,
+            }
+            return out
+
+        if deadline is not None:
+            deadline.mark("snap")
+            # scoring a few rows at once costs about what one row does
+            if not deadline.affords("baseline", "residual"):
+                return single("deadline")
+
+        scored = self.predict_frame(rows)
+        price = scored["finalPrice"].to_numpy(dtype=float)
+        ok = np.isfinite(price) & (price > 0)
+        if not ok[0]:
+            return single("nearestUnpriced")
+
+        out = self.compose(
+            payload,
+            nearest,
+            nearest_i,
+            d2,
+            float(scored["baselineRawPred"].iat[0]),
+            float(scored["residual"].iat[0]),
+            getattr(assess_table, "version", None),
+        )
+
+        w = 1.0 / (dist[ok] + BLEND_SMOOTH_M) ** 2
+        w /= w.sum()
+        logp = np.log(price[ok])
+        mu = float(np.sum(w * logp))
+        spread = float(np.sqrt(np.sum(w * (logp - mu) ** 2)))
+        blended = float(np.exp(mu))
+
+        pids = rows["PID"].tolist() if "PID" in rows.columns else [None] * len(rows)
+        out["predictedPrice"] = blended
+        out["finalPrice"] = blended
+        out["meta"]["blend"] = {
+            "k": int(ok.sum()),
+            "radiusM": float(radius_m),
+            "nearestDistM": float(dist[0]),
+            "farSnap": bool(dist[0] > radius_m),
+            "nearestPrice": float(price[0]),
+            "logStd": spread,
+            "low": float(np.exp(mu - spread)),
+            "high": float(np.exp(mu + spread)),
+            "neighbours": [
+                {"pid": p, "distM": float(d), "price": float(v), "weight": float(wt)}
+                for p, d, v, wt in zip(
+                    np.asarray(pids, dtype=object)[ok], dist[ok], price[ok], w
+                )
+            ],
+        }
+        if deadline is not None:
+            out["meta"]["degraded"] = None
+        return out
+
+    def compose(
+        self,
+        payload: Dict[str, Any],
+        row: pd.Series,
+        row_i: int,
+        d2: float,
+        baseline_pred: float,
+        residual_pred: float,
+        table_version: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Response body from the snapped row and both raw model outputs."""
+        snapped_lat = _safe_float(row.get("LATITUDE")) or _safe_float(
+            payload.get("latitude")
+        )
+        snapped_lng = _safe_float(row.get("LONGITUDE")) or _safe_float(
+            payload.get("longitude")
+        )
 
-        Xb = _to_one_row_frame(row, self.baseline_features)
-        Xb = _sanitize_for_lgbm(Xb, self.baseline_categoricals)
-        baseline_pred = float(self.baseline.predict(Xb)[0])
+        row_assess = _pick_assess_from_row(row)
 
         if row_assess is not None and row_assess > 0:
             assess_price = float(row_assess)
@@ -160,10 +475,6 @@ class ModelStore:
             assess_price = _baseline_to_usd(baseline_pred, None)
             assess_source = "baseline"
 
-        Xr = _to_one_row_frame(row, self.residual_features)
-        Xr = _sanitize_for_lgbm(Xr, self.residual_categoricals)
-        residual_pred = float(self.residual.predict(Xr)[0])  # log residual
-
         final_price = float(assess_price * np.exp(residual_pred))
 
         trend = {}
@@ -196,5 +507,36 @@ class ModelStore:
                 "nearest_row_index": int(row_i),
                 "nearest_d2": float(d2),
                 "pid": row.get("PID", None) if "PID" in row.index else None,
+                "table_version": table_version,
             },
         }
+
+    def predict_frame(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Score already-snapped parcel rows in one baseline + one residual call.
+
+        Same math as predict(), vectorized; returns one output row per input.
+        """
+        Xb = _sanitize_for_lgbm(
+            rows.reindex(columns=self.baseline_features), self.baseline_categoricals
+        )
+        baseline_pred = np.asarray(self._predict(self.baseline, Xb), dtype=float)
+
+        row_assess = _pick_assess_from_frame(rows)
+        has_table = np.isfinite(row_assess)
+        fallback = np.where(baseline_pred < 1000, np.exp(baseline_pred), baseline_pred)
+        assess_price = np.where(has_table, row_assess, fallback)
+
+        Xr = _sanitize_for_lgbm(
+            rows.reindex(columns=self.residual_features), self.residual_categoricals
+        )
+        residual_pred = np.asarray(self._predict(self.residual, Xr), dtype=float)
+
+        return pd.DataFrame(
+            {
+                "assessPrice": assess_price,
+                "assessSource": np.where(has_table, "table", "baseline"),
+                "baselineRawPred": baseline_pred,
+                "residual": residual_pred,
+                "finalPrice": assess_price * np.exp(residual_pred),
+            }
+        )
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import warnings
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from api.services.spatial_index import SpatialIndex
+
+VALUE_COL = "TOTAL_VALUE_2025"
+YEAR_COL = "YR_BUILT"
+
+RADII_M = (250, 500)
+KNN_K = 10
+
+# every column neighbourhood_features() produces with the defaults above
+NEIGHBOURHOOD_COLUMNS = [
+    "NB_VALUE_MED_250",
+    "NB_COUNT_250",
+    "NB_VALUE_MED_500",
+    "NB_COUNT_500",
+    "NB_YR_BUILT_MEAN_500",
+    "NB_KNN10_VALUE_MED",
+    "NB_KNN10_DIST_M",
+]
+
+
+def _numeric(s: pd.Series) -> np.ndarray:
+    if s.dtype == object:
+        s = s.astype(str).str.replace(",", "", regex=False)
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _grouped_median(groups: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Median of `values` per group id in [0, n); NaN for empty groups."""
+    out = np.full(n, np.nan)
+    if len(values) == 0:
+        return out
+    order = np.lexsort((values, groups))
+    v = values[order]
+    counts = np.bincount(groups, minlength=n)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    ok = counts > 0
+    lo = starts[ok] + (counts[ok] - 1) // 2
+    hi = starts[ok] + counts[ok] // 2
+    out[ok] = (v[lo] + v[hi]) / 2.0
+    return out
+
+
+def _grouped_mean(groups: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    counts = np.bincount(groups, minlength=n)
+    sums = np.bincount(groups, weights=values, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def neighbourhood_features(
+    df: pd.DataFrame,
+    index: Optional[SpatialIndex] = None,
+    rows: Optional[np.ndarray] = None,
+    radii_m: Sequence[float] = RADII_M,
+    k: int = KNN_K,
+    block: int = 20_000,
+) -> pd.DataFrame:
+    """Radius and k-NN aggregates around parcels of an assessment table.
+
+    For each query row: median VALUE_COL and parcel count within each radius,
+    mean YR_BUILT within the largest radius, and median value and distance
+    over the k nearest parcels. The parcel itself is always left out, so the
+    value aggregates never contain the row's own label.
+
+    `index` must cover the rows of `df` in order (one is built otherwise);
+    `rows` selects the query rows (default: all). Queries run in blocks of
+    `block` rows to bound the size of the flattened radius results.
+    """
+    lat = pd.to_numeric(df["LATITUDE"], errors="coerce").to_numpy(dtype=np.float64)
+    lng = pd.to_numeric(df["LONGITUDE"], errors="coerce").to_numpy(dtype=np.float64)
+    if index is None:
+        if not (np.isfinite(lat).all() and np.isfinite(lng).all()):
+            raise ValueError("rows without coordinates; drop them first")
+        index = SpatialIndex(lat, lng)
+    if index.n != len(df):
+        raise ValueError("spatial index does not match the frame")
+
+    value = (
+        _numeric(df[VALUE_COL]) if VALUE_COL in df.columns else np.full(len(df), np.nan)
+    )
+    value[~(value > 0)] = np.nan
+    year = (
+        _numeric(df[YEAR_COL]) if YEAR_COL in df.columns else np.full(len(df), np.nan)
+    )
+    year[~(year > 0)] = np.nan
+
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    r_max = max(radii_m)
+    cols: Dict[str, np.ndarray] = {}
+
+    def put(name: str, start: int, vals: np.ndarray) -> None:
+        if name not in cols:
+            cols[name] = np.full(len(rows), np.nan)
+        cols[name][start : start + len(vals)] = vals
+
+    for start in range(0, len(rows), block):
+        q_rows = rows[start : start + block]
+        n = len(q_rows)
+
+        # one query at the largest radius serves all radii
+        q, nb, dist = index.within_radius_many(lat[q_rows], lng[q_rows], r_max)
+        other = nb != q_rows[q]
+        q, nb, dist = q[other], nb[other], dist[other]
+
+        for r in radii_m:
+            inside = dist <= r
+            qi, vi = q[inside], value[nb[inside]]
+            has = np.isfinite(vi)
+            put(f"NB_VALUE_MED_{r:g}", start, _grouped_median(qi[has], vi[has], n))
+            put(f"NB_COUNT_{r:g}", start, np.bincount(qi, minlength=n).astype(float))
+
+        yi = year[nb]
+        has = np.isfinite(yi)
+        put(f"NB_YR_BUILT_MEAN_{r_max:g}", start, _grouped_mean(q[has], yi[has], n))
+
+        # k+1 nearest, then drop the row itself (or the farthest if the row
+        # shares its point with more than k others)
+        idx, d = index.nearest_k_many(lat[q_rows], lng[q_rows], k + 1)
+        is_self = idx == q_rows[:, None]
+        is_self[~is_self.any(axis=1), -1] = True
+        kk = idx.shape[1] - 1
+        idx = idx[~is_self].reshape(n, kk)
+        d = d[~is_self].reshape(n, kk)
+        kv = value[idx]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+            put(f"NB_KNN{k}_VALUE_MED", start, np.nanmedian(kv, axis=1))
+        put(f"NB_KNN{k}_DIST_M", start, d[:, -1] if kk else np.full(n, np.nan))
+
+    return pd.DataFrame(cols, index=df.index[rows])
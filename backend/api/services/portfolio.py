@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.services.assess_table import AssessTable
+from api.services.sketches import QuantileSketch
+from api.utils.geo_guard import BoundaryGrid
+
+REPORT_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+ZIP_QUANTILES = [0.1, 0.5, 0.9]
+SKETCH_REL_ACC = 0.005
+
+DETAIL_COLUMNS = ["pid", "lat", "lng", "zip", "value", "source"]
+
+Block = Tuple[AssessTable, np.ndarray]
+
+
+def _tables(table, shard_ids: Optional[np.ndarray] = None) -> Iterator[AssessTable]:
+    if hasattr(table, "shards"):
+        ids = range(len(table.shards)) if shard_ids is None else shard_ids
+        for i in ids:
+            yield table.shard(int(i))
+    else:
+        yield table
+
+
+def polygon_blocks(table, grid: BoundaryGrid) -> Iterator[Block]:
+    """Rows inside the polygon, one block per (shard) table.
+
+    The spatial index narrows each table to the polygon's bounding box; the
+    grid's point-in-polygon test filters the rest.
+    """
+    box = (grid.y0, grid.y1, grid.x0, grid.x1)
+    hit = table.shards_in_bbox(*box) if hasattr(table, "shards") else None
+    for t in _tables(table, hit):
+        idx = t.within_bbox(*box)
+        if len(idx):
+            idx = idx[grid.contains_many(t.lat[idx], t.lng[idx])]
+        if len(idx):
+            yield t, idx
+
+
+def pid_blocks(table, pids: Sequence[Any], missing: List[Any]) -> Iterator[Block]:
+    """Rows for a PID list, grouped per (shard) table; unknown PIDs are
+    appended to `missing`. Duplicate PIDs count once."""
+    if hasattr(table, "shards"):
+        by_shard: Dict[int, List[Any]] = defaultdict(list)
+        for p in dict.fromkeys(pids):
+            si = table.shard_of_pid(p)
+            if si is None:
+                missing.append(p)
+            else:
+                by_shard[si].append(p)
+        groups = [(table.shard(si), ps) for si, ps in sorted(by_shard.items())]
+    else:
+        groups = [(table, list(dict.fromkeys(pids)))]
+
+    for t, ps in groups:
+        rows = []
+        for p in ps:
+            i = t.row_of_pid(p)
+            if i is None:
+                missing.append(p)
+            else:
+                rows.append(i)
+        if rows:
+            yield t, np.asarray(rows, dtype=np.int64)
+
+
+class PortfolioSummary:
+    """Streaming totals and quantile sketches, overall and per ZIP code."""
+
+    def __init__(self):
+        self.parcels = 0
+        self.valued = 0
+        self.total = 0.0
+        self.sources = {"precomputed": 0, "scored": 0}
+        self.sketch = QuantileSketch(rel_acc=SKETCH_REL_ACC)
+        self.by_zip: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, values: np.ndarray, zips: np.ndarray) -> None:
+        self.parcels += len(values)
+        ok = np.isfinite(values)
+        v, z = values[ok], zips[ok]
+        self.valued += len(v)
+        self.total += float(v.sum())
+        self.sketch.add_many(v)
+        for key in np.unique(z):
+            sel = v[z == key]
+            b = self.by_zip.get(key)
+            if b is None:
+                b = self.by_zip[key] = {
+                    "parcels": 0,
+                    "total": 0.0,
+                    "sketch": QuantileSketch(rel_acc=SKETCH_REL_ACC),
+                }
+            b["parcels"] += len(sel)
+            b["total"] += float(sel.sum())
+            b["sketch"].add_many(sel)
+
+    def report(self) -> Dict[str, Any]:
+        s = self.sketch
+        zips = []
+        for key, b in sorted(self.by_zip.items(), key=lambda kv: -kv[1]["total"]):
+            q = b["sketch"].quantiles(ZIP_QUANTILES)
+            zips.append(
+                {
+                    "zip": key,
+                    "parcels": b["parcels"],
+                    "total": b["total"],
+                    "share": b["total"] / self.total if self.total else None,
+                    **{f"p{int(p * 100)}": v for p, v in zip(ZIP_QUANTILES, q)},
+                }
+            )
+        return {
+            "parcels": self.parcels,
+            "valued": self.valued,
+            "total": self.total,
+            "mean": self.total / self.valued if self.valued else None,
+            "min": s.min if s.n else None,
+            "max": s.max if s.n else None,
+            "percentiles": {
+                f"p{int(p * 100)}": v
+                for p, v in zip(REPORT_QUANTILES, s.quantiles(REPORT_QUANTILES))
+            },
+            "sources": dict(self.sources),
+            "byZip": zips,
+        }
+
+
+def _zip_keys(t: AssessTable, rows: np.ndarray) -> np.ndarray:
+    if "ZIP_CODE" not in t.df.columns:
+        return np.full(len(rows), "unknown", dtype=object)
+    z = t.df["ZIP_CODE"].to_numpy()[rows]
+    out = np.empty(len(rows), dtype=object)
+    for i, v in enumerate(z):
+        try:
+            out[i] = f"{int(float(v)):05d}"
+        except (TypeError, ValueError):
+            out[i] = "unknown"
+    return out
+
+
+def value_portfolio(
+    store,
+    blocks: Iterator[Block],
+    batch_rows: int = 5000,
+    detail_offset: int = 0,
+    detail_limit: int = 0,
+) -> Tuple[PortfolioSummary, Dict[str, np.ndarray]]:
+    """Value every selected parcel in batches of `batch_rows`.
+
+    Precomputed table values are used where present; the remaining rows of a
+    batch are scored in one predict_frame call. Only the summary and the
+    requested detail page (columnar, DETAIL_COLUMNS) are kept.
+    """
+    summary = PortfolioSummary()
+    detail: Dict[str, List[np.ndarray]] = {c: [] for c in DETAIL_COLUMNS}
+    seen = 0
+    for t, rows in blocks:
+        for start in range(0, len(rows), batch_rows):
+            r = rows[start : start + batch_rows]
+            vals = np.full(len(r), np.nan)
+            pre = np.zeros(len(r), dtype=bool)
+            if t.values is not None:
+                vals = t.values[r].astype(np.float64)
+                pre = np.isfinite(vals)
+            todo = np.flatnonzero(~pre)
+            if len(todo):
+                vals[todo] = store.predict_frame(t.df.iloc[r[todo]])[
+                    "finalPrice"
+                ].to_numpy(dtype=float)
+            summary.sources["precomputed"] += int(pre.sum())
+            summary.sources["scored"] += len(todo)
+            zips = _zip_keys(t, r)
+            summary.add(vals, zips)
+
+            # rows of this batch that fall on the requested page
+            lo = max(detail_offset - seen, 0)
+            hi = min(detail_offset + detail_limit - seen, len(r))
+            if hi > lo:
+                page = r[lo:hi]
+                detail["pid"].append(
+                    t.df["PID"].to_numpy()[page]
+                    if "PID" in t.df.columns
+                    else page.astype(str)
+                )
+                detail["lat"].append(t.lat[page])
+                detail["lng"].append(t.lng[page])
+                detail["zip"].append(zips[lo:hi])
+                detail["value"].append(vals[lo:hi])
+                detail["source"].append(
+                    np.where(pre[lo:hi], "precomputed", "scored").astype(object)
+                )
+            seen += len(r)
+    return summary, {
+        c: np.concatenate(parts) if parts else np.empty(0)
+        for c, parts in detail.items()
+    }
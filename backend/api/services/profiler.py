@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+def _frame_label(code) -> str:
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all Python threads.
+
+    A daemon thread wakes every interval and records each thread's stack via
+    sys._current_frames(); nothing is hooked into the profiled code, so the
+    overhead is one stack walk per thread per interval. Output is collapsed
+    stacks ("root;...;leaf count"), ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.interval_s = 0.005
+        self.max_seconds = 0.0
+        self.target_requests: Optional[int] = None
+        self.requests_seen = 0
+
+    @property
+    def running(self) -> bool:
+        return not self._done.is_set()
+
+    def start(
+        self,
+        seconds: float,
+        requests: Optional[int] = None,
+        interval_ms: float = 5.0,
+    ) -> None:
+        """Sample for `seconds`, or until `requests` predict calls have finished
+        (then `seconds` is the upper bound)."""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("profiler already running")
+            self.stacks = Counter()
+            self.samples = 0
+            self.requests_seen = 0
+            self.target_requests = requests
+            self.interval_s = max(0.001, interval_ms / 1000.0)
+            self.max_seconds = float(seconds)
+            self.started_at = time.time()
+            self.finished_at = None
+            self._done.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="irea-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def tick(self) -> None:
+        """Called once per finished /api/predict request."""
+        if not self.running or self.target_requests is None:
+            return
+        with self._lock:
+            self.requests_seen += 1
+            if self.requests_seen >= self.target_requests:
+                self._done.set()
+
+    def stop(self) -> None:
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + self.max_seconds
+        try:
+            while not self._done.is_set() and time.monotonic() < deadline:
+                for t in threading.enumerate():
+                    names[t.ident] = t.name
+                for tid, frame in sys._current_frames().items():
+                    if tid == me:
+                        continue
+                    stack: List[str] = []
+                    f = frame
+                    while f is not None:
+                        stack.append(_frame_label(f.f_code))
+                        f = f.f_back
+                    stack.append(names.get(tid, f"thread-{tid}"))
+                    self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+                self._done.wait(self.interval_s)
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{k} {v}" for k, v in self.stacks.most_common()) + "\n"
+
+    def summary(self, top: int = 25) -> Dict[str, Any]:
+        # self time per leaf frame, the usual first question
+        leaf: Counter = Counter()
+        for stack, n in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += n
+        end = self.finished_at or time.time()
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval_ms": self.interval_s * 1000.0,
+            "duration_s": (end - self.started_at) if self.started_at else 0.0,
+            "requests_seen": self.requests_seen,
+            "target_requests": self.target_requests,
+            "top_self": [{"frame": k, "samples": v} for k, v in leaf.most_common(top)],
+        }
+
+
+class AllocationTracker:
+    """tracemalloc snapshots with growth since the previous snapshot."""
+
+    def __init__(self, frames: int = 10):
+        self.frames = int(frames)
+        self._lock = threading.Lock()
+        self._last: Optional[tracemalloc.Snapshot] = None
+
+    def snapshot(self, top: int = 25) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._last = None
+                return {
+                    "tracing": True,
+                    "started": True,
+                    "message": "tracemalloc started; call again for a snapshot",
+                }
+
+            snap = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+
+            out: Dict[str, Any] = {
+                "tracing": True,
+                "started": False,
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "top": [
+                    {"site": str(s.traceback[0]), "bytes": s.size, "count": s.count}
+                    for s in snap.statistics("lineno")[:top]
+                ],
+            }
+            if self._last is not None:
+                out["growth"] = [
+                    {
+                        "site": str(d.traceback[0]),
+                        "bytes_diff": d.size_diff,
+                        "count_diff": d.count_diff,
+                        "bytes": d.size,
+                    }
+                    for d in snap.compare_to(self._last, "lineno")[:top]
+                ]
+            self._last = snap
+            return out
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._last = None
+        return {"tracing": False}
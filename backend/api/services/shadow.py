@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from api.services.sketches import QuantileSketch
+
+REPORT_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class ShadowScorer:
+    """Re-scores sampled live requests with the candidate model pair.
+
+    The request path only samples and calls put_nowait on a bounded queue;
+    a full queue (or a busy server, per `busy()`) drops the sample and counts
+    it. A separate daemon thread runs the candidate and folds the
+    candidate/production ratio into running stats, a quantile sketch of the
+    absolute relative delta, and the `top_k` most diverging requests.
+    """
+
+    def __init__(
+        self,
+        store,
+        sample_rate: float = 0.1,
+        queue_size: int = 1000,
+        top_k: int = 20,
+        busy: Optional[Callable[[], bool]] = None,
+    ):
+        if store.candidate is None:
+            raise ValueError("ShadowScorer needs a ModelStore with a candidate")
+        self.store = store
+        self.sample_rate = float(sample_rate)
+        self.top_k = int(top_k)
+        self.busy = busy
+        self._q: "queue.Queue" = queue.Queue(maxsize=int(queue_size))
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._tie = itertools.count()
+        self._reset_stats()
+
+        self._thread = threading.Thread(
+            target=self._run, name="irea-shadow", daemon=True
+        )
+        self._thread.start()
+
+    def _reset_stats(self) -> None:
+        self.sampled = 0
+        self.dropped_full = 0
+        self.skipped_busy = 0
+        self.skipped_degraded = 0
+        self.scored = 0
+        self.errors = 0
+        # Welford over log(candidate / production)
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.abs_rel = QuantileSketch()
+        self.latency_ms = QuantileSketch()
+        self._top: List[Any] = []
+        self.started_at = time.time()
+
+    # ---- request side ----
+
+    def submit(self, payload: Dict[str, Any], out: Dict[str, Any], table) -> None:
+        if self._rng.random() >= self.sample_rate:
+            return
+        if self.busy is not None and self.busy():
+            self.skipped_busy += 1
+            return
+        # a deadline-degraded answer is not the production model's full
+        # prediction, so comparing the candidate with it is meaningless
+        if (out.get("meta") or {}).get("degraded"):
+            self.skipped_degraded += 1
+            return
+        try:
+            self._q.put_nowait((payload, out, table))
+            self.sampled += 1
+        except queue.Full:
+            self.dropped_full += 1
+
+    # ---- shadow side ----
+
+    def _run(self) -> None:
+        # lowest CPU priority for this thread only (Linux threads are tasks),
+        # so the kernel schedules production threads first
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            payload, out, table = self._q.get()
+            t0 = time.perf_counter()
+            try:
+                # score the candidate the same way production was scored
+                if payload.get("blend"):
+                    cand = self.store.candidate.predict_blended(
+                        payload,
+                        table,
+                        k=payload["blendK"],
+                        radius_m=payload["blendRadiusM"],
+                    )
+                else:
+                    cand = self.store.candidate.predict(payload, table)
+            except Exception:
+                self.errors += 1
+                continue
+            ms = (time.perf_counter() - t0) * 1000.0
+            self._observe(payload, out, cand, ms)
+
+    def _observe(self, payload, prod, cand, ms: float) -> None:
+        p = float(prod.get("finalPrice") or 0.0)
+        c = float(cand.get("finalPrice") or 0.0)
+        if not (p > 0 and c > 0 and math.isfinite(p) and math.isfinite(c)):
+            self.errors += 1
+            return
+        lr = math.log(c / p)
+
+        with self._lock:
+            self.scored += 1
+            self._n += 1
+            d = lr - self._mean
+            self._mean += d / self._n
+            self._m2 += d * (lr - self._mean)
+            self.abs_rel.add(abs(c / p - 1.0))
+            self.latency_ms.add(ms)
+
+            item = (
+                abs(lr),
+                next(self._tie),
+                {
+                    "pid": (prod.get("meta") or {}).get("pid"),
+                    "latitude": payload.get("latitude"),
+                    "longitude": payload.get("longitude"),
+                    "production": p,
+                    "candidate": c,
+                    "relDelta": c / p - 1.0,
+                    "payload": payload,
+                },
+            )
+            if len(self._top) < self.top_k:
+                heapq.heappush(self._top, item)
+            elif item[0] > self._top[0][0]:
+                heapq.heapreplace(self._top, item)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset_stats()
+
+    def report(self, examples: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            std = math.sqrt(self._m2 / (self._n - 1)) if self._n > 1 else None
+            out: Dict[str, Any] = {
+                "candidate": self.store.candidate.source,
+                "sample_rate": self.sample_rate,
+                "since": self.started_at,
+                "sampled": self.sampled,
+                "scored": self.scored,
+                "queued": self._q.qsize(),
+                "dropped_full": self.dropped_full,
+                "skipped_busy": self.skipped_busy,
+                "skipped_degraded": self.skipped_degraded,
+                "errors": self.errors,
+                "log_ratio_mean": self._mean if self._n else None,
+                "log_ratio_std": std,
+                "abs_rel_delta": dict(
+                    zip(
+                        map(str, REPORT_QUANTILES),
+                        self.abs_rel.quantiles(REPORT_QUANTILES),
+                    )
+                ),
+                "shadow_latency_ms": dict(
+                    zip(
+                        map(str, REPORT_QUANTILES),
+                        self.latency_ms.quantiles(REPORT_QUANTILES),
+                    )
+                ),
+            }
+            if examples:
+                out["top_diverging"] = [
+                    x[2] for x in sorted(self._top, key=lambda t: -t[0])
+                ]
+            return out
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from api.services.assess_table import AssessTable, pid_key
+from api.services.spatial_index import M_PER_DEG_LAT
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ShardInfo:
+    key: str
+    path: Path
+    rows: int
+    lat_min: float
+    lat_max: float
+    lng_min: float
+    lng_max: float
+
+
+def _table_bytes(table: AssessTable) -> int:
+    """Resident size of a shard: frame, coordinates and value array."""
+    size = int(table.df.memory_usage(deep=True).sum())
+    size += table.lat.nbytes + table.lng.nbytes
+    if table.values is not None:
+        size += table.values.nbytes
+    return int(size)
+
+
+class ShardedAssessTable:
+    """Assessment table split into region shards that load on first access.
+
+    Only the manifest (keys, paths, row counts, bounding boxes) is read at
+    startup. Each shard is a regular AssessTable with its own spatial index;
+    resident shards are kept in an LRU bounded by a memory budget. A snap
+    visits shards in order of bounding-box distance and stops once the next
+    box is farther than the best parcel found, so border clicks also search
+    the neighbouring shards.
+
+    With `value_store` set, a freshly loaded shard is queued for a
+    background thread that precomputes its values; until that finishes the
+    shard serves NaN values and predictions fall back to live scoring, so a
+    shard load on the request path only pays for the parquet read.
+    """
+
+    def __init__(
+        self,
+        shards: List[ShardInfo],
+        usecols: Optional[List[str]],
+        memory_budget_bytes: int,
+        pid_index_path: Optional[Path] = None,
+    ):
+        if not shards:
+            raise ValueError("manifest lists no shards")
+        self.shards = shards
+        self.usecols = usecols
+        self.memory_budget_bytes = int(memory_budget_bytes)
+
+        self._bbox = np.array(
+            [[s.lat_min, s.lat_max, s.lng_min, s.lng_max] for s in shards],
+            dtype=np.float64,
+        )
+        self._by_key = {s.key: i for i, s in enumerate(shards)}
+
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self._resident: "OrderedDict[int, Tuple[AssessTable, int]]" = OrderedDict()
+        self._resident_bytes = 0
+
+        self.loads = 0
+        self.evictions = 0
+
+        # PID -> shard number, read on first PID lookup
+        self.pid_index_path = pid_index_path
+        self._pid_shard: Optional[Dict[str, int]] = None
+        # when set, shards get precomputed values after they load
+        self.value_store = None
+        self._to_score: "queue.Queue[int]" = queue.Queue()
+        self._scorer: Optional[threading.Thread] = None
+        self.values_scored = 0
+        self.value_errors = 0
+
+    @classmethod
+    def load(
+        cls,
+        manifest_path: str,
+        usecols: Optional[List[str]] = None,
+        memory_budget_mb: float = 512.0,
+    ) -> "ShardedAssessTable":
+        p = Path(manifest_path)
+        if not p.exists():
+            raise FileNotFoundError(f"Shard manifest not found: {p}")
+        with open(p, encoding="utf-8") as f:
+            man = json.load(f)
+        if int(man.get("version", 0)) != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported shard manifest version in {p}")
+
+        if usecols is not None:
+            available = set(man.get("columns") or usecols)
+            usecols = [c for c in usecols if c in available]
+
+        shards = [
+            ShardInfo(
+                key=str(s["key"]),
+                path=p.parent / s["path"],
+                rows=int(s["rows"]),
+                lat_min=float(s["bbox"][0]),
+                lat_max=float(s["bbox"][1]),
+                lng_min=float(s["bbox"][2]),
+                lng_max=float(s["bbox"][3]),
+            )
+            for s in man["shards"]
+        ]
+        pid_index = man.get("pid_index")
+        return cls(
+            shards,
+            usecols,
+            int(memory_budget_mb * 1024 * 1024),
+            pid_index_path=(p.parent / pid_index) if pid_index else None,
+        )
+
+    def __len__(self) -> int:
+        return sum(s.rows for s in self.shards)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "shards": len(self.shards),
+                "resident": len(self._resident),
+                "resident_bytes": self._resident_bytes,
+                "budget_bytes": self.memory_budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "values_pending": self._to_score.qsize(),
+                "values_scored": self.values_scored,
+                "value_errors": self.value_errors,
+            }
+
+    def shard(self, i: int) -> AssessTable:
+        with self._lock:
+            hit = self._resident.get(i)
+            if hit is not None:
+                self._resident.move_to_end(i)
+                return hit[0]
+            load_lock = self._load_locks.setdefault(i, threading.Lock())
+
+        # one loader per shard; other shards stay available meanwhile
+        with load_lock:
+            with self._lock:
+                hit = self._resident.get(i)
+                if hit is not None:
+                    self._resident.move_to_end(i)
+                    return hit[0]
+
+            info = self.shards[i]
+            df = pd.read_parquet(info.path, columns=self.usecols)
+            table = AssessTable.from_frame(df)
+            if self.value_store is not None:
+                table.values = np.full(len(table.df), np.nan)
+            size = _table_bytes(table)
+
+            with self._lock:
+                self._resident[i] = (table, size)
+                self._resident_bytes += size
+                self.loads += 1
+                # always keep the shard just loaded, even if it alone is over
+                while (
+                    self._resident_bytes > self.memory_budget_bytes
+                    and len(self._resident) > 1
+                ):
+                    _, (_, old) = self._resident.popitem(last=False)
+                    self._resident_bytes -= old
+                    self.evictions += 1
+            if self.value_store is not None:
+                self._queue_scoring(i)
+            return table
+
+    def _queue_scoring(self, i: int) -> None:
+        with self._lock:
+            if self._scorer is None:
+                self._scorer = threading.Thread(
+                    target=self._score_loop, name="irea-shard-values", daemon=True
+                )
+                self._scorer.start()
+        self._to_score.put(i)
+
+    def _score_loop(self) -> None:
+        while True:
+            i = self._to_score.get()
+            with self._lock:
+                hit = self._resident.get(i)
+            # evicted before its turn: it is queued again when it reloads
+            if hit is None:
+                continue
+            try:
+                hit[0].attach_values(self.value_store)
+                self.values_scored += 1
+            except Exception as e:
+                self.value_errors += 1
+                print(f"[ERROR] scoring shard {self.shards[i].key} failed: {e}")
+
+    def shard_by_key(self, key: str) -> AssessTable:
+        return self.shard(self._by_key[key])
+
+    def _bbox_distance_m(self, lat: float, lng: float) -> np.ndarray:
+        b = self._bbox
+        dlat = np.maximum(0.0, np.maximum(b[:, 0] - lat, lat - b[:, 1]))
+        dlng = np.maximum(0.0, np.maximum(b[:, 2] - lng, lng - b[:, 3]))
+        m_lng = M_PER_DEG_LAT * np.cos(np.radians(lat))
+        return np.hypot(dlat * M_PER_DEG_LAT, dlng * m_lng)
+
+    def _bbox_distance_many(self, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        """_bbox_distance_m for many points: (points, shards) in metres."""
+        b = self._bbox
+        la = lat[:, None]
+        ln = lng[:, None]
+        dlat = np.maximum(0.0, np.maximum(b[:, 0] - la, la - b[:, 1]))
+        dlng = np.maximum(0.0, np.maximum(b[:, 2] - ln, ln - b[:, 3]))
+        m_lng = M_PER_DEG_LAT * np.cos(np.radians(la))
+        return np.hypot(dlat * M_PER_DEG_LAT, dlng * m_lng)
+
+    def snap(self, lat: float, lng: float) -> Tuple[pd.Series, int, float]:
+        """Nearest parcel across shards as (row, row index in shard, d2 deg)."""
+        row, idx, d2, _ = self.snap_with_shard(lat, lng)
+        return row, idx, d2
+
+    def snap_with_shard(
+        self, lat: float, lng: float
+    ) -> Tuple[pd.Series, int, float, str]:
+        box_d = self._bbox_distance_m(lat, lng)
+        order = np.argsort(box_d, kind="stable")
+
+        best_m = float("inf")
+        best: Optional[Tuple[int, int, AssessTable]] = None
+        for i in order:
+            if box_d[i] > best_m:
+                break
+            t = self.shard(int(i))
+            idx, dist = t.index.nearest(lat, lng, k=1)
+            if float(dist[0]) < best_m:
+                best_m = float(dist[0])
+                best = (int(i), int(idx[0]), t)
+
+        if best is None:
+            raise RuntimeError("no parcels found in any shard")
+
+        si, ri, t = best
+        d2 = (float(t.lat[ri]) - lat) ** 2 + (float(t.lng[ri]) - lng) ** 2
+        return t.df.iloc[ri], ri, d2, self.shards[si].key
+
+    def snap_k(
+        self, lat: float, lng: float, k: int, radius_m: float
+    ) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Up to k nearest parcels within radius_m across shards (row indices
+        are shard-local); the nearest parcel is always included."""
+        box_d = self._bbox_distance_m(lat, lng)
+        order = np.argsort(box_d, kind="stable")
+        cands: List[Tuple[float, int, int]] = []
+        best_m = float("inf")
+        for i in order:
+            # farther shards hold neither the nearest parcel nor any in radius
+            if box_d[i] > max(radius_m, best_m):
+                break
+            t = self.shard(int(i))
+            idx, dist = t.index.nearest(lat, lng, k=k)
+            best_m = min(best_m, float(dist[0]))
+            cands.extend(zip(dist.tolist(), [int(i)] * len(idx), idx.tolist()))
+        if not cands:
+            raise RuntimeError("no parcels found in any shard")
+        cands.sort()
+        cands = [cands[0]] + [c for c in cands[1:k] if c[0] <= radius_m]
+        rows = pd.DataFrame(
+            [self.shard(si).df.iloc[ri] for _, si, ri in cands]
+        ).reset_index(drop=True)
+        idx = np.asarray([ri for _, _, ri in cands], dtype=np.int64)
+        dist = np.asarray([d for d, _, _ in cands])
+        return rows, idx, dist
+
+    def snap_many(
+        self, lat: np.ndarray, lng: np.ndarray
+    ) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Snap each point; rows may come from different shards.
+
+        Points are grouped by their nearest shard bbox and snapped with one
+        nearest_many call per shard. Points with another shard's box closer
+        than the parcel found (border points) fall back to snap().
+        """
+        lat = np.asarray(lat, dtype=float)
+        lng = np.asarray(lng, dtype=float)
+        n = len(lat)
+        if n == 0:
+            return pd.DataFrame(), np.empty(0, dtype=np.int64), np.empty(0)
+        box_d = self._bbox_distance_many(lat, lng)
+        home = np.argmin(box_d, axis=1)
+        box_d[np.arange(n), home] = np.inf
+        other = box_d.min(axis=1)
+
+        owner = np.empty(n, dtype=np.int64)
+        idx = np.empty(n, dtype=np.int64)
+        border = np.zeros(n, dtype=bool)
+        # held for the whole call: a tight budget may evict them meanwhile
+        tables: Dict[int, AssessTable] = {}
+        for si in np.unique(home):
+            q = np.flatnonzero(home == si)
+            tables[si] = t = self.shard(int(si))
+            ri, dist = t.index.nearest_many(lat[q], lng[q])
+            owner[q] = si
+            idx[q] = ri
+            border[q] = other[q] < dist
+        for j in np.flatnonzero(border):
+            _, idx[j], _, key = self.snap_with_shard(float(lat[j]), float(lng[j]))
+            owner[j] = self._by_key[key]
+            if owner[j] not in tables:
+                tables[owner[j]] = self.shard(int(owner[j]))
+
+        parts = []
+        for si in np.unique(owner):
+            q = np.flatnonzero(owner == si)
+            parts.append(tables[si].df.iloc[idx[q]].set_axis(q))
+        frame = pd.concat(parts).sort_index()
+        d2 = (frame["LATITUDE"].to_numpy(dtype=float) - lat) ** 2 + (
+            frame["LONGITUDE"].to_numpy(dtype=float) - lng
+        ) ** 2
+        return frame.reset_index(drop=True), idx, d2
+
+    def shard_of_pid(self, pid: Any) -> Optional[int]:
+        """Shard holding a PID, from the manifest's PID index (None if absent)."""
+        if self._pid_shard is None:
+            if self.pid_index_path is None or not self.pid_index_path.exists():
+                return None
+            ix = pd.read_parquet(self.pid_index_path)
+            self._pid_shard = {
+                pid_key(p): self._by_key[k]
+                for p, k in zip(ix["PID"].tolist(), ix["shard"].tolist())
+                if k in self._by_key
+            }
+        return self._pid_shard.get(pid_key(pid))
+
+    def lookup_pid(self, pid: Any) -> Optional[Tuple[pd.Series, Optional[float]]]:
+        """Row for a PID, loading only the shard that holds it."""
+        si = self.shard_of_pid(pid)
+        if si is None:
+            return None
+        return self.shard(si).lookup_pid(pid)
+
+    def shards_in_bbox(
+        self, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> np.ndarray:
+        """Indices of shards whose bbox overlaps the box."""
+        b = self._bbox
+        return np.flatnonzero(
+            (b[:, 0] <= lat_max)
+            & (b[:, 1] >= lat_min)
+            & (b[:, 2] <= lng_max)
+            & (b[:, 3] >= lng_min)
+        )
+
+    def parcels_in_bbox(
+        self, lat_min: float, lat_max: float, lng_min: float, lng_max: float
+    ) -> Dict[str, np.ndarray]:
+        """Columnar parcels in the box from every shard whose bbox overlaps it."""
+        hit = self.shards_in_bbox(lat_min, lat_max, lng_min, lng_max)
+        parts = [
+            self.shard(int(i)).parcels_in_bbox(lat_min, lat_max, lng_min, lng_max)
+            for i in hit
+        ]
+        parts = [p for p in parts if len(p["lat"])]
+        if not parts:
+            return {
+                "pid": np.empty(0, dtype=object),
+                "lat": np.empty(0, dtype=np.float32),
+                "lng": np.empty(0, dtype=np.float32),
+            }
+        keys = [k for k in parts[0] if all(k in p for p in parts)]
+        return {k: np.concatenate([p[k] for p in parts]) for k in keys}
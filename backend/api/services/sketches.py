@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class QuantileSketch:
+    """DDSketch-style quantile sketch with bounded memory.
+
+    Values go into log-spaced buckets, so any quantile is returned within
+    `rel_acc` relative error. Sketches with the same rel_acc merge by adding
+    bucket counts. Past `max_buckets` the lowest buckets are collapsed, which
+    only costs accuracy at the extreme low tail.
+    """
+
+    def __init__(self, rel_acc: float = 0.01, max_buckets: int = 1024):
+        self.rel_acc = float(rel_acc)
+        self.max_buckets = int(max_buckets)
+        self._gamma_ln = math.log((1 + self.rel_acc) / (1 - self.rel_acc))
+        self._min_pos = 1e-9
+        self.pos: Dict[int, int] = {}
+        self.neg: Dict[int, int] = {}
+        self.zero = 0
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, x: float) -> int:
+        return int(math.ceil(math.log(x) / self._gamma_ln))
+
+    def _value(self, k: int) -> float:
+        # midpoint (in relative terms) of bucket k
+        return 2.0 * math.exp(self._gamma_ln * k) / (1.0 + math.exp(self._gamma_ln))
+
+    def add(self, x: float) -> None:
+        if not math.isfinite(x):
+            return
+        if x > self._min_pos:
+            k = self._key(x)
+            self.pos[k] = self.pos.get(k, 0) + 1
+            if len(self.pos) > self.max_buckets:
+                self._collapse(self.pos, lowest=True)
+        elif x < -self._min_pos:
+            k = self._key(-x)
+            self.neg[k] = self.neg.get(k, 0) + 1
+            if len(self.neg) > self.max_buckets:
+                self._collapse(self.neg, lowest=True)
+        else:
+            self.zero += 1
+        self.n += 1
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def add_many(self, xs: np.ndarray) -> None:
+        """Vectorized add() for a batch of values."""
+        xs = np.asarray(xs, dtype=np.float64)
+        xs = xs[np.isfinite(xs)]
+        if len(xs) == 0:
+            return
+        for sel, store, sign in (
+            (xs > self._min_pos, self.pos, 1.0),
+            (xs < -self._min_pos, self.neg, -1.0),
+        ):
+            v = sign * xs[sel]
+            if len(v) == 0:
+                continue
+            keys, counts = np.unique(
+                np.ceil(np.log(v) / self._gamma_ln).astype(np.int64),
+                return_counts=True,
+            )
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                store[k] = store.get(k, 0) + c
+            while len(store) > self.max_buckets:
+                self._collapse(store, lowest=True)
+        self.zero += int(((xs <= self._min_pos) & (xs >= -self._min_pos)).sum())
+        self.n += len(xs)
+        self.min = min(self.min, float(xs.min()))
+        self.max = max(self.max, float(xs.max()))
+
+    def _collapse(self, store: Dict[int, int], lowest: bool) -> None:
+        keys = sorted(store)
+        k0, k1 = (keys[0], keys[1]) if lowest else (keys[-1], keys[-2])
+        store[k1] += store.pop(k0)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.rel_acc != self.rel_acc:
+            raise ValueError("cannot merge sketches with different rel_acc")
+        for src, dst in ((other.pos, self.pos), (other.neg, self.neg)):
+            for k, c in src.items():
+                dst[k] = dst.get(k, 0) + c
+            while len(dst) > self.max_buckets:
+                self._collapse(dst, lowest=True)
+        self.zero += other.zero
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        rank = q * (self.n - 1)
+        seen = 0
+        # negatives from most negative (largest key) upwards
+        for k in sorted(self.neg, reverse=True):
+            seen += self.neg[k]
+            if seen > rank:
+                return max(self.min, -self._value(k))
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.pos):
+            seen += self.pos[k]
+            if seen > rank:
+                return min(self.max, self._value(k))
+        return self.max
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        return [self.quantile(q) for q in qs]
+
+
+class BinnedCounts:
+    """Counts over fixed bin edges (taken from the reference profile)."""
+
+    def __init__(self, edges: Sequence[float]):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    def add(self, x: float) -> None:
+        if math.isfinite(x):
+            self.counts[int(np.searchsorted(self.edges, x, side="right"))] += 1
+
+    def merge(self, other: "BinnedCounts") -> None:
+        self.counts += other.counts
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+
+class FrequentItems:
+    """Misra-Gries heavy hitters: at most `capacity` counters, mergeable.
+
+    Reported counts undercount by at most n / (capacity + 1).
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = int(capacity)
+        self.counts: Dict[str, int] = {}
+        self.n = 0
+
+    def add(self, item: Any) -> None:
+        key = str(item)
+        self.n += 1
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            for k in list(self.counts):
+                self.counts[k] -= 1
+                if self.counts[k] == 0:
+                    del self.counts[k]
+
+    def merge(self, other: "FrequentItems") -> None:
+        for k, c in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + c
+        self.n += other.n
+        if len(self.counts) > self.capacity:
+            cut = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {k: c - cut for k, c in self.counts.items() if c > cut}
+
+    def frequencies(self) -> Dict[str, float]:
+        if self.n == 0:
+            return {}
+        return {k: c / self.n for k, c in self.counts.items()}
+
+
+def psi(expected: Sequence[float], actual: Sequence[float], eps: float = 1e-4) -> float:
+    """Population stability index between two proportion vectors."""
+    e = np.clip(np.asarray(expected, dtype=float), eps, None)
+    a = np.clip(np.asarray(actual, dtype=float), eps, None)
+    e = e / e.sum()
+    a = a / a.sum()
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks(expected: Sequence[float], actual: Sequence[float]) -> float:
+    """KS statistic evaluated at the shared bin edges."""
+    e = np.cumsum(np.asarray(expected, dtype=float))
+    a = np.cumsum(np.asarray(actual, dtype=float))
+    if e[-1] <= 0 or a[-1] <= 0:
+        return 0.0
+    return float(np.max(np.abs(e / e[-1] - a / a[-1])))
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from api.utils.fast_json import dumps
+
+DELTA_RE = re.compile(r"^delta-(\d{6})\.json$")
+
+
+class DeltaLog:
+    """Numbered assessment deltas on disk, shared by all workers.
+
+    Each delta is one JSON file, delta-000001.json, delta-000002.json, ...
+    holding {"upserts": [records], "deletes": [PIDs]}. The file number is the
+    table version after applying it, so every worker (and every restart)
+    reaches the same version by replaying the files in order.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def entries(self, after: int = 0) -> List[Tuple[int, Path]]:
+        if not self.directory.exists():
+            return []
+        out = []
+        for p in self.directory.iterdir():
+            m = DELTA_RE.match(p.name)
+            if m and int(m.group(1)) > after:
+                out.append((int(m.group(1)), p))
+        return sorted(out)
+
+    def latest(self) -> int:
+        e = self.entries()
+        return e[-1][0] if e else 0
+
+    def append(self, upserts: List[Dict[str, Any]], deletes: Sequence[Any]) -> int:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        body = dumps(
+            {"created": time.time(), "upserts": upserts, "deletes": list(deletes)}
+        )
+        tmp = self.directory / f".tmp-{os.getpid()}-{threading.get_ident()}"
+        tmp.write_bytes(body)
+        # claim the next number; os.link fails if another writer got it first
+        while True:
+            seq = self.latest() + 1
+            try:
+                os.link(tmp, self.directory / f"delta-{seq:06d}.json")
+                break
+            except FileExistsError:
+                continue
+        tmp.unlink()
+        return seq
+
+    @staticmethod
+    def read(path: Path) -> Tuple[pd.DataFrame, List[Any]]:
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        return pd.DataFrame.from_records(d.get("upserts") or []), d.get("deletes") or []
+
+
+class TableSync:
+    """Keeps app.state.assess_table at the latest delta version.
+
+    All table swaps happen under one lock: admin requests apply their delta
+    right away, and a poll thread picks up deltas written by other workers
+    and refills precomputed values after a swap. Readers never lock; they
+    keep whichever table object they fetched.
+    """
+
+    def __init__(
+        self,
+        state,
+        log: DeltaLog,
+        store,
+        precompute: bool = True,
+        poll_s: float = 5.0,
+    ):
+        self.state = state
+        self.log = log
+        self.store = store
+        self.precompute = precompute
+        self.poll_s = float(poll_s)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.applied = 0
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self.last_applied_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # versions whose delta failed to apply and was stepped over
+        self.skipped: List[int] = []
+
+    def apply_pending(self) -> int:
+        """Apply every delta newer than the current table; returns the version."""
+        with self._lock:
+            return self._apply_pending()
+
+    def _apply_pending(self) -> int:
+        table = self.state.assess_table
+        for seq, path in self.log.entries(after=table.version):
+            try:
+                upserts, deletes = DeltaLog.read(path)
+                new, stats = table.apply_delta(
+                    upserts, deletes, store=self.store, version=seq
+                )
+            except Exception as e:
+                # every worker fails on it the same way; step over it so the
+                # deltas after it still apply instead of retrying forever
+                self.skipped.append(seq)
+                print(f"[ERROR] Assess delta {seq} skipped: {str(e)[:400]}")
+                table = replace(table, version=seq)
+                continue
+            table = new
+            self._log_applied(seq, stats)
+        if table is not self.state.assess_table:
+            self._swap(table)
+        return table.version
+
+    def _log_applied(self, seq: int, stats: Dict[str, Any]) -> None:
+        self.applied += 1
+        self.last_stats = {"version": seq, **stats}
+        print(f"[INFO] Assess delta {seq} applied: {stats}")
+        if stats["ignored_columns"]:
+            print(
+                f"[WARN] Assess delta {seq}: columns not in the table "
+                f"were ignored: {stats['ignored_columns']}"
+            )
+
+    def _swap(self, table) -> None:
+        self.state.assess_table = table
+        self.last_applied_at = time.time()
+
+    def submit(self, upserts: List[Dict[str, Any]], deletes: Sequence[Any]) -> int:
+        """Apply a delta and record it for the other workers.
+
+        The new table is built and its upserts scored before the delta is
+        written, so a delta that fails (ValueError for bad values) never
+        reaches the shared log.
+        """
+        with self._lock:
+            base = self.state.assess_table
+            if base.version != self.log.latest():
+                self._apply_pending()
+                base = self.state.assess_table
+            table, stats = base.apply_delta(
+                pd.DataFrame.from_records(upserts), deletes, store=self.store
+            )
+            seq = self.log.append(upserts, deletes)
+            if seq == base.version + 1:
+                table.version = seq
+                self._log_applied(seq, stats)
+                self._swap(table)
+                return seq
+        # another worker wrote a delta in between: replay the log in order
+        return self.apply_pending()
+
+    def _fill_values(self) -> None:
+        # scored without the lock, so admin deltas are not held up; a table
+        # swapped in meanwhile has no values yet and is filled next poll
+        table = self.state.assess_table
+        if table.values is None:
+            table.attach_values(self.store)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.apply_pending()
+                if self.precompute:
+                    self._fill_values()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)[:400]
+                print(f"[ERROR] assess delta sync failed: {self.last_error}")
+            self._stop.wait(self.poll_s)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="irea-table-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        table = self.state.assess_table
+        return {
+            "version": table.version,
+            "rows": len(table),
+            "values_ready": table.values is not None,
+            "deltas_on_disk": self.log.latest(),
+            "applied": self.applied,
+            "skipped": list(self.skipped),
+            "last": self.last_stats,
+            "last_applied_at": self.last_applied_at,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,16 @@
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def ensure_admin(request: Request) -> None:
+    expected = os.getenv("IREA_ADMIN_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled")
+
+    got = request.headers.get(ADMIN_HEADER, "")
+    if not hmac.compare_digest(got.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(x: Any) -> Any:
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, (set, frozenset)):
+        return list(x)
+    try:
+        return str(x)
+    except Exception:
+        return None
+
+
+def _nan_to_none(x: Any) -> Any:
+    # only used on the stdlib fallback path; orjson already emits null
+    if isinstance(x, float) and not math.isfinite(x):
+        return None
+    if isinstance(x, dict):
+        return {k: _nan_to_none(v) for k, v in x.items()}
+    if isinstance(x, list):
+        return [_nan_to_none(v) for v in x]
+    return x
+
+
+if orjson is not None:
+    _OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTS)
+
+else:
+
+    def dumps(content: Any) -> bytes:
+        s = json.dumps(content, default=_default, ensure_ascii=False)
+        if "NaN" in s or "Infinity" in s:
+            s = json.dumps(
+                _nan_to_none(json.loads(s)), ensure_ascii=False, allow_nan=False
+            )
+        return s.encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that serializes numpy scalars/arrays in a single pass.
+
+    Returning this from a route skips FastAPI's jsonable_encoder, so there is
+    no second walk over the payload. Non-finite floats become null.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def to_columns(
+    records: Sequence[Dict[str, Any]], columns: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Array-of-columns layout for large results.
+
+    {"columns": [...], "rows": n, "data": [[col0 values], [col1 values], ...]}
+    """
+    if columns is None:
+        columns = list(records[0].keys()) if records else []
+    data = [[r.get(c) for r in records] for c in columns]
+    return {"columns": columns, "rows": len(records), "data": data}
@@ -1,3 +1,9 @@
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 from fastapi import HTTPException
 
 BOSTON_BBOX = {
@@ -7,6 +13,245 @@ BOSTON_BBOX = {
     "lng_max": -70.9860,
 }
 
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+Ring = Sequence[Tuple[float, float]]
+
+
+class BoundaryGrid:
+    """Point-in-polygon test accelerated by a grid of classified cells.
+
+    Every cell is OUTSIDE, INSIDE or BOUNDARY (crossed by an edge). Only points
+    in BOUNDARY cells fall back to exact ray casting, and then only against the
+    edges overlapping that grid row. Rings use (lng, lat) order, as in GeoJSON;
+    holes and multi-polygons work via the even-odd rule.
+    """
+
+    def __init__(self, rings: List[Ring], n: int = 256):
+        pts = [p for ring in rings for p in ring]
+        if len(pts) < 3:
+            raise ValueError("boundary needs at least one ring")
+
+        self.x0 = min(p[0] for p in pts)
+        self.x1 = max(p[0] for p in pts)
+        self.y0 = min(p[1] for p in pts)
+        self.y1 = max(p[1] for p in pts)
+        self.n = int(n)
+        self.dx = (self.x1 - self.x0) / self.n
+        self.dy = (self.y1 - self.y0) / self.n
+
+        edges = []
+        for ring in rings:
+            m = len(ring)
+            for i in range(m):
+                a = ring[i]
+                b = ring[(i + 1) % m]
+                if a != b:
+                    edges.append((a[0], a[1], b[0], b[1]))
+        self.n_edges = len(edges)
+
+        # edges per row, for ray casting along that row
+        rows: List[list] = [[] for _ in range(self.n)]
+        for e in edges:
+            if e[1] == e[3]:
+                continue
+            r0 = self._row(min(e[1], e[3]))
+            r1 = self._row(max(e[1], e[3]))
+            for r in range(r0, r1 + 1):
+                rows[r].append(e)
+        self.row_edges = [tuple(r) for r in rows]
+
+        self.cells = bytearray(self.n * self.n)
+        for e in edges:
+            self._mark_edge(*e)
+        self._fill_rows()
+
+    def _row(self, y: float) -> int:
+        return min(self.n - 1, max(0, int((y - self.y0) / self.dy)))
+
+    def _col(self, x: float) -> int:
+        return min(self.n - 1, max(0, int((x - self.x0) / self.dx)))
+
+    def _mark_edge(self, ax: float, ay: float, bx: float, by: float) -> None:
+        if ax > bx:
+            ax, ay, bx, by = bx, by, ax, ay
+        c0 = self._col(ax)
+        c1 = self._col(bx)
+        for c in range(c0, c1 + 1):
+            # clip the edge to this column's x-slab, then mark the rows it spans
+            sx0 = max(ax, self.x0 + c * self.dx)
+            sx1 = min(bx, self.x0 + (c + 1) * self.dx)
+            if bx == ax:
+                ya, yb = ay, by
+            else:
+                t = (by - ay) / (bx - ax)
+                ya = ay + (sx0 - ax) * t
+                yb = ay + (sx1 - ax) * t
+            r0 = self._row(min(ya, yb))
+            r1 = self._row(max(ya, yb))
+            for r in range(r0, r1 + 1):
+                self.cells[r * self.n + c] = BOUNDARY
+
+    def _fill_rows(self) -> None:
+        # cells between boundary cells in a row share one state; test one each
+        n = self.n
+        for r in range(n):
+            c = 0
+            while c < n:
+                if self.cells[r * n + c] == BOUNDARY:
+                    c += 1
+                    continue
+                end = c
+                while end < n and self.cells[r * n + end] != BOUNDARY:
+                    end += 1
+                x = self.x0 + (c + 0.5) * self.dx
+                y = self.y0 + (r + 0.5) * self.dy
+                state = INSIDE if self._ray_cast(x, y, r) else OUTSIDE
+                for k in range(c, end):
+                    self.cells[r * n + k] = state
+                c = end
+
+    def _ray_cast(self, x: float, y: float, r: int) -> bool:
+        inside = False
+        for ax, ay, bx, by in self.row_edges[r]:
+            if (ay > y) != (by > y):
+                if x < ax + (y - ay) * (bx - ax) / (by - ay):
+                    inside = not inside
+        return inside
+
+    def contains(self, lat: float, lng: float) -> bool:
+        if not (self.x0 <= lng <= self.x1 and self.y0 <= lat <= self.y1):
+            return False
+        r = min(self.n - 1, int((lat - self.y0) / self.dy))
+        c = min(self.n - 1, int((lng - self.x0) / self.dx))
+        state = self.cells[r * self.n + c]
+        if state != BOUNDARY:
+            return state == INSIDE
+        return self._ray_cast(lng, lat, r)
+
+    def contains_many(self, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        """Vectorized contains(); only points in BOUNDARY cells are ray cast."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        out = np.zeros(len(lat), dtype=bool)
+        box = (lng >= self.x0) & (lng <= self.x1) & (lat >= self.y0) & (lat <= self.y1)
+        i = np.flatnonzero(box)
+        if len(i) == 0:
+            return out
+        r = np.minimum(self.n - 1, ((lat[i] - self.y0) / self.dy).astype(np.int64))
+        c = np.minimum(self.n - 1, ((lng[i] - self.x0) / self.dx).astype(np.int64))
+        state = np.frombuffer(bytes(self.cells), dtype=np.uint8)[r * self.n + c]
+        out[i] = state == INSIDE
+        for j in np.flatnonzero(state == BOUNDARY):
+            k = i[j]
+            out[k] = self._ray_cast(float(lng[k]), float(lat[k]), int(r[j]))
+        return out
+
+    @classmethod
+    def from_geojson(cls, path: str, n: int = 256) -> "BoundaryGrid":
+        with open(path, encoding="utf-8") as f:
+            obj = json.load(f)
+        rings = rings_from_geojson(obj)
+        if not rings:
+            raise ValueError(f"No Polygon/MultiPolygon geometry in {path}")
+        return cls(rings, n=n)
+
+
+def parse_ring(ring: Any) -> Ring:
+    """[[lng, lat], ...] as a list of float pairs; ValueError if malformed."""
+    if not isinstance(ring, (list, tuple)):
+        raise ValueError("polygon ring must be a list of [lng, lat] points")
+    out = []
+    for p in ring:
+        if not isinstance(p, (list, tuple)) or len(p) < 2:
+            raise ValueError("polygon points must be [lng, lat] pairs")
+        x, y = p[0], p[1]
+        if not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in (x, y)
+        ):
+            raise ValueError("polygon coordinates must be numbers")
+        x, y = float(x), float(y)
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("polygon coordinates must be finite")
+        out.append((x, y))
+    return out
+
+
+def rings_from_geojson(obj: Dict[str, Any]) -> List[Ring]:
+    """All rings of the Polygon/MultiPolygon geometries in a GeoJSON object.
+
+    Raises ValueError on a malformed Polygon/MultiPolygon; other geometry
+    types are skipped.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("GeoJSON must be an object")
+    if obj.get("type") == "FeatureCollection":
+        features = obj.get("features", [])
+        if not isinstance(features, list):
+            raise ValueError("FeatureCollection features must be a list")
+        geoms = [ft.get("geometry") if isinstance(ft, dict) else ft for ft in features]
+    elif obj.get("type") == "Feature":
+        geoms = [obj.get("geometry")]
+    else:
+        geoms = [obj]
+
+    rings: List[Ring] = []
+    for g in geoms:
+        if not isinstance(g, dict) or g.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        coords = g.get("coordinates")
+        if not isinstance(coords, list):
+            raise ValueError(f"{g['type']} needs a coordinates list")
+        polys = [coords] if g["type"] == "Polygon" else coords
+        for poly in polys:
+            if not isinstance(poly, list):
+                raise ValueError("polygon must be a list of rings")
+            rings.extend(parse_ring(ring) for ring in poly)
+    return rings
+
+
+_BOUNDARY: Optional[BoundaryGrid] = None
+
+
+def load_boundary(path: str, n: int = 256) -> Optional[BoundaryGrid]:
+    """Install the city boundary used by ensure_in_boston (bbox-only if absent)."""
+    global _BOUNDARY
+    if not Path(path).exists():
+        _BOUNDARY = None
+        return None
+    _BOUNDARY = BoundaryGrid.from_geojson(path, n=n)
+    return _BOUNDARY
+
+
+def in_boston(lat: float, lng: float) -> bool:
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        return False
+    ok = (
+        BOSTON_BBOX["lat_min"] <= lat <= BOSTON_BBOX["lat_max"]
+        and BOSTON_BBOX["lng_min"] <= lng <= BOSTON_BBOX["lng_max"]
+    )
+    if not ok:
+        return False
+    if _BOUNDARY is None:
+        return True
+    return _BOUNDARY.contains(lat, lng)
+
+
+def in_boston_many(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Vectorized in_boston(); NaN coordinates are outside."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        ok = (
+            (lat >= BOSTON_BBOX["lat_min"])
+            & (lat <= BOSTON_BBOX["lat_max"])
+            & (lng >= BOSTON_BBOX["lng_min"])
+            & (lng <= BOSTON_BBOX["lng_max"])
+        )
+    if _BOUNDARY is not None and ok.any():
+        ok[ok] = _BOUNDARY.contains_many(lat[ok], lng[ok])
+    return ok
+
 
 def ensure_in_boston(lat: float, lng: float) -> None:
     try:
@@ -15,9 +260,5 @@ def ensure_in_boston(lat: float, lng: float) -> None:
     except Exception:
         raise HTTPException(status_code=400, detail="目前只支持Boston地区")
 
-    ok = (
-        BOSTON_BBOX["lat_min"] <= lat <= BOSTON_BBOX["lat_max"]
-        and BOSTON_BBOX["lng_min"] <= lng <= BOSTON_BBOX["lng_max"]
-    )
-    if not ok:
+    if not in_boston(lat, lng):
         raise HTTPException(status_code=400, detail="目前只支持Boston地区")
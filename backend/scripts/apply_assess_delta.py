@@ -0,0 +1,68 @@
+"""Send an assessment delta (CSV or parquet) to a running API.
+
+    IREA_ADMIN_TOKEN=... python scripts/apply_assess_delta.py corrections.csv \
+        --url http://127.0.0.1:8000
+
+Rows are upserts keyed by PID. An optional `_op` column marks rows with
+"delete"; only their PID is used. The API writes the delta to its delta
+directory, swaps in the new table and reports the new table version; the
+other workers follow within IREA_DELTA_POLL_S seconds.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+
+def read_delta(path: str):
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    if "PID" not in df.columns:
+        raise SystemExit("delta file needs a PID column")
+    is_del = (
+        df["_op"].astype(str).str.lower().eq("delete")
+        if "_op" in df.columns
+        else pd.Series(False, index=df.index)
+    )
+    deletes = df.loc[is_del, "PID"].tolist()
+    ups = df.loc[~is_del].drop(columns=["_op"], errors="ignore")
+    upserts = [
+        {k: v for k, v in r.items() if not (isinstance(v, float) and math.isnan(v))}
+        for r in ups.to_dict(orient="records")
+    ]
+    return upserts, deletes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    args = ap.parse_args()
+
+    token = os.getenv("IREA_ADMIN_TOKEN")
+    if not token:
+        raise SystemExit("set IREA_ADMIN_TOKEN")
+
+    upserts, deletes = read_delta(args.path)
+    print(f"Sending {len(upserts)} upserts, {len(deletes)} deletes")
+    req = urllib.request.Request(
+        args.url.rstrip("/") + "/admin/table/delta",
+        data=json.dumps({"upserts": upserts, "deletes": deletes}, default=str).encode(),
+        headers={"Content-Type": "application/json", "X-Admin-Token": token},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=600) as r:
+            print(json.dumps(json.load(r), indent=2))
+    except urllib.error.HTTPError as e:
+        print(f"{e.code}: {e.read().decode(errors='replace')}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
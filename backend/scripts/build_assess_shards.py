@@ -0,0 +1,133 @@
+"""Partition the assessment table into region shards plus a manifest.
+
+    python scripts/build_assess_shards.py --src api/models/final_table_12.csv \
+        --out api/models/assess_shards --by tile --tile-deg 0.02
+
+The server picks the shards up via api/models/assess_shards/manifest.json
+(or IREA_ASSESS_MANIFEST) and loads each one on first access.
+
+Each --chunksize chunk of the source is split by shard and spilled to disk,
+then shards are assembled and written one at a time, so memory stays around
+one chunk plus the largest shard.
+"""
+
+import argparse
+import json
+import math
+import shutil
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "api/models/final_table_12.csv"
+OUT = ROOT / "api/models/assess_shards"
+
+MANIFEST_VERSION = 1
+
+
+def shard_keys(df: pd.DataFrame, by: str, tile_deg: float) -> pd.Series:
+    if by == "zip":
+        z = pd.to_numeric(df["ZIP_CODE"], errors="coerce")
+        return "zip_" + z.fillna(-1).astype(int).astype(str).str.zfill(5)
+
+    ix = (df["LONGITUDE"] / tile_deg).apply(math.floor).astype(int)
+    iy = (df["LATITUDE"] / tile_deg).apply(math.floor).astype(int)
+    return "tile_" + iy.astype(str) + "_" + ix.astype(str)
+
+
+def _finish_shard(key: str, spills: list, out: Path) -> tuple:
+    """Write one shard from its spill files; returns (manifest entry, PIDs)."""
+    g = pd.concat([pd.read_pickle(p) for p in spills], ignore_index=True)
+    for p in spills:
+        p.unlink()
+    # mixed-type object columns (e.g. "1,150") must be strings for parquet
+    for c in g.columns:
+        if g[c].dtype == "object":
+            g[c] = g[c].astype("string")
+    name = f"{key}.parquet"
+    g.to_parquet(out / name, index=False)
+    pids = None
+    if "PID" in g.columns:
+        pids = pd.DataFrame({"PID": g["PID"].astype("string"), "shard": key})
+    entry = {
+        "key": key,
+        "path": name,
+        "rows": int(len(g)),
+        "bbox": [
+            float(g["LATITUDE"].min()),
+            float(g["LATITUDE"].max()),
+            float(g["LONGITUDE"].min()),
+            float(g["LONGITUDE"].max()),
+        ],
+    }
+    return entry, pids
+
+
+def build_shards(src: str, out: Path, by: str, tile_deg: float, chunksize: int) -> dict:
+    """Write the shards, PID index and manifest under `out`; returns the manifest."""
+    out.mkdir(parents=True, exist_ok=True)
+    spill_dir = Path(tempfile.mkdtemp(prefix=".spill-", dir=out))
+    try:
+        spills = defaultdict(list)
+        columns = None
+        reader = pd.read_csv(src, chunksize=chunksize, low_memory=False)
+        for n, chunk in enumerate(reader):
+            columns = list(chunk.columns)
+            chunk["LATITUDE"] = pd.to_numeric(chunk["LATITUDE"], errors="coerce")
+            chunk["LONGITUDE"] = pd.to_numeric(chunk["LONGITUDE"], errors="coerce")
+            chunk = chunk.dropna(subset=["LATITUDE", "LONGITUDE"])
+            for key, g in chunk.groupby(shard_keys(chunk, by, tile_deg)):
+                path = spill_dir / f"{key}.{n}.pkl"
+                g.to_pickle(path)
+                spills[key].append(path)
+
+        shards = []
+        pid_parts = []
+        for key in sorted(spills):
+            entry, pids = _finish_shard(key, spills.pop(key), out)
+            shards.append(entry)
+            if pids is not None:
+                pid_parts.append(pids)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    pid_index = None
+    if pid_parts:
+        pid_index = "pid_index.parquet"
+        pd.concat(pid_parts, ignore_index=True).to_parquet(out / pid_index, index=False)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "source": str(src),
+        "by": by,
+        "tile_deg": tile_deg if by == "tile" else None,
+        "columns": columns,
+        "shards": shards,
+        "pid_index": pid_index,
+    }
+    with open(out / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default=str(SRC))
+    ap.add_argument("--out", default=str(OUT))
+    ap.add_argument("--by", choices=["tile", "zip"], default="tile")
+    ap.add_argument("--tile-deg", type=float, default=0.02)
+    ap.add_argument("--chunksize", type=int, default=200_000)
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    manifest = build_shards(args.src, out, args.by, args.tile_deg, args.chunksize)
+    shards = manifest["shards"]
+    rows = sum(s["rows"] for s in shards)
+    print(f"Saved {len(shards)} shards ({rows} rows) + manifest to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Build the multi-year assessment store served by /api/parcels/{pid}/history.
+
+    python scripts/build_assessment_history.py \
+        --year 2020=fy2020.csv --year 2022=fy2022.csv --year 2023=fy2023.csv \
+        --year 2024=fy2024.csv --year 2025=fy2025.csv
+
+Each --year is one Property Assessment snapshot (data.boston.gov) with a PID
+column; column names are normalized across years (AV_TOTAL and
+TOTAL_VALUE_2025 both become TOTAL_VALUE). The latest year is stored in full
+and the others as per-column deltas against it (api/services/
+assessment_history.py).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api.services.assessment_history import (  # noqa: E402
+    HISTORY_COLUMNS,
+    AssessmentHistory,
+    canonical_columns,
+)
+
+OUT = ROOT / "api/models/assessment_history"
+
+
+def read_snapshot(path: str, columns) -> pd.DataFrame:
+    # read only the columns that map onto the store's names
+    header = pd.read_csv(path, nrows=0)
+    names = dict(zip(header.columns, canonical_columns(header).columns))
+    usecols = [c for c in header.columns if names.get(c) in set(columns) | {"PID"}]
+    return pd.read_csv(path, usecols=usecols, dtype=str, low_memory=False)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--year",
+        action="append",
+        required=True,
+        metavar="YEAR=CSV",
+        help="fiscal year and snapshot path; repeat per year",
+    )
+    ap.add_argument("--base-year", type=int, default=None, help="default: latest")
+    ap.add_argument("--columns", nargs="+", default=HISTORY_COLUMNS)
+    ap.add_argument("--out", default=str(OUT))
+    args = ap.parse_args()
+
+    t0 = time.time()
+    frames = {}
+    for spec in args.year:
+        year, sep, path = spec.partition("=")
+        if not sep or not year.isdigit():
+            raise SystemExit(f"--year expects YEAR=CSV, got {spec!r}")
+        frames[int(year)] = read_snapshot(path, args.columns)
+        print(f"[INFO] FY{year}: {path} rows={len(frames[int(year)])}")
+
+    hist = AssessmentHistory.build(frames, args.columns, base_year=args.base_year)
+    del frames
+    hist.save(args.out)
+
+    st = hist.stats()
+    print(
+        f"[INFO] Saved {args.out}: parcels={st['parcels']} years={st['years']} "
+        f"base=FY{st['baseYear']} columns={st['columns']} "
+        f"delta cells={st['deltaCells']} of {st['denseCells']} "
+        f"({time.time() - t0:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
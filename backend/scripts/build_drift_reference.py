@@ -0,0 +1,117 @@
+"""Build the drift reference profile for the current model pair.
+
+Run after training, before deploying new models:
+
+    python scripts/build_drift_reference.py [--models DIR] [--src CSV] [--out JSON]
+
+Input features are profiled on the assessment table the baseline was trained
+on; outputs (residual, finalPrice, assessSource) by scoring that table with
+the models in --models (baseline_lgb.txt, residual_lgb.txt). The output is
+written to a temp file and renamed, so a failed run leaves the old reference.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api.services.drift_monitor import (  # noqa: E402
+    REFERENCE_VERSION,
+    categorical_reference,
+    numeric_reference,
+)
+from api.services.model_store import ModelStore  # noqa: E402
+
+MODELS = ROOT / "api/models"
+SRC = MODELS / "final_table_12.csv"
+OUT = MODELS / "drift_reference.json"
+
+# monitored request field -> assessment column
+INPUT_COLUMNS = {
+    "latitude": "LATITUDE",
+    "longitude": "LONGITUDE",
+    "areaSqft": "LIVING_AREA",
+    "lotSqft": "LAND_SF",
+    "bedrooms": "BED_RMS",
+    "builtYear": "YR_BUILT",
+    "parkingSpaces": "NUM_PARKING",
+}
+
+CHUNK = 50_000
+
+
+def num(s: pd.Series) -> np.ndarray:
+    if s.dtype == "object":
+        s = s.astype(str).str.replace(",", "", regex=False)
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+
+
+def _write_atomic(ref: dict, path: str) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ref, f, indent=2)
+    os.replace(tmp, path)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--models", default=str(MODELS), help="model directory")
+    ap.add_argument("--src", default=str(SRC), help="baseline training table")
+    ap.add_argument("--out", default=str(OUT))
+    args = ap.parse_args()
+
+    models = Path(args.models)
+    baseline = str(models / "baseline_lgb.txt")
+    residual = str(models / "residual_lgb.txt")
+    store = ModelStore(baseline_path=baseline, residual_path=residual)
+    df = pd.read_csv(args.src, low_memory=False)
+    print(f"Loaded {args.src} rows={len(df)}")
+
+    feats = {}
+    for name, col in INPUT_COLUMNS.items():
+        if col in df.columns:
+            feats[name] = numeric_reference(num(df[col]))
+    if "FULL_BTH" in df.columns:
+        half = num(df["HLF_BTH"]) if "HLF_BTH" in df.columns else 0.0
+        feats["bathrooms"] = numeric_reference(
+            num(df["FULL_BTH"]) + 0.5 * np.nan_to_num(half)
+        )
+    if "HAS_REMODEL" in df.columns:
+        v = num(df["HAS_REMODEL"])
+        feats["renovated"] = categorical_reference([int(x) for x in v[np.isfinite(v)]])
+
+    # score only the columns the API loads, so outputs match what it serves
+    serve_cols = {"PID", "LATITUDE", "LONGITUDE"}
+    serve_cols.update(store.baseline_features)
+    serve_cols.update(store.residual_features)
+    serve = df[[c for c in df.columns if c in serve_cols]]
+    parts = [
+        store.predict_frame(serve.iloc[i : i + CHUNK])
+        for i in range(0, len(serve), CHUNK)
+    ]
+    scored = pd.concat(parts, ignore_index=True)
+    feats["residual"] = numeric_reference(scored["residual"].to_numpy())
+    feats["finalPrice"] = numeric_reference(scored["finalPrice"].to_numpy())
+    feats["assessSource"] = categorical_reference(scored["assessSource"].tolist())
+
+    ref = {
+        "version": REFERENCE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": str(args.src),
+        "models": {"baseline": baseline, "residual": residual},
+        "features": {k: v for k, v in feats.items() if v is not None},
+    }
+    _write_atomic(ref, args.out)
+    print(f"Saved drift reference ({len(ref['features'])} features) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
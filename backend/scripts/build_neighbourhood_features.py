@@ -0,0 +1,94 @@
+"""Add neighbourhood aggregate columns (NB_*) to the assessment table.
+
+    python scripts/build_neighbourhood_features.py \
+        --join ../data/Baseline_Model/final_table_12.csv \
+        --join ../data/Residual_Model/train_residual.csv
+
+Computes radius and k-NN aggregates for every parcel of --src over one
+spatial index (api/services/neighbourhood.py) and writes them back as extra
+columns. --join files get the same columns matched by PID, so the training
+scripts see exactly the values the API reads from the table. Re-running
+replaces existing NB_* columns.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api.services.assess_table import pid_key  # noqa: E402
+from api.services.neighbourhood import (  # noqa: E402
+    KNN_K,
+    RADII_M,
+    neighbourhood_features,
+)
+
+SRC = ROOT / "api/models/final_table_12.csv"
+
+
+def _write_atomic(df: pd.DataFrame, path: str) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _drop_nb(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(columns=[c for c in df.columns if c.startswith("NB_")])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default=str(SRC))
+    ap.add_argument("--out", default=None, help="default: overwrite --src")
+    ap.add_argument("--join", action="append", default=[], help="CSV with PID")
+    ap.add_argument("--radii", type=float, nargs="+", default=list(RADII_M))
+    ap.add_argument("--k", type=int, default=KNN_K)
+    args = ap.parse_args()
+
+    t0 = time.time()
+    df = _drop_nb(pd.read_csv(args.src, low_memory=False))
+    lat = pd.to_numeric(df["LATITUDE"], errors="coerce")
+    lng = pd.to_numeric(df["LONGITUDE"], errors="coerce")
+    located = df[lat.notna() & lng.notna()]
+    print(f"[INFO] {args.src}: rows={len(df)} with coordinates={len(located)}")
+
+    radii = [int(r) if float(r).is_integer() else r for r in args.radii]
+    feats = neighbourhood_features(
+        located.reset_index(drop=True), radii_m=radii, k=args.k
+    )
+    feats.index = located.index
+    df = df.join(feats)
+    print(f"[INFO] computed {list(feats.columns)} in {time.time() - t0:.1f}s")
+    print(feats.describe().T.to_string())
+
+    out = args.out or args.src
+    _write_atomic(df, out)
+    print(f"[INFO] wrote {out}")
+
+    if "PID" not in df.columns:
+        if args.join:
+            raise SystemExit("--join needs a PID column in --src")
+        return
+    by_pid = feats.copy()
+    by_pid["_pid"] = [pid_key(p) for p in df.loc[feats.index, "PID"]]
+    by_pid = by_pid.drop_duplicates("_pid").set_index("_pid")
+    for path in args.join:
+        other = _drop_nb(pd.read_csv(path, low_memory=False))
+        keys = [pid_key(p) for p in other["PID"]]
+        add = by_pid.reindex(keys)
+        add.index = other.index
+        other = other.join(add)
+        matched = int(np.isfinite(add.iloc[:, 0].to_numpy(dtype=float)).sum())
+        _write_atomic(other, path)
+        print(f"[INFO] joined into {path}: rows={len(other)} matched={matched}")
+
+
+if __name__ == "__main__":
+    main()
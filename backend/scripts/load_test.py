@@ -0,0 +1,530 @@
+"""Step-wise load generator for the predict API.
+
+In-process (drives the ASGI app directly, no sockets):
+    python scripts/load_test.py --steps 1,2,4,8,16,32 --duration 10
+
+Against a running uvicorn:
+    python scripts/load_test.py --url http://127.0.0.1:8000 --server-pid <pid>
+
+Spawn uvicorn with N workers and measure it:
+    python scripts/load_test.py --spawn-workers 4
+
+Replay recorded traffic from the audit log instead of synthetic payloads:
+    python scripts/load_test.py --replay logs/audit
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+
+from api.utils.geo_guard import BOSTON_BBOX  # noqa: E402
+
+# a few dense neighbourhoods that real users click over and over
+HOT_PARCELS = [
+    (42.3478, -71.0466),  # Seaport
+    (42.3588, -71.0707),  # Beacon Hill
+    (42.3467, -71.0972),  # Fenway
+    (42.3790, -71.0330),  # East Boston
+    (42.3097, -71.1151),  # Jamaica Plain
+    (42.2836, -71.0664),  # Dorchester
+]
+
+FORM_FIELDS = {
+    "areaSqft": lambda r: r.randint(500, 4500),
+    "bedrooms": lambda r: r.randint(1, 6),
+    "bathrooms": lambda r: r.choice([1, 1.5, 2, 2.5, 3]),
+    "builtYear": lambda r: r.randint(1880, 2024),
+    "parkingSpaces": lambda r: r.randint(0, 3),
+    "lotSqft": lambda r: r.randint(500, 8000),
+    "renovated": lambda r: r.choice([0, 1]),
+    "sale_year": lambda r: 2025,
+    "sale_month": lambda r: r.randint(1, 12),
+}
+
+
+@dataclass
+class PayloadMix:
+    hot_fraction: float = 0.3
+    field_fraction: float = 0.6
+    seed: int = 0
+    rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def next(self) -> Dict[str, Any]:
+        r = self.rng
+        if r.random() < self.hot_fraction:
+            lat, lng = r.choice(HOT_PARCELS)
+            # same parcel, slightly different click
+            lat += r.uniform(-5e-5, 5e-5)
+            lng += r.uniform(-5e-5, 5e-5)
+        else:
+            lat = r.uniform(BOSTON_BBOX["lat_min"], BOSTON_BBOX["lat_max"])
+            lng = r.uniform(BOSTON_BBOX["lng_min"], BOSTON_BBOX["lng_max"])
+
+        p: Dict[str, Any] = {"latitude": lat, "longitude": lng}
+        # partial HouseForm: users fill in some fields and leave the rest
+        for k, gen in FORM_FIELDS.items():
+            if r.random() < self.field_fraction:
+                p[k] = gen(r)
+        return p
+
+
+class ReplayMix:
+    """Cycles through request payloads recorded by the audit log."""
+
+    def __init__(self, paths: List[str]):
+        from api.services.audit_log import read_audit
+
+        self.payloads = [
+            {k: v for k, v in rec["payload"].items() if v is not None}
+            for rec in read_audit(paths)
+            if rec.get("payload")
+        ]
+        if not self.payloads:
+            raise SystemExit(f"no audit records found in {paths}")
+        self._i = 0
+
+    def next(self) -> Dict[str, Any]:
+        p = self.payloads[self._i % len(self.payloads)]
+        self._i += 1
+        return p
+
+
+# admission control rejections (api/services/admission.py)
+SHED_STATUS = (429, 503)
+SHED_BACKOFF_S = 0.05
+
+
+@dataclass
+class StepResult:
+    concurrency: int
+    requests: int
+    duration_s: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    error_rate: float
+    rejected_4xx: int
+    shed: int
+    cpu_pct: Optional[float]
+    knee: bool = False
+
+
+class AsgiTransport:
+    """Calls the ASGI app directly, including its lifespan startup."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._lifespan_q: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        q: asyncio.Queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+        await q.put({"type": "lifespan.startup"})
+
+        async def receive():
+            return await q.get()
+
+        async def send(msg):
+            if msg["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(True)
+            elif msg["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(RuntimeError(msg.get("message", "startup")))
+
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_q = q
+        self._lifespan_task = asyncio.create_task(self.app(scope, receive, send))
+        await started
+
+    async def stop(self) -> None:
+        if self._lifespan_q is not None:
+            await self._lifespan_q.put({"type": "lifespan.shutdown"})
+        if self._lifespan_task is not None:
+            try:
+                await asyncio.wait_for(self._lifespan_task, timeout=5)
+            except Exception:
+                pass
+
+    async def connect(self):
+        return self
+
+    async def close(self) -> None:
+        return None
+
+    async def post(self, path: str, body: bytes) -> int:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [
+                (b"host", b"loadtest"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        sent = False
+        status = 0
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = int(msg["status"])
+
+        await self.app(scope, receive, send)
+        return status
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client; one per concurrency slot."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _open(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def post(self, path: str, body: bytes) -> int:
+        if self.writer is None:
+            await self._open()
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+        try:
+            self.writer.write(head + body)
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+            status = int(status_line.split()[1])
+            length = 0
+            close = False
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                k, _, v = line.decode("latin-1").partition(":")
+                k = k.strip().lower()
+                if k == "content-length":
+                    length = int(v.strip())
+                elif k == "connection" and v.strip().lower() == "close":
+                    close = True
+            if length:
+                await self.reader.readexactly(length)
+            if close:
+                await self.close()
+            return status
+        except Exception:
+            await self.close()
+            raise
+
+
+class HttpTransport:
+    def __init__(self, url: str):
+        u = urlsplit(url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+
+    async def start(self) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+    async def connect(self) -> HttpConnection:
+        return HttpConnection(self.host, self.port)
+
+
+def _proc_cpu_seconds(pid: int) -> float:
+    """utime+stime of pid and its direct children (uvicorn workers), Linux."""
+    tick = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids += [int(x) for x in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                parts = f.read().rsplit(")", 1)[1].split()
+            total += (int(parts[11]) + int(parts[12])) / tick
+        except OSError:
+            continue
+    return total
+
+
+async def run_step(
+    transport,
+    mix: "PayloadMix | ReplayMix",
+    path: str,
+    concurrency: int,
+    duration: float,
+) -> Tuple[List[float], int, int, int, float]:
+    latencies: List[float] = []
+    errors = 0
+    rejected = 0
+    shed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, rejected, shed
+        conn = await transport.connect()
+        try:
+            while time.perf_counter() < deadline:
+                body = json.dumps(mix.next()).encode()
+                t0 = time.perf_counter()
+                try:
+                    status = await conn.post(path, body)
+                except Exception:
+                    status = 0
+                if status in SHED_STATUS:
+                    # load shedding: back off like a client would, keep p99
+                    # to admitted requests
+                    shed += 1
+                    await asyncio.sleep(SHED_BACKOFF_S)
+                    continue
+                latencies.append(time.perf_counter() - t0)
+                if status == 0 or status >= 500:
+                    errors += 1
+                elif status >= 400:
+                    rejected += 1
+        finally:
+            await conn.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, rejected, shed, time.perf_counter() - t0
+
+
+async def run(args) -> List[StepResult]:
+    if args.url:
+        transport = HttpTransport(args.url)
+        cpu_pid = args.server_pid
+    else:
+        from api.main import app
+
+        transport = AsgiTransport(app)
+        cpu_pid = os.getpid()
+
+    await transport.start()
+    if args.replay:
+        mix = ReplayMix(args.replay)
+        print(f"[load] replaying {len(mix.payloads)} audited requests")
+    else:
+        mix = PayloadMix(args.hot_fraction, args.field_fraction, args.seed)
+    results: List[StepResult] = []
+    try:
+        if args.warmup > 0:
+            await run_step(transport, mix, args.path, 1, args.warmup)
+
+        for c in args.steps:
+            cpu0 = _proc_cpu_seconds(cpu_pid) if cpu_pid else None
+            lat, errors, rejected, shed, wall = await run_step(
+                transport, mix, args.path, c, args.duration
+            )
+            cpu1 = _proc_cpu_seconds(cpu_pid) if cpu_pid else None
+
+            n = len(lat)
+            ms = np.asarray(lat) * 1000.0 if n else np.zeros(1)
+            res = StepResult(
+                concurrency=c,
+                requests=n,
+                duration_s=wall,
+                rps=n / wall if wall > 0 else 0.0,
+                p50_ms=float(np.percentile(ms, 50)),
+                p95_ms=float(np.percentile(ms, 95)),
+                p99_ms=float(np.percentile(ms, 99)),
+                error_rate=errors / n if n else 0.0,
+                rejected_4xx=rejected,
+                shed=shed,
+                cpu_pct=(
+                    100.0 * (cpu1 - cpu0) / wall
+                    if cpu0 is not None and cpu1 is not None and wall > 0
+                    else None
+                ),
+            )
+            results.append(res)
+            print(_fmt_row(res), flush=True)
+    finally:
+        await transport.stop()
+
+    _mark_knee(results, args.knee_gain)
+    return results
+
+
+def _mark_knee(results: List[StepResult], min_gain: float) -> None:
+    # first step where doubling concurrency no longer buys min_gain more RPS
+    for prev, cur in zip(results, results[1:]):
+        if prev.rps > 0 and cur.rps < prev.rps * (1.0 + min_gain):
+            prev.knee = True
+            return
+
+
+def _fmt_row(r: StepResult) -> str:
+    cpu = f"{r.cpu_pct:7.1f}" if r.cpu_pct is not None else "    n/a"
+    return (
+        f"{r.concurrency:>5} {r.requests:>8} {r.rps:>9.1f} {r.p50_ms:>8.2f} "
+        f"{r.p95_ms:>8.2f} {r.p99_ms:>8.2f} {100 * r.error_rate:>6.2f} "
+        f"{r.rejected_4xx:>6} {r.shed:>6} {cpu}{'  <- knee' if r.knee else ''}"
+    )
+
+
+HEADER = (
+    f"{'conc':>5} {'reqs':>8} {'rps':>9} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+    f"{'err%':>6} {'4xx':>6} {'shed':>6} {'cpu%':>7}"
+)
+
+
+def _spawn_uvicorn(workers: int, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=str(BACKEND),
+        # lets each worker size its LightGBM thread budget
+        env={**os.environ, "WEB_CONCURRENCY": str(workers)},
+    )
+    deadline = time.time() + 120
+    import urllib.request
+
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except Exception:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy in 120s")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default=None, help="target server; in-process if unset")
+    ap.add_argument("--server-pid", type=int, default=None, help="for CPU usage")
+    ap.add_argument("--spawn-workers", type=int, default=None)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--path", default="/api/predict")
+    ap.add_argument(
+        "--steps",
+        default="1,2,4,8,16,32,64",
+        type=lambda s: [int(x) for x in s.split(",") if x.strip()],
+    )
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--hot-fraction", type=float, default=0.3)
+    ap.add_argument("--field-fraction", type=float, default=0.6)
+    ap.add_argument("--knee-gain", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument(
+        "--replay", nargs="+", default=None, help="audit log files or directories"
+    )
+    ap.add_argument("--out", default=None, help="write step results as JSON")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    proc = None
+    if args.spawn_workers:
+        proc = _spawn_uvicorn(args.spawn_workers, args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+        args.server_pid = proc.pid
+
+    mode = f"http {args.url}" if args.url else "in-process ASGI"
+    workers = args.spawn_workers or ("?" if args.url else 1)
+    print(f"[load] {mode} | workers={workers} | {args.duration:.0f}s per step")
+    print(HEADER)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    knee = next((r for r in results if r.knee), None)
+    if knee is not None:
+        # rows print live as steps finish, before the knee is known
+        print(f"\n{HEADER}")
+        for r in results:
+            print(_fmt_row(r))
+        print(f"[load] saturation knee at concurrency={knee.concurrency}")
+    else:
+        print("[load] no knee found; extend --steps")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {
+                    "mode": mode,
+                    "workers": workers,
+                    "steps": [asdict(r) for r in results],
+                },
+                f,
+                indent=2,
+            )
+        print(f"[load] saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Release gate: diff a candidate model pair against production on every parcel.
+
+Run before copying new models into api/models:
+
+    python scripts/release_gate.py \
+        --candidate-baseline new/baseline_lgb.txt \
+        --candidate-residual new/residual_lgb.txt --out gate_report
+
+Both pairs score the whole assessment table exactly as the API would serve
+it (same columns, same predict_frame math), chunk by chunk across a process
+pool. The report has the distribution of relative finalPrice changes, the
+worst parcels, per-ZIP_CODE median shifts and how often each pair falls back
+to converting its baseline output (`_baseline_to_usd`: no table value, then
+exp() below 1000 or the raw prediction). Exits 1 if any threshold is
+exceeded, 0 otherwise.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Set
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api.services.comps import COMP_FEATURES  # noqa: E402
+from api.services.inference_config import InferenceLayout  # noqa: E402
+from api.services.model_store import ModelStore  # noqa: E402
+
+MODELS = ROOT / "api/models"
+SRC = MODELS / "final_table_12.csv"
+
+# how predict_frame arrived at assessPrice
+BRANCHES = ["table", "baseline_exp", "baseline_raw"]
+FALLBACK_CODES = [i for i, b in enumerate(BRANCHES) if b.startswith("baseline")]
+
+REPORT_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+CHANGE_EDGES = [-0.5, -0.25, -0.1, -0.05, -0.02, 0.02, 0.05, 0.1, 0.25, 0.5]
+
+_PAIRS: Dict[str, ModelStore] = {}
+
+
+def serve_columns(store: ModelStore) -> Set[str]:
+    """Columns api/main.py loads into the table for this model pair."""
+    cols = {"PID", "LATITUDE", "LONGITUDE"}
+    cols.update(store.baseline_features)
+    cols.update(store.residual_features)
+    cols.update(COMP_FEATURES)
+    cols -= {"sale_year", "sale_month"}
+    return cols
+
+
+def _init_worker(paths: Dict[str, List[str]], workers: int):
+    layout = InferenceLayout.plan(workers=workers)
+    for name, (b, r) in paths.items():
+        _PAIRS[name] = ModelStore(b, r, layout=layout)
+
+
+def _branch(scored: pd.DataFrame) -> np.ndarray:
+    raw = scored["baselineRawPred"].to_numpy(dtype=float)
+    table = scored["assessSource"].to_numpy() == "table"
+    out = np.where(raw < 1000, 1, 2)
+    out[table] = 0
+    return out.astype(np.int8)
+
+
+def score_chunk(chunk: pd.DataFrame) -> Dict[str, np.ndarray]:
+    lat = pd.to_numeric(chunk["LATITUDE"], errors="coerce")
+    lng = pd.to_numeric(chunk["LONGITUDE"], errors="coerce")
+    chunk = chunk[lat.notna() & lng.notna()].reset_index(drop=True)
+    out = {
+        "pid": (
+            chunk["PID"].astype(str).to_numpy()
+            if "PID" in chunk.columns
+            else np.full(len(chunk), "", dtype=object)
+        ),
+        "zip": (
+            pd.to_numeric(chunk["ZIP_CODE"], errors="coerce").to_numpy(dtype=float)
+            if "ZIP_CODE" in chunk.columns
+            else np.full(len(chunk), np.nan)
+        ),
+    }
+    for name, store in _PAIRS.items():
+        rows = chunk[[c for c in chunk.columns if c in serve_columns(store)]]
+        scored = store.predict_frame(rows)
+        out[f"{name}_price"] = scored["finalPrice"].to_numpy(dtype=float)
+        out[f"{name}_branch"] = _branch(scored)
+    return out
+
+
+def _quantiles(x: np.ndarray) -> Dict[str, float]:
+    if len(x) == 0:
+        return {}
+    q = np.quantile(x, REPORT_QUANTILES)
+    return {f"p{p * 100:g}": float(v) for p, v in zip(REPORT_QUANTILES, q)}
+
+
+def _branch_fractions(codes: np.ndarray) -> Dict[str, float]:
+    n = max(len(codes), 1)
+    counts = np.bincount(codes, minlength=len(BRANCHES))
+    return {b: float(c) / n for b, c in zip(BRANCHES, counts)}
+
+
+def build_report(res: Dict[str, np.ndarray], args) -> Dict:
+    cur, cand = res["current_price"], res["candidate_price"]
+    ok = np.isfinite(cur) & np.isfinite(cand) & (cur > 0) & (cand > 0)
+    rel = np.full(len(cur), np.nan)
+    rel[ok] = cand[ok] / cur[ok] - 1.0
+
+    n = len(cur)
+    r = rel[ok]
+    abs_r = np.abs(r)
+    hist = np.bincount(
+        np.searchsorted(CHANGE_EDGES, r), minlength=len(CHANGE_EDGES) + 1
+    )
+    bins = ["<%g" % CHANGE_EDGES[0]]
+    bins += [f"{a:g}..{b:g}" for a, b in zip(CHANGE_EDGES[:-1], CHANGE_EDGES[1:])]
+    bins += [">=%g" % CHANGE_EDGES[-1]]
+
+    order = np.argsort(-np.nan_to_num(np.abs(rel), nan=-1.0))[: args.worst]
+    worst = pd.DataFrame(
+        {
+            "PID": res["pid"][order],
+            "ZIP_CODE": res["zip"][order],
+            "current": cur[order],
+            "candidate": cand[order],
+            "relChange": rel[order],
+            "currentBranch": np.asarray(BRANCHES)[res["current_branch"][order]],
+            "candidateBranch": np.asarray(BRANCHES)[res["candidate_branch"][order]],
+        }
+    )
+
+    zips = pd.DataFrame({"ZIP_CODE": res["zip"][ok], "rel": r})
+    zips = (
+        zips.dropna(subset=["ZIP_CODE"])
+        .groupby("ZIP_CODE")["rel"]
+        .agg(parcels="size", medianChange="median", meanChange="mean")
+        .reset_index()
+    )
+    zips["ZIP_CODE"] = zips["ZIP_CODE"].map(lambda z: f"{int(z):05d}")
+    zips = zips.reindex(
+        zips["medianChange"].abs().sort_values(ascending=False).index
+    ).reset_index(drop=True)
+    gated = zips[zips["parcels"] >= args.min_zip_parcels]
+
+    fb_cur = float(np.isin(res["current_branch"], FALLBACK_CODES).mean()) if n else 0.0
+    fb_cand = (
+        float(np.isin(res["candidate_branch"], FALLBACK_CODES).mean()) if n else 0.0
+    )
+    stats = {
+        "parcels": n,
+        "compared": int(ok.sum()),
+        "candidateNonFinite": int((~np.isfinite(cand)).sum()),
+        "medianAbsChange": float(np.median(abs_r)) if len(r) else None,
+        "p99AbsChange": float(np.quantile(abs_r, 0.99)) if len(r) else None,
+        "relChange": _quantiles(r),
+        "histogram": dict(zip(bins, hist.tolist())),
+        "maxZipShift": (
+            float(gated["medianChange"].abs().max()) if len(gated) else None
+        ),
+        "branches": {
+            "current": _branch_fractions(res["current_branch"]),
+            "candidate": _branch_fractions(res["candidate_branch"]),
+            "switched": (
+                float((res["current_branch"] != res["candidate_branch"]).mean())
+                if n
+                else 0.0
+            ),
+        },
+        "fallback": {"current": fb_cur, "candidate": fb_cand},
+    }
+
+    limits = {
+        "medianAbsChange": args.max_median_change,
+        "p99AbsChange": args.max_p99_change,
+        "maxZipShift": args.max_zip_shift,
+        "fallbackIncrease": args.max_fallback_increase,
+        "candidateNonFinite": args.max_nonfinite,
+    }
+    observed = {
+        "medianAbsChange": stats["medianAbsChange"],
+        "p99AbsChange": stats["p99AbsChange"],
+        "maxZipShift": stats["maxZipShift"],
+        "fallbackIncrease": fb_cand - fb_cur,
+        "candidateNonFinite": stats["candidateNonFinite"],
+    }
+    failed = [
+        k for k, lim in limits.items() if observed[k] is not None and observed[k] > lim
+    ]
+    if n and not ok.any():
+        failed.append("compared")
+    return {
+        "stats": stats,
+        "limits": limits,
+        "observed": observed,
+        "failed": failed,
+        "worst": worst,
+        "zips": zips,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--table", default=str(SRC))
+    ap.add_argument("--current-baseline", default=str(MODELS / "baseline_lgb.txt"))
+    ap.add_argument("--current-residual", default=str(MODELS / "residual_lgb.txt"))
+    ap.add_argument(
+        "--candidate-baseline", default=None, help="default: current baseline"
+    )
+    ap.add_argument("--candidate-residual", required=True)
+    ap.add_argument("--workers", type=int, default=0, help="0 = all cores")
+    ap.add_argument("--chunk-rows", type=int, default=20_000)
+    ap.add_argument("--worst", type=int, default=50)
+    ap.add_argument("--min-zip-parcels", type=int, default=30)
+    ap.add_argument("--max-median-change", type=float, default=0.05)
+    ap.add_argument("--max-p99-change", type=float, default=0.30)
+    ap.add_argument("--max-zip-shift", type=float, default=0.10)
+    ap.add_argument("--max-fallback-increase", type=float, default=0.01)
+    ap.add_argument("--max-nonfinite", type=int, default=0)
+    ap.add_argument("--out", default=None, help="directory for report files")
+    args = ap.parse_args()
+
+    paths = {
+        "current": [args.current_baseline, args.current_residual],
+        "candidate": [
+            args.candidate_baseline or args.current_baseline,
+            args.candidate_residual,
+        ],
+    }
+    for p in sum(paths.values(), []):
+        if not os.path.exists(p):
+            raise SystemExit(f"Cannot find {p}")
+
+    # read only what either pair would load; rows stream to the pool
+    cols: Set[str] = {"ZIP_CODE"}
+    for b, r in paths.values():
+        cols |= serve_columns(ModelStore(b, r))
+    header = pd.read_csv(args.table, nrows=0).columns
+    usecols = [c for c in header if c in cols]
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"[gate] table={args.table} workers={workers} chunk={args.chunk_rows}")
+    t0 = time.time()
+    parts: Dict[int, Dict[str, np.ndarray]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(paths, workers)
+    ) as pool:
+        pending = {}
+        reader = pd.read_csv(
+            args.table, usecols=usecols, chunksize=args.chunk_rows, low_memory=False
+        )
+        for i, chunk in enumerate(reader):
+            pending[pool.submit(score_chunk, chunk)] = i
+            # bound the chunks in flight so memory stays flat on big tables
+            while len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    parts[pending.pop(f)] = f.result()
+        for f in list(pending):
+            parts[pending.pop(f)] = f.result()
+
+    if not parts:
+        raise SystemExit(f"No rows in {args.table}")
+    order = sorted(parts)
+    res = {k: np.concatenate([parts[i][k] for i in order]) for k in parts[order[0]]}
+    print(f"[gate] scored {len(res['pid'])} parcels in {time.time() - t0:.1f}s")
+
+    rep = build_report(res, args)
+    s = rep["stats"]
+    print(json.dumps({k: v for k, v in s.items() if k != "histogram"}, indent=2))
+    print("[gate] largest ZIP shifts:")
+    print(rep["zips"].head(10).to_string(index=False))
+    print("[gate] worst parcels:")
+    print(rep["worst"].head(10).to_string(index=False))
+
+    if args.out:
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        rep["worst"].to_csv(out / "worst_parcels.csv", index=False)
+        rep["zips"].to_csv(out / "zip_shifts.csv", index=False)
+        summary = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "table": args.table,
+            "models": paths,
+            **{k: rep[k] for k in ["stats", "limits", "observed", "failed"]},
+        }
+        with open(out / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[gate] report written to {out}")
+
+    for k in rep["failed"]:
+        print(f"[FAIL] {k}: {rep['observed'].get(k)} > {rep['limits'].get(k)}")
+    if rep["failed"]:
+        sys.exit(1)
+    print("[gate] PASS")
+
+
+if __name__ == "__main__":
+    main()
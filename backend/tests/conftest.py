@@ -0,0 +1,50 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.assess_table import AssessTable
+from api.services.model_store import ModelStore
+
+FEATURES = ["LIVING_AREA", "GROSS_AREA", "BED_RMS", "YR_BUILT", "LAND_SF"]
+
+
+def _parcels(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    area = rng.uniform(600, 4000, n).round()
+    return pd.DataFrame(
+        {
+            "PID": np.arange(100_000_000, 100_000_000 + n * 1000, 1000),
+            "LATITUDE": rng.uniform(42.30, 42.36, n),
+            "LONGITUDE": rng.uniform(-71.10, -71.04, n),
+            "LIVING_AREA": area,
+            "GROSS_AREA": (area * rng.uniform(1.1, 1.5, n)).round(),
+            "BED_RMS": rng.integers(1, 7, n).astype(float),
+            "YR_BUILT": rng.integers(1880, 2020, n).astype(float),
+            "LAND_SF": rng.uniform(1000, 8000, n).round(),
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def model_store(tmp_path_factory) -> ModelStore:
+    """Small baseline (log value) + residual pair over FEATURES."""
+    d = tmp_path_factory.mktemp("models")
+    df = _parcels(2000, seed=1)
+    X = df[FEATURES]
+    rng = np.random.default_rng(2)
+    y_base = 11.0 + df["LIVING_AREA"] / 2000 + 0.05 * df["BED_RMS"]
+    y_res = 0.1 * (df["YR_BUILT"] > 1950) + rng.normal(0, 0.02, len(df))
+    params = {"objective": "regression", "num_leaves": 15, "verbose": -1}
+    paths = []
+    for name, y in (("baseline", y_base), ("residual", y_res)):
+        booster = lgb.train(params, lgb.Dataset(X, y), num_boost_round=40)
+        path = d / f"{name}_lgb.txt"
+        booster.save_model(str(path))
+        paths.append(str(path))
+    return ModelStore(*paths)
+
+
+@pytest.fixture
+def parcels() -> AssessTable:
+    return AssessTable.from_frame(_parcels(300, seed=3))
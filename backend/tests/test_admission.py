@@ -0,0 +1,118 @@
+import asyncio
+
+from api.services.admission import AdmissionController, AdmissionMiddleware
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_client_rate_is_opt_in(monkeypatch):
+    monkeypatch.delenv("IREA_CLIENT_RATE", raising=False)
+    ctl = AdmissionController.from_env()
+    assert ctl.rate_per_s == 0
+
+    async def go():
+        for _ in range(100):
+            assert await ctl.acquire("10.0.0.1") is None
+            ctl.release(0.001)
+
+    _run(go())
+    assert ctl.rejected_rate == 0
+
+
+def test_client_rate_limits_when_enabled():
+    ctl = AdmissionController(max_concurrency=4, rate_per_s=1.0, burst=2)
+
+    async def go():
+        out = []
+        for _ in range(3):
+            r = await ctl.acquire("10.0.0.1")
+            if r is None:
+                ctl.release(0.001)
+            out.append(r)
+        return out
+
+    res = _run(go())
+    assert res[:2] == [None, None]
+    status, _, retry_after = res[2]
+    assert status == 429 and retry_after >= 1
+
+
+def test_expected_wait_over_budget_is_shed_up_front():
+    ctl = AdmissionController(max_concurrency=1, queue_budget_s=0.5)
+    ctl.service_s = 1.0  # one queued request would wait ~1s
+
+    async def go():
+        assert await ctl.acquire("a") is None
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        rejected = await ctl.acquire("b")
+        return rejected, loop.time() - t0
+
+    rejected, waited = _run(go())
+    status, _, retry_after = rejected
+    assert status == 503 and retry_after == 1
+    assert waited < 0.1
+    assert ctl.rejected_expected_wait == 1 and ctl.rejected_timeout == 0
+    assert ctl.waiting == 0
+
+
+def test_queued_request_times_out_after_budget():
+    ctl = AdmissionController(max_concurrency=1, queue_budget_s=0.05)
+    ctl.service_s = 0.001
+
+    async def go():
+        assert await ctl.acquire("a") is None
+        return await ctl.acquire("b")
+
+    status, _, _ = _run(go())
+    assert status == 503
+    assert ctl.rejected_timeout == 1 and ctl.rejected_expected_wait == 0
+
+
+def test_queue_full_is_shed():
+    ctl = AdmissionController(max_concurrency=1, max_queue=0)
+
+    async def go():
+        assert await ctl.acquire("a") is None
+        return await ctl.acquire("b")
+
+    assert _run(go())[0] == 503
+    assert ctl.rejected_queue_full == 1
+
+
+def test_middleware_sends_retry_after():
+    class _State:
+        admission = AdmissionController(max_concurrency=1, queue_budget_s=0.5)
+
+    class _App:
+        state = _State()
+
+    ctl = _State.admission
+    ctl.service_s = 2.0
+    sent = []
+
+    async def inner(scope, receive, send):
+        raise AssertionError("request should have been shed")
+
+    async def send(msg):
+        sent.append(msg)
+
+    async def go():
+        assert await ctl.acquire("a") is None
+        mw = AdmissionMiddleware(inner)
+        scope = {
+            "type": "http",
+            "path": "/api/predict",
+            "app": _App(),
+            "client": ("10.0.0.2", 1234),
+        }
+        await mw(scope, None, send)
+
+    _run(go())
+    start = sent[0]
+    assert start["status"] == 503
+    headers = dict(start["headers"])
+    assert headers[b"retry-after"] == b"2"
+    assert sent[1]["body"] == b'{"detail":"Server busy"}'
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.assess_table import AssessTable
+
+
+class _Store:
+    """predict_frame stand-in: finalPrice = LIVING_AREA * 100."""
+
+    def predict_frame(self, rows):
+        area = pd.to_numeric(rows["LIVING_AREA"], errors="coerce")
+        return pd.DataFrame({"finalPrice": area.to_numpy(dtype=float) * 100.0})
+
+
+@pytest.fixture
+def table():
+    df = pd.DataFrame(
+        {
+            "PID": [100001000, 100002000, 100003000],
+            "CITY": ["EAST BOSTON", "ROXBURY", "DORCHESTER"],
+            "ZIP_CODE": [2128, 2119, 2124],
+            "LATITUDE": [42.379, 42.33, 42.30],
+            "LONGITUDE": [-71.032, -71.08, -71.06],
+            "LIVING_AREA": [2202.0, 1500.0, 1800.0],
+            "YR_REMODEL": [np.nan, 2000.0, 1985.0],
+        }
+    )
+    t = AssessTable.from_frame(df)
+    t.attach_values(_Store())
+    return t
+
+
+def _row(t, pid):
+    return t.df.iloc[t.row_of_pid(pid)]
+
+
+def test_partial_upsert_keeps_unsent_fields(table):
+    new, stats = table.apply_delta(
+        pd.DataFrame([{"PID": "0100002000", "LIVING_AREA": 1600}]), store=_Store()
+    )
+    row = _row(new, 100002000)
+    assert row["LIVING_AREA"] == 1600
+    assert row["CITY"] == "ROXBURY"
+    assert row["ZIP_CODE"] == 2119
+    assert row["LATITUDE"] == pytest.approx(42.33)
+    assert row["YR_REMODEL"] == 2000
+    assert new.values[new.row_of_pid(100002000)] == pytest.approx(160_000)
+    assert stats["updated"] == 1 and stats["inserted"] == 0
+    assert stats["rejected"] == 0
+    # the source table is untouched
+    assert _row(table, 100002000)["LIVING_AREA"] == 1500
+
+
+def test_unknown_columns_are_reported_not_stored(table):
+    new, stats = table.apply_delta(
+        pd.DataFrame([{"PID": 100001000, "TOTAL_VALUE_2025": 799000, "CITY": "X"}])
+    )
+    assert stats["ignored_columns"] == ["TOTAL_VALUE_2025"]
+    assert "TOTAL_VALUE_2025" not in new.df.columns
+    row = _row(new, 100001000)
+    assert row["CITY"] == "X"
+    assert row["LIVING_AREA"] == 2202
+
+
+def test_insert_needs_coordinates(table):
+    ups = pd.DataFrame(
+        [
+            {"PID": 100009000, "LIVING_AREA": 900},
+            {"PID": 100008000, "LATITUDE": 42.35, "LONGITUDE": -71.05},
+        ]
+    )
+    new, stats = table.apply_delta(ups)
+    assert stats["rejected"] == 1
+    assert stats["inserted"] == 1
+    assert new.row_of_pid(100009000) is None
+    assert len(new) == 4
+
+
+def test_column_dtypes_survive_merge(table):
+    new, _ = table.apply_delta(pd.DataFrame([{"PID": 100003000, "ZIP_CODE": 2125}]))
+    assert new.df["LIVING_AREA"].dtype.kind == "f"
+    assert new.df["YR_REMODEL"].dtype.kind == "f"
+    assert new.df["ZIP_CODE"].dtype.kind == "i"
+
+
+def test_delete_and_upsert_in_one_delta(table):
+    new, stats = table.apply_delta(
+        pd.DataFrame([{"PID": 100001000, "LIVING_AREA": 2300}]),
+        deletes=[100003000],
+    )
+    assert stats["deleted"] == 1
+    assert new.row_of_pid(100003000) is None
+    assert _row(new, 100001000)["CITY"] == "EAST BOSTON"
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.assessment_history import AssessmentHistory
+
+PIDS = ["0100001000", "0100002000", "0100003000", "0200001000"]
+
+
+def _snapshots():
+    fy23 = pd.DataFrame(
+        {
+            "PID": PIDS,
+            "AV_TOTAL": ["500,000", "610000", "720000", "330000"],
+            "LU": ["R1", "R2", "R1", "CD"],
+            "YR_BUILT": ["1920", "1955", "", "1890"],
+        }
+    )
+    fy24 = pd.DataFrame(
+        {
+            "PID": PIDS[:3],
+            "TOTAL_VALUE_2024": ["520000", "610000", "750000"],
+            "LAND_USE": ["R1", "R3", "R1"],
+            "YR_BUILT": ["1920", "1955", "2001"],
+        }
+    )
+    fy25 = pd.DataFrame(
+        {
+            # spelled without the leading zero this year
+            "PID": ["100001000", PIDS[1], PIDS[2]],
+            "TOTAL_VALUE_2025": ["540000", "640000", "750000"],
+            "LAND_USE": ["R1", "R3", "R2"],
+            "YR_BUILT": ["1920", "1955", "2001"],
+        }
+    )
+    return {2023: fy23, 2024: fy24, 2025: fy25}
+
+
+EXPECT_2024 = pd.DataFrame(
+    {
+        "PID": ["100001000", PIDS[1], PIDS[2]],
+        "TOTAL_VALUE": [520000.0, 610000.0, 750000.0],
+        "LAND_USE": ["R1", "R3", "R1"],
+        "YR_BUILT": [1920.0, 1955.0, 2001.0],
+    }
+)
+
+
+@pytest.fixture
+def history():
+    return AssessmentHistory.build(_snapshots())
+
+
+def test_as_of_keeps_written_pids(history):
+    assert history.pids.tolist() == ["100001000", PIDS[1], PIDS[2], PIDS[3]]
+    pd.testing.assert_frame_equal(history.frame_as_of(2024), EXPECT_2024)
+
+    fy23 = history.frame_as_of(2023)
+    assert fy23["PID"].tolist()[1:] == PIDS[1:]
+    assert fy23["TOTAL_VALUE"].tolist() == [500000.0, 610000.0, 720000.0, 330000.0]
+    assert np.isnan(fy23["YR_BUILT"].iat[2])
+
+
+def test_history_by_any_pid_spelling(history):
+    recs = history.history(100003000, columns=["TOTAL_VALUE", "LAND_USE"])
+    assert [(r["year"], r["TOTAL_VALUE"], r["LAND_USE"]) for r in recs] == [
+        (2023, 720000.0, "R1"),
+        (2024, 750000.0, "R1"),
+        (2025, 750000.0, "R2"),
+    ]
+    assert [r["year"] for r in history.history("0200001000")] == [2023]
+    assert history.history("999") is None
+
+
+def test_save_load_round_trip(history, tmp_path):
+    history.save(str(tmp_path / "hist"))
+    loaded = AssessmentHistory.load(str(tmp_path / "hist"))
+    assert loaded.pids.tolist() == history.pids.tolist()
+    for y in history.years:
+        pd.testing.assert_frame_equal(loaded.frame_as_of(y), history.frame_as_of(y))
+    assert loaded.history(PIDS[2]) == history.history(PIDS[2])
+    assert loaded.stats() == history.stats()
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.assess_table import AssessTable
+from api.services.deadline import DeadlinePolicy
+from api.services.model_store import ModelStore
+
+
+class _Store(ModelStore):
+    """Blend logic over fixed per-PID prices; no LightGBM models."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.single_calls = 0
+
+    def predict_frame(self, rows):
+        price = rows["PID"].map(self.prices).to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            baseline = np.log(price)
+        return pd.DataFrame(
+            {
+                "baselineRawPred": baseline,
+                "residual": np.zeros(len(rows)),
+                "finalPrice": price,
+            }
+        )
+
+    def _predict_snapped(self, payload, row, row_i, d2, assess_table, deadline=None):
+        self.single_calls += 1
+        self.single_pid = row["PID"]
+        return {"finalPrice": -1.0, "predictedPrice": -1.0, "meta": {}}
+
+
+@pytest.fixture
+def table():
+    # nearest to the query first, then two neighbours ~40 m and ~80 m east
+    return AssessTable.from_frame(
+        pd.DataFrame(
+            {
+                "PID": [1, 2, 3],
+                "LATITUDE": [42.33, 42.33, 42.33],
+                "LONGITUDE": [-71.08, -71.0795, -71.079],
+            }
+        )
+    )
+
+
+PAYLOAD = {"latitude": 42.33, "longitude": -71.08}
+
+
+def test_blend_of_priced_neighbours(table):
+    store = _Store({1: 500_000.0, 2: 600_000.0, 3: 700_000.0})
+    out = store.predict_blended(PAYLOAD, table, k=3, radius_m=150)
+    blend = out["meta"]["blend"]
+    assert blend["k"] == 3
+    assert 500_000 < out["finalPrice"] < 600_000
+    assert sum(n["weight"] for n in blend["neighbours"]) == pytest.approx(1.0)
+    assert store.single_calls == 0
+
+
+@pytest.mark.parametrize("nearest", [float("nan"), 0.0, -5.0])
+def test_unpriced_nearest_falls_back_to_single(table, nearest):
+    store = _Store({1: nearest, 2: 600_000.0, 3: 700_000.0})
+    out = store.predict_blended(PAYLOAD, table, k=3, radius_m=150)
+    assert store.single_calls == 1 and store.single_pid == 1
+    assert out["finalPrice"] == -1.0
+    blend = out["meta"]["blend"]
+    assert blend["fallback"] == "nearestUnpriced" and blend["k"] == 0
+    assert "neighbours" not in blend
+
+
+def test_unpriced_neighbour_is_left_out(table):
+    store = _Store({1: 500_000.0, 2: math.nan, 3: 0.0})
+    out = store.predict_blended(PAYLOAD, table, k=3, radius_m=150)
+    blend = out["meta"]["blend"]
+    assert blend["k"] == 1
+    assert [n["pid"] for n in blend["neighbours"]] == [1]
+    assert out["finalPrice"] == pytest.approx(500_000)
+
+
+def test_blend_under_a_generous_deadline(table):
+    policy = DeadlinePolicy()
+    store = _Store({1: 500_000.0, 2: 600_000.0, 3: 700_000.0})
+    out = store.predict_blended(
+        PAYLOAD, table, k=3, radius_m=150, deadline=policy.start("5000")
+    )
+    policy.observe(out)
+    assert out["meta"]["blend"]["k"] == 3
+    assert out["meta"]["degraded"] is None
+    assert policy.requests == 1 and policy.degraded == 0
+
+
+def test_blend_dropped_when_deadline_runs_out(table):
+    policy = DeadlinePolicy()
+    policy.record("baseline", 1.0)
+    policy.record("residual", 1.0)
+    store = _Store({1: 500_000.0, 2: 600_000.0, 3: 700_000.0})
+    out = store.predict_blended(
+        PAYLOAD, table, k=3, radius_m=150, deadline=policy.start("50")
+    )
+    policy.observe(out)
+    assert store.single_calls == 1
+    assert out["meta"]["blend"]["fallback"] == "deadline"
+    assert out["meta"]["degraded"]["mode"] == "single"
+    assert policy.degraded == 1 and policy.by_mode == {"single": 1}
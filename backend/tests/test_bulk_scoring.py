@@ -0,0 +1,124 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pytest
+
+from api.services.assess_table import AssessTable
+from api.services.bulk_scoring import BulkJob, score_record_batch, stream_scored
+from api.utils.geo_guard import in_boston, in_boston_many
+
+
+class _Store:
+    def predict_frame(self, rows):
+        area = rows["LIVING_AREA"].to_numpy(dtype=float)
+        return pd.DataFrame(
+            {
+                "assessPrice": area * 90.0,
+                "residual": np.full(len(rows), 0.1),
+                "finalPrice": area * 100.0,
+            }
+        )
+
+
+@pytest.fixture
+def table():
+    return AssessTable.from_frame(
+        pd.DataFrame(
+            {
+                "PID": [100001000, 100002000],
+                "LATITUDE": [42.379, 42.33],
+                "LONGITUDE": [-71.032, -71.08],
+                "LIVING_AREA": [2000.0, 1500.0],
+            }
+        )
+    )
+
+
+def _stream(path, fmt, table, **kw):
+    job = BulkJob(id="test", format=fmt)
+    data = b"".join(stream_scored(str(path), fmt, _Store(), table, job, **kw))
+    return data, job
+
+
+def test_non_numeric_coordinate_row_is_not_ok(table):
+    csv = b"id,lat,lng\n1,42.379,-71.032\n2,abc,-71.08\n3,,-71.08\n4,42.33, -71.08 \n"
+    batch = pacsv.read_csv(io.BytesIO(csv)).to_batches()[0]
+    assert pa.types.is_string(batch.schema.field("lat").type)
+
+    out = score_record_batch(_Store(), table, batch).to_pydict()
+    assert out["ok"] == [True, False, False, True]
+    assert out["id"] == [1, 2, 3, 4]
+    assert out["pid"][0] == "100001000" and out["pid"][1] is None
+    assert out["finalPrice"][0] == pytest.approx(200_000)
+    assert out["finalPrice"][1] is None and out["finalPrice"][2] is None
+    assert out["finalPrice"][3] == pytest.approx(150_000)
+
+
+def test_numeric_columns_and_out_of_area_rows(table):
+    batch = pa.RecordBatch.from_pydict(
+        {"latitude": [42.33, 40.7, None], "longitude": [-71.08, -74.0, -71.08]}
+    )
+    out = score_record_batch(_Store(), table, batch).to_pydict()
+    assert out["ok"] == [True, False, False]
+    assert out["snappedLat"][0] == pytest.approx(42.33)
+
+
+def test_in_boston_many_matches_scalar():
+    lat = np.array([42.33, 40.7, np.nan, 42.379, 42.5])
+    lng = np.array([-71.08, -74.0, -71.08, np.inf, -71.0])
+    expect = [in_boston(a, b) for a, b in zip(lat, lng)]
+    assert in_boston_many(lat, lng).tolist() == expect
+
+
+def test_ok_needs_a_price():
+    table = AssessTable.from_frame(
+        pd.DataFrame(
+            {
+                "PID": [100001000, 100002000],
+                "LATITUDE": [42.379, 42.33],
+                "LONGITUDE": [-71.032, -71.08],
+                "LIVING_AREA": [2000.0, np.nan],
+            }
+        )
+    )
+    batch = pa.RecordBatch.from_pydict(
+        {"latitude": [42.379, 42.33], "longitude": [-71.032, -71.08]}
+    )
+    out = score_record_batch(_Store(), table, batch).to_pydict()
+    assert out["ok"] == [True, False]
+    assert out["pid"] == ["100001000", "100002000"]
+    assert out["finalPrice"][1] is None
+
+
+def test_csv_types_may_change_after_the_first_block(table, tmp_path):
+    # Arrow infers CSV types from the first block (1 MB); later rows break them
+    n = 60_000
+    lines = ["id,lat,lng,area"] + [f"{i},42.33,-71.08,{i}" for i in range(n)]
+    lines += ['x1,42.379,-71.032,"1,150"', "x2,abc,-71.08,"]
+    src = tmp_path / "in.csv"
+    src.write_text("\n".join(lines) + "\n")
+
+    data, job = _stream(src, "csv", table, batch_rows=4096)
+    assert job.status == "done" and job.batches_done > 1
+    assert (job.rows_done, job.rows_ok) == (n + 2, n + 1)
+
+    out = pd.read_csv(io.BytesIO(data), dtype={"id": str, "area": str})
+    assert len(out) == n + 2
+    assert out["area"].iat[-2] == "1,150"
+    assert out["ok"].tolist()[-2:] == [True, False]
+    assert out["finalPrice"].iat[-2] == pytest.approx(200_000)
+
+
+def test_parquet_stream_keeps_input_schema(table, tmp_path):
+    src = tmp_path / "in.parquet"
+    pd.DataFrame(
+        {"id": range(10), "latitude": [42.33] * 10, "longitude": [-71.08] * 10}
+    ).to_parquet(src, row_group_size=3)
+    data, job = _stream(src, "parquet", table, batch_rows=4)
+    assert job.batches_done > 1
+    out = pd.read_parquet(io.BytesIO(data))
+    assert out["id"].tolist() == list(range(10))
+    assert out["ok"].all()
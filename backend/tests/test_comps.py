@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.comps import CompsIndex
+
+SUBJECT = (42.33, -71.08)
+TARGET = {"LIVING_AREA": 1500, "BED_RMS": 3, "FULL_BTH": 2, "YR_BUILT": 1920}
+
+
+def _sales(rows):
+    return pd.DataFrame([{**TARGET, **r} for r in rows])
+
+
+def _ring(n, radius_m, year, start_pid, month=6):
+    # n sales evenly spaced on a circle around the subject
+    a = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    lat = SUBJECT[0] + radius_m * np.sin(a) / 111_320.0
+    lng = SUBJECT[1] + radius_m * np.cos(a) / (111_320.0 * np.cos(np.radians(42.33)))
+    return [
+        {
+            "PID": str(start_pid + i),
+            "price": 500_000.0,
+            "sale_year": year,
+            "sale_month": month,
+            "LATITUDE": la,
+            "LONGITUDE": ln,
+        }
+        for i, (la, ln) in enumerate(zip(lat, lng))
+    ]
+
+
+def test_since_year_finds_k_recent_sales_beyond_old_ones():
+    # 300 old sales close by crowd out the candidate set; recent ones are
+    # only slightly farther away
+    rows = _ring(300, 100, 2012, 1_000) + _ring(6, 250, 2024, 5_000)
+    index = CompsIndex.build(_sales(rows))
+    out = index.query(*SUBJECT, TARGET, k=5, since_year=2020)
+    assert len(out) == 5
+    assert all(c["saleYear"] == 2024 for c in out)
+
+
+def test_since_year_respects_max_distance():
+    rows = _ring(300, 100, 2012, 1_000) + _ring(6, 250, 2024, 5_000)
+    index = CompsIndex.build(_sales(rows))
+    assert index.query(*SUBJECT, TARGET, k=5, since_year=2020, max_distance_m=200) == []
+
+
+def test_k_and_exclude_pid():
+    rows = _ring(20, 50, 2023, 1_000)
+    rows[0]["PID"] = "0100001000"
+    index = CompsIndex.build(_sales(rows))
+    out = index.query(*SUBJECT, TARGET, k=7, exclude_pid=100001000)
+    assert len(out) == 7
+    assert "0100001000" not in {c["pid"] for c in out}
+    assert len(index.query(*SUBJECT, TARGET, k=50)) == 20
+
+
+def test_newer_sale_ranks_first_at_equal_distance():
+    old = _ring(4, 80, 2015, 1_000)
+    new = _ring(4, 80, 2024, 2_000)
+    index = CompsIndex.build(_sales(old + new))
+    out = index.query(*SUBJECT, TARGET, k=8)
+    assert [c["saleYear"] for c in out[:4]] == [2024] * 4
+    plain = index.query(*SUBJECT, TARGET, k=8, recency_scale_y=None)
+    assert [c["score"] for c in plain] == pytest.approx([plain[0]["score"]] * 8)
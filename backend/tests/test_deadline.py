@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.predict import router
+from api.services.admission import AdmissionController, AdmissionMiddleware
+from api.services.deadline import HEADER, DeadlinePolicy
+
+PIN = {"latitude": 42.33, "longitude": -71.07}
+
+
+class SlowAdmission(AdmissionController):
+    """Admits every request after a fixed queue wait."""
+
+    wait_s = 0.0
+
+    async def acquire(self, client):
+        await asyncio.sleep(self.wait_s)
+        return await super().acquire(client)
+
+
+@pytest.fixture
+def app(model_store, parcels):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, paths=("/api/predict",))
+    app.include_router(router, prefix="/api")
+    app.state.model_store = model_store
+    app.state.assess_table = parcels
+    app.state.admission = SlowAdmission(max_concurrency=4)
+    app.state.deadlines = DeadlinePolicy()
+    return app
+
+
+def test_deadline_runs_from_arrival():
+    policy = DeadlinePolicy(default_ms=100)
+    d = policy.start(arrival=time.perf_counter() - 0.5)
+    assert d.left() < 0 and d.elapsed_ms() >= 500
+    assert policy.start("50").left() > 0
+    assert DeadlinePolicy().start() is None
+
+
+def test_full_answer_within_budget(app):
+    with TestClient(app) as client:
+        out = client.post("/api/predict", json=PIN, headers={HEADER: "5000"}).json()
+    assert out["meta"]["degraded"] is None
+    assert app.state.deadlines.stats()["requests"] == 1
+
+
+def test_queue_wait_expires_deadline(app):
+    app.state.admission.wait_s = 0.05
+    with TestClient(app) as client:
+        out = client.post("/api/predict", json=PIN, headers={HEADER: "20"}).json()
+    # the synthetic table has no assessed values, so the first fallback is
+    # the baseline converted to dollars
+    deg = out["meta"]["degraded"]
+    assert (deg["mode"], deg["stage"]) == ("baseline_assess", "baseline")
+    assert deg["skipped"] == ["residual"]
+    assert deg["elapsedMs"] >= 50
+    assert out["finalPrice"] > 0
+
+    stats = app.state.deadlines.stats()
+    assert stats["degraded"] == 1 and stats["by_stage"] == {"baseline": 1}
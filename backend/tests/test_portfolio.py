@@ -0,0 +1,67 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.portfolio import router
+
+SQUARE = [[-71.09, 42.31], [-71.05, 42.31], [-71.05, 42.35], [-71.09, 42.35]]
+
+
+@pytest.fixture
+def client(model_store, parcels):
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.state.model_store = model_store
+    app.state.assess_table = parcels
+    with TestClient(app, raise_server_exceptions=False) as c:
+        yield c
+
+
+@pytest.mark.parametrize(
+    "polygon",
+    [
+        SQUARE,
+        {"type": "Polygon", "coordinates": [SQUARE]},
+        {
+            "type": "Feature",
+            "geometry": {"type": "MultiPolygon", "coordinates": [[SQUARE]]},
+        },
+    ],
+)
+def test_polygon_forms(client, polygon):
+    r = client.post("/api/portfolio", json={"polygon": polygon})
+    assert r.status_code == 200
+    assert r.json()["parcels"] > 0
+
+
+@pytest.mark.parametrize(
+    "polygon",
+    [
+        {"type": "Polygon"},
+        {"type": "Polygon", "coordinates": 5},
+        {"type": "MultiPolygon", "coordinates": [5]},
+        {"type": "Polygon", "coordinates": [[["a", "b"], [1, 2], [3, 4]]]},
+        {
+            "type": "Polygon",
+            "coordinates": [[[-71.09], [-71.05, 42.31], [-71.05, 42.35]]],
+        },
+        {
+            "type": "Polygon",
+            "coordinates": [[[None, 42.3], [-71.05, 42.31], [-71.05, 42.35]]],
+        },
+        {"type": "FeatureCollection", "features": "x"},
+        {"type": "FeatureCollection", "features": [{"geometry": {"type": "Polygon"}}]},
+        [[-71.09, 42.31], [1e9, 42.31], [-71.05, 42.35]],
+        [[-71.09, 42.31], [-71.05, 42.31]],
+    ],
+)
+def test_malformed_polygon_is_400(client, polygon):
+    assert client.post("/api/portfolio", json={"polygon": polygon}).status_code == 400
+
+
+def test_non_finite_vertex_is_400(client):
+    body = '{"polygon": [[-71.09, 42.31], [NaN, 42.31], [-71.05, 42.35]]}'
+    r = client.post(
+        "/api/portfolio", content=body, headers={"Content-Type": "application/json"}
+    )
+    assert r.status_code == 400
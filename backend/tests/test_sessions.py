@@ -0,0 +1,126 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.predict import _advance, router
+from api.services.incremental import SessionRegistry
+
+PIN = {"latitude": 42.33, "longitude": -71.07}
+
+
+@pytest.fixture
+def client(model_store, parcels):
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.state.model_store = model_store
+    app.state.assess_table = parcels
+    app.state.sessions = SessionRegistry(model_store)
+    with TestClient(app) as c:
+        yield c
+
+
+def _frame_price(store, table, pid, **cols):
+    row = table.df.iloc[[table.row_of_pid(pid)]].copy()
+    for k, v in cols.items():
+        row[k] = v
+    return float(store.predict_frame(row)["finalPrice"].iat[0])
+
+
+def test_session_matches_predict_frame(client, model_store, parcels):
+    out = client.post("/api/predict/session", json=PIN).json()
+    pid = out["meta"]["pid"]
+    assert out["finalPrice"] == pytest.approx(_frame_price(model_store, parcels, pid))
+
+    sid = out["meta"]["session"]["id"]
+    out = client.patch(
+        f"/api/predict/session/{sid}", json={"areaSqft": 3500, "YR_BUILT": 1900}
+    ).json()
+    expect = _frame_price(
+        model_store,
+        parcels,
+        pid,
+        LIVING_AREA=3500.0,
+        GROSS_AREA=3500.0,
+        YR_BUILT=1900.0,
+    )
+    assert out["finalPrice"] == pytest.approx(expect)
+
+    # null restores the parcel's own values
+    out = client.patch(
+        f"/api/predict/session/{sid}", json={"areaSqft": None, "YR_BUILT": None}
+    ).json()
+    assert out["finalPrice"] == pytest.approx(_frame_price(model_store, parcels, pid))
+
+
+def test_form_fields_on_create_match_a_patch(client):
+    fields = {"areaSqft": 3900, "bedrooms": 6}
+    created = client.post("/api/predict/session", json={**PIN, **fields}).json()
+    assert created["meta"]["session"]["edits"]["LIVING_AREA"] == 3900
+
+    plain = client.post("/api/predict/session", json=PIN).json()
+    sid = plain["meta"]["session"]["id"]
+    patched = client.patch(f"/api/predict/session/{sid}", json=fields).json()
+    assert created["finalPrice"] == pytest.approx(patched["finalPrice"])
+    assert created["finalPrice"] != pytest.approx(plain["finalPrice"])
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"areaSqft": "abc"},
+        {"builtYear": 1990.5},
+        {"renovated": "maybe"},
+        {"LIVING_AREA": "abc"},
+        {"BED_RMS": {"a": 1}},
+    ],
+)
+def test_invalid_edit_is_rejected(client, fields):
+    out = client.post("/api/predict/session", json=PIN).json()
+    sid = out["meta"]["session"]["id"]
+    r = client.patch(f"/api/predict/session/{sid}", json=fields)
+    assert r.status_code == 422
+    after = client.get(f"/api/predict/session/{sid}").json()
+    assert after["finalPrice"] == out["finalPrice"]
+    assert after["meta"]["session"]["edits"] == {}
+
+
+def test_invalid_field_on_create_is_rejected(client):
+    r = client.post("/api/predict/session", json={**PIN, "LIVING_AREA": "abc"})
+    assert r.status_code == 422
+    assert client.app.state.sessions.stats()["active"] == 0
+
+
+def test_socket_rejects_bad_fields_with_an_error_frame(client):
+    with client.websocket_connect("/api/predict/ws") as ws:
+        ws.send_json({"seq": 1, **PIN})
+        first = ws.receive_json()
+        assert first["type"] == "price"
+
+        ws.send_json({"seq": 2, "fields": {"areaSqft": "abc"}})
+        err = ws.receive_json()
+        assert err["type"] == "error" and "areaSqft" in err["detail"]
+
+        ws.send_json({"seq": 3, "fields": {"LIVING_AREA": "abc"}})
+        err = ws.receive_json()
+        assert err["type"] == "error" and err["seq"] == 3
+
+        ws.send_json({"seq": 4, "fields": {"areaSqft": 3900}})
+        out = ws.receive_json()
+        assert out["type"] == "price" and out["seq"] == 4
+        assert out["meta"]["session"]["edits"]["LIVING_AREA"] == 3900
+
+
+def test_failed_repin_keeps_the_current_session(client):
+    reg = client.app.state.sessions
+    state = client.app.state
+    session, _ = _advance(reg, state, None, PIN, {"areaSqft": 3000})
+
+    pin = {"latitude": 42.35, "longitude": -71.05}
+    with pytest.raises(ValueError):
+        _advance(reg, state, session, pin, {"LIVING_AREA": "abc"})
+    assert reg.stats()["active"] == 1
+    assert reg.get(session.id) is session
+
+    moved, out = _advance(reg, state, session, pin, {})
+    assert reg.stats()["active"] == 1 and reg.get(session.id) is None
+    assert out["meta"]["session"]["edits"]["LIVING_AREA"] == 3000
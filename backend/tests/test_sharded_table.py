@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from conftest import _parcels
+
+from api.services.assess_table import AssessTable
+from api.services.sharded_table import ShardedAssessTable
+from scripts.build_assess_shards import build_shards
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    df = _parcels(400, seed=5)
+    src = tmp_path / "assess.csv"
+    df.to_csv(src, index=False)
+    # chunks smaller than a shard, so shards are assembled from several spills
+    man = build_shards(str(src), tmp_path / "shards", "tile", 0.02, chunksize=37)
+    assert len(man["shards"]) > 1
+    assert not list((tmp_path / "shards").glob(".spill-*"))
+    return AssessTable.from_frame(df), str(tmp_path / "shards" / "manifest.json")
+
+
+def test_shards_cover_the_table(manifest):
+    flat, path = manifest
+    sharded = ShardedAssessTable.load(path)
+    assert len(sharded) == len(flat)
+
+
+def test_pid_lookup_matches_flat_table(manifest):
+    flat, path = manifest
+    sharded = ShardedAssessTable.load(path)
+    for pid in flat.df["PID"].tolist()[::7]:
+        row, _ = sharded.lookup_pid(pid)
+        expect, _ = flat.lookup_pid(pid)
+        assert row.to_dict() == pytest.approx(expect.to_dict())
+    assert sharded.lookup_pid(123) is None
+
+
+def test_snap_matches_flat_table(manifest):
+    flat, path = manifest
+    sharded = ShardedAssessTable.load(path)
+    rng = np.random.default_rng(0)
+    for lat, lng in zip(rng.uniform(42.29, 42.37, 50), rng.uniform(-71.11, -71.03, 50)):
+        row, _, d2 = sharded.snap(lat, lng)
+        expect, _, expect_d2 = flat.snap(lat, lng)
+        assert row["PID"] == expect["PID"]
+        assert d2 == pytest.approx(expect_d2)
+
+
+def test_resident_bytes_count_values(manifest, model_store):
+    _, path = manifest
+    plain = ShardedAssessTable.load(path)
+    plain.shard(0)
+    scored = ShardedAssessTable.load(path)
+    scored.value_store = model_store
+    t = scored.shard(0)
+    assert t.values.nbytes > 0
+    assert scored.resident_bytes == plain.resident_bytes + t.values.nbytes
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.services.assess_table import AssessTable
+from api.services.table_deltas import DeltaLog, TableSync
+
+
+class _Store:
+    def predict_frame(self, rows):
+        area = pd.to_numeric(rows["LIVING_AREA"], errors="coerce")
+        return pd.DataFrame({"finalPrice": area.to_numpy(dtype=float) * 100.0})
+
+
+@pytest.fixture
+def sync(tmp_path):
+    table = AssessTable.from_frame(
+        pd.DataFrame(
+            {
+                "PID": [100001000, 100002000],
+                "ZIP_CODE": [2128, 2119],
+                "LATITUDE": [42.379, 42.33],
+                "LONGITUDE": [-71.032, -71.08],
+                "LIVING_AREA": [2202.0, 1500.0],
+            }
+        )
+    )
+    table.attach_values(_Store())
+    state = SimpleNamespace(assess_table=table)
+    return TableSync(state, DeltaLog(str(tmp_path)), _Store(), poll_s=60)
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [{"ZIP_CODE": {"a": 1}}, {"LIVING_AREA": [1, 2]}, {"LIVING_AREA": "abc"}],
+)
+def test_bad_upsert_is_rejected_before_it_is_logged(sync, bad):
+    with pytest.raises(ValueError):
+        sync.submit([{"PID": 100002000, **bad}], [])
+    assert sync.log.latest() == 0
+    assert sync.state.assess_table.version == 0
+
+    assert sync.submit([{"PID": 100002000, "LIVING_AREA": "1600"}], []) == 1
+    t = sync.state.assess_table
+    assert t.values[t.row_of_pid(100002000)] == pytest.approx(160_000)
+
+
+def test_blank_values_keep_the_current_field(sync):
+    sync.submit([{"PID": 100002000, "LIVING_AREA": " ", "ZIP_CODE": 2120}], [])
+    row = sync.state.assess_table.df.iloc[sync.state.assess_table.row_of_pid(100002000)]
+    assert row["LIVING_AREA"] == 1500 and row["ZIP_CODE"] == 2120
+
+
+def test_failing_delta_on_disk_is_skipped(sync, tmp_path):
+    (tmp_path / "delta-000001.json").write_text(
+        json.dumps({"upserts": [{"PID": 100001000, "ZIP_CODE": {"a": 1}}]})
+    )
+    (tmp_path / "delta-000002.json").write_text(
+        json.dumps({"upserts": [{"PID": 100001000, "LIVING_AREA": 3000}]})
+    )
+    assert sync.apply_pending() == 2
+    t = sync.state.assess_table
+    assert sync.stats()["skipped"] == [1]
+    assert t.df.sort_values("PID")["ZIP_CODE"].tolist() == [2128, 2119]
+    assert t.values[t.row_of_pid(100001000)] == pytest.approx(300_000)
+
+    # the next submit continues the numbering
+    assert sync.submit([], [100002000]) == 3
+    assert sync.state.assess_table.row_of_pid(100002000) is None
+
+
+def test_submit_replays_deltas_from_other_workers(sync):
+    other = DeltaLog(str(sync.log.directory))
+    other.append([{"PID": 100001000, "LIVING_AREA": 2500}], [])
+    assert sync.submit([{"PID": 100002000, "LIVING_AREA": 1700}], []) == 2
+    t = sync.state.assess_table
+    assert t.df.sort_values("PID")["LIVING_AREA"].tolist() == [2500, 1700]
+    assert np.isfinite(t.values).all()
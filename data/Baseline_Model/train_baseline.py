@@ -32,6 +32,26 @@ OUT_IMPORTANCE = "feature_importance.csv"
 
 RANDOM_SEED = 42
 
+PARAMS = {
+    "objective": "regression",
+    "metric": "rmse",
+    "learning_rate": 0.03,
+    "num_leaves": 31,
+    "min_data_in_leaf": 200,
+    "feature_fraction": 0.8,
+    "bagging_fraction": 0.8,
+    "bagging_freq": 1,
+    "lambda_l2": 5.0,
+    "lambda_l1": 1.0,
+    "verbosity": -1,
+    "seed": RANDOM_SEED,
+}
+
+# distributed (data-parallel) mode, see main_distributed()
+DIST_BASE_PORT = 12400
+DIST_VAL_BUCKETS = 5  # 1 of 5 PID-hash buckets is the shared validation set
+DIST_CHUNKSIZE = 200_000
+
 
 def rmse(y_true, y_pred) -> float:
     return float(np.sqrt(mean_squared_error(y_true, y_pred)))
@@ -120,24 +140,9 @@ def main():
         X_val, label=y_val_fit, categorical_feature=cat_feats, reference=dtrain, free_raw_data=False
     )
 
-    params = {
-        "objective": "regression",
-        "metric": "rmse",
-        "learning_rate": 0.03,
-        "num_leaves": 31,
-        "min_data_in_leaf": 200,
-        "feature_fraction": 0.8,
-        "bagging_fraction": 0.8,
-        "bagging_freq": 1,
-        "lambda_l2": 5.0,
-        "lambda_l1": 1.0,
-        "verbosity": -1,
-        "seed": RANDOM_SEED,
-    }
-
     # train
     model = lgb.train(
-        params,
+        PARAMS,
         dtrain,
         num_boost_round=5000,
         valid_sets=[dtrain, dval],
@@ -148,6 +153,10 @@ def main():
         ],
     )
 
+    report_and_save(model, X_val, y_val)
+
+
+def report_and_save(model, X_val, y_val) -> None:
     # use log
     pred_val_fit = model.predict(X_val, num_iteration=model.best_iteration)
 
@@ -192,5 +201,213 @@ def main():
     print(imp.head(20).to_string(index=False))
 
 
+def pid_hash(pid: pd.Series) -> np.ndarray:
+    # stable across processes and runs (unlike Python's hash())
+    return pd.util.hash_pandas_object(pid.astype(str), index=False).to_numpy()
+
+
+def _dist_global_stats():
+    """Label cap and category lists from a narrow pass over the full file, so
+    every worker clips and encodes exactly like the single-process run."""
+    head = pd.read_csv(DATA_FILE, nrows=0)
+    cat_cols = [c for c in CATEGORICAL_COLS if c in head.columns]
+    df = pd.read_csv(DATA_FILE, usecols=[TARGET] + cat_cols)
+    df = clean_numeric_with_commas(df, [TARGET])
+    df = df.dropna(subset=[TARGET])
+    df = df[df[TARGET] > 0]
+
+    cap = float(df[TARGET].quantile(LABEL_CAP_Q)) if USE_LABEL_CAP else None
+    categories = {c: list(df[c].astype("category").cat.categories) for c in cat_cols}
+    return cap, categories
+
+
+def _dist_prepare(df: pd.DataFrame, cap, categories) -> pd.DataFrame:
+    for c in DROP_COLS:
+        if c in df.columns:
+            df = df.drop(columns=[c])
+    df = clean_numeric_with_commas(df, ["LAND_SF", "GROSS_AREA", "LIVING_AREA", TARGET])
+    df = df.dropna(subset=[TARGET])
+    df = df[df[TARGET] > 0].copy()
+    if cap is not None:
+        df[TARGET] = df[TARGET].clip(upper=cap)
+    for col, cats in categories.items():
+        df[col] = pd.Categorical(df[col], categories=cats)
+    return df
+
+
+def _dist_worker(rank, num_workers, machines, port, cap, categories, num_threads):
+    # each worker keeps only its PID-hash partition plus the shared val set
+    train_parts, val_parts = [], []
+    for chunk in pd.read_csv(DATA_FILE, chunksize=DIST_CHUNKSIZE):
+        h = pid_hash(chunk["PID"])
+        is_val = (h % DIST_VAL_BUCKETS) == 0
+        mine = ~is_val & (((h // DIST_VAL_BUCKETS) % num_workers) == rank)
+        if mine.any():
+            train_parts.append(_dist_prepare(chunk[mine], cap, categories))
+        if is_val.any():
+            val_parts.append(_dist_prepare(chunk[is_val], cap, categories))
+
+    train = pd.concat(train_parts, ignore_index=True)
+    val = pd.concat(val_parts, ignore_index=True)
+    print(f"[worker {rank}] train rows={len(train)} val rows={len(val)}", flush=True)
+
+    y_train = train.pop(TARGET).astype(float)
+    y_val = val.pop(TARGET).astype(float)
+    cat_feats = [c for c in categories if c in train.columns]
+    assert_no_bad_object_columns(train, cat_feats)
+
+    if USE_LOG1P_Y:
+        y_train_fit, y_val_fit = np.log1p(y_train), np.log1p(y_val)
+    else:
+        y_train_fit, y_val_fit = y_train, y_val
+
+    dtrain = lgb.Dataset(
+        train, label=y_train_fit, categorical_feature=cat_feats, free_raw_data=False
+    )
+    dval = lgb.Dataset(
+        val, label=y_val_fit, categorical_feature=cat_feats, reference=dtrain, free_raw_data=False
+    )
+
+    params = dict(PARAMS)
+    params.update({
+        "tree_learner": "data",
+        "num_machines": num_workers,
+        "machines": machines,
+        "local_listen_port": port,
+        "pre_partition": True,
+        "num_threads": num_threads,
+        "time_out": 120,
+    })
+
+    # every worker scores the same val rows with the same synced model, so
+    # early stopping stops all of them on the same iteration
+    callbacks = [lgb.early_stopping(stopping_rounds=200, verbose=(rank == 0))]
+    if rank == 0:
+        callbacks.append(lgb.log_evaluation(period=100))
+
+    model = lgb.train(
+        params,
+        dtrain,
+        num_boost_round=5000,
+        valid_sets=[dval],
+        valid_names=["val"],
+        callbacks=callbacks,
+    )
+
+    if rank == 0:
+        report_and_save(model, val, y_val)
+
+
+def main_distributed(num_workers: int, base_port: int = DIST_BASE_PORT):
+    """Data-parallel training over num_workers local processes.
+
+    Rows are partitioned by PID hash; LightGBM's socket learner syncs
+    histograms between workers. Rank 0 writes OUT_MODEL, which has the same
+    format as the single-process model.
+    """
+    import multiprocessing as mp
+
+    if not os.path.exists(DATA_FILE):
+        raise FileNotFoundError(f"Cannot find {DATA_FILE}")
+
+    cap, categories = _dist_global_stats()
+    if cap is not None:
+        print(f"[cap] enabled: q={LABEL_CAP_Q}  upper_cap={cap:,.0f}")
+
+    ports = [base_port + i for i in range(num_workers)]
+    machines = ",".join(f"127.0.0.1:{p}" for p in ports)
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    print(f"[dist] workers={num_workers} machines={machines} threads/worker={num_threads}")
+
+    ctx = mp.get_context("spawn")
+    procs = [
+        ctx.Process(
+            target=_dist_worker,
+            args=(rank, num_workers, machines, ports[rank], cap, categories, num_threads),
+        )
+        for rank in range(num_workers)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    failed = [i for i, p in enumerate(procs) if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(
+            f"distributed training failed on workers {failed} "
+            f"(ports {ports[0]}-{ports[-1]} busy? try --base-port)"
+        )
+
+
+def main_out_of_core(chunksize: int = DIST_CHUNKSIZE, spool_dir=None):
+    """Single-process training without loading the CSV into pandas at once.
+
+    Chunks are cleaned like _dist_prepare, spooled to disk and fed to
+    LightGBM as a Sequence (see data/chunked_dataset.py). The validation set
+    is the same PID-hash bucket the distributed run holds out.
+    """
+    import shutil
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from chunked_dataset import attach_pandas_categorical, build_datasets
+
+    if not os.path.exists(DATA_FILE):
+        raise FileNotFoundError(f"Cannot find {DATA_FILE}")
+
+    cap, categories = _dist_global_stats()
+    if cap is not None:
+        print(f"[cap] enabled: q={LABEL_CAP_Q}  upper_cap={cap:,.0f}")
+
+    head = pd.read_csv(DATA_FILE, nrows=0)
+    feature_cols = [c for c in head.columns if c not in DROP_COLS + [TARGET]]
+    cat_feats = [c for c in categories if c in feature_cols]
+
+    def chunks():
+        for chunk in pd.read_csv(DATA_FILE, chunksize=chunksize):
+            is_val = pd.Series((pid_hash(chunk["PID"]) % DIST_VAL_BUCKETS) == 0, index=chunk.index)
+            df = _dist_prepare(chunk, cap, categories)
+            y = df.pop(TARGET).astype(float)
+            assert_no_bad_object_columns(df, cat_feats)
+            yield df, (np.log1p(y) if USE_LOG1P_Y else y), is_val[df.index].to_numpy()
+
+    dtrain, dval, X_val, y_val_fit, spool_dir = build_datasets(
+        chunks(), feature_cols, categories, spool_dir=spool_dir
+    )
+    try:
+        model = lgb.train(
+            PARAMS,
+            dtrain,
+            num_boost_round=5000,
+            valid_sets=[dtrain, dval],
+            valid_names=["train", "val"],
+            callbacks=[
+                lgb.early_stopping(stopping_rounds=200),
+                lgb.log_evaluation(period=100),
+            ],
+        )
+        attach_pandas_categorical(model, feature_cols, categories)
+        y_val = np.expm1(y_val_fit) if USE_LOG1P_Y else y_val_fit
+        report_and_save(model, X_val, y_val)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=0, help="data-parallel workers (0 = single process)")
+    ap.add_argument("--base-port", type=int, default=DIST_BASE_PORT)
+    ap.add_argument("--out-of-core", action="store_true", help="stream the CSV in chunks instead of loading it")
+    ap.add_argument("--chunksize", type=int, default=DIST_CHUNKSIZE)
+    ap.add_argument("--spool-dir", default=None, help="where --out-of-core spools rows (default: temp dir)")
+    args = ap.parse_args()
+
+    if args.out_of_core:
+        main_out_of_core(args.chunksize, args.spool_dir)
+    elif args.workers > 1:
+        main_distributed(args.workers, args.base_port)
+    else:
+        main()
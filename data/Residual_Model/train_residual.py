@@ -29,11 +29,32 @@ WINSOR_Q = (0.01, 0.99)
 SEED = 42
 TEST_SIZE = 0.2
 
+CATEGORICAL_COLS = ["CITY", "ZIP_CODE", "INT_COND", "EXT_COND", "OVERALL_COND", "AC_TYPE", "HEAT_CLASS"]
+
+PARAMS = {
+    "objective": "regression",
+    "metric": "rmse",
+    "boosting_type": "gbdt",
+
+    "learning_rate": 0.03,
+    "num_leaves": 63,
+    "min_data_in_leaf": 20,
+    "feature_fraction": 0.9,
+    "bagging_fraction": 0.9,
+    "bagging_freq": 1,
+    "lambda_l2": 1.0,
+
+    "verbosity": -1,
+    "seed": SEED,
+}
+
 OUT_DIR = "lgb_residual_output"
 MODEL_PATH = os.path.join(OUT_DIR, "lgb_residual.txt")
 FEAT_IMP_PATH = os.path.join(OUT_DIR, "feature_importance.csv")
 METRICS_PATH = os.path.join(OUT_DIR, "metrics.json")
 
+CHUNKSIZE = 200_000
+
 def rmse(y_true, y_pred):
     return float(np.sqrt(mean_squared_error(y_true, y_pred)))
 
@@ -88,7 +109,7 @@ def main():
     print(df2[TARGET].describe())
 
     cat_cols = []
-    for c in ["CITY", "ZIP_CODE", "INT_COND", "EXT_COND", "OVERALL_COND", "AC_TYPE", "HEAT_CLASS"]:
+    for c in CATEGORICAL_COLS:
         if c in df2.columns:
             cat_cols.append(c)
     df2 = safe_to_category(df2, cat_cols)
@@ -109,22 +130,7 @@ def main():
     dtrain = lgb.Dataset(X_train, label=y_train, categorical_feature=cat_cols, free_raw_data=False)
     dval = lgb.Dataset(X_val, label=y_val, categorical_feature=cat_cols, reference=dtrain, free_raw_data=False)
 
-    params = {
-        "objective": "regression",
-        "metric": "rmse",
-        "boosting_type": "gbdt",
-
-        "learning_rate": 0.03,
-        "num_leaves": 63,
-        "min_data_in_leaf": 20,
-        "feature_fraction": 0.9,
-        "bagging_fraction": 0.9,
-        "bagging_freq": 1,
-        "lambda_l2": 1.0,
-
-        "verbosity": -1,
-        "seed": SEED,
-    }
+    params = dict(PARAMS)
 
     print("[Training] cat_cols =", cat_cols)
 
@@ -178,5 +184,123 @@ def main():
     print("[Saved metrics]", METRICS_PATH)
 
 
+def trim_chunk(df: pd.DataFrame, winsor_limits=None) -> pd.DataFrame:
+    """maybe_trim for one chunk; winsor limits come from the whole file."""
+    if USE_WINSOR:
+        df[TARGET] = df[TARGET].clip(lower=winsor_limits[0], upper=winsor_limits[1])
+        return df
+    if USE_TRIM:
+        lo, hi = TRIM_RANGE
+        return df[df[TARGET].between(lo, hi)]
+    return df
+
+
+def main_out_of_core(chunksize: int = CHUNKSIZE, spool_dir=None):
+    """main() without loading the CSV at once.
+
+    A narrow pass over the target and categorical columns fixes the trim
+    limits and category lists; chunks are then trimmed, spooled to disk and
+    fed to LightGBM as a Sequence (see data/chunked_dataset.py). The
+    validation set is a PID-hash holdout of TEST_SIZE, so repeat sales of a
+    parcel stay on one side.
+    """
+    import shutil
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from chunked_dataset import attach_pandas_categorical, build_datasets, holdout_mask
+
+    Path(OUT_DIR).mkdir(parents=True, exist_ok=True)
+
+    head = pd.read_csv(DATA_PATH, nrows=0)
+    for c in (ID_COL, TARGET):
+        if c not in head.columns:
+            raise ValueError(f"Missing column: {c}")
+    cat_cols = [c for c in CATEGORICAL_COLS if c in head.columns]
+    feature_cols = [c for c in head.columns if c not in ([TARGET] + DROP_COLS)]
+
+    narrow = pd.read_csv(DATA_PATH, usecols=[TARGET] + cat_cols)
+    n_loaded = len(narrow)
+    winsor_limits = None
+    if USE_WINSOR:
+        winsor_limits = (narrow[TARGET].quantile(WINSOR_Q[0]), narrow[TARGET].quantile(WINSOR_Q[1]))
+    narrow = trim_chunk(narrow, winsor_limits)
+    n_used = len(narrow)
+    categories = {c: list(narrow[c].astype("category").cat.categories) for c in cat_cols}
+    print(f"[Loaded] rows={n_loaded} after trim/winsor={n_used}")
+    del narrow
+
+    def chunks():
+        for chunk in pd.read_csv(DATA_PATH, chunksize=chunksize):
+            chunk = trim_chunk(chunk, winsor_limits)
+            yield chunk, chunk[TARGET].astype(float), holdout_mask(chunk[ID_COL], round(1 / TEST_SIZE))
+
+    dtrain, dval, X_val, y_val, spool_dir = build_datasets(
+        chunks(), feature_cols, categories, spool_dir=spool_dir
+    )
+    try:
+        print("[Training] cat_cols =", cat_cols)
+        model = lgb.train(
+            dict(PARAMS),
+            dtrain,
+            num_boost_round=5000,
+            valid_sets=[dtrain, dval],
+            valid_names=["train", "val"],
+            callbacks=[
+                lgb.early_stopping(stopping_rounds=200),
+                lgb.log_evaluation(period=100),
+            ],
+        )
+        attach_pandas_categorical(model, feature_cols, categories)
+
+        pred_val = model.predict(X_val, num_iteration=model.best_iteration)
+        metrics = {
+            "data_path": DATA_PATH,
+            "n_rows_loaded": int(n_loaded),
+            "n_rows_used": int(n_used),
+            "use_trim": USE_TRIM,
+            "trim_range": TRIM_RANGE,
+            "use_winsor": USE_WINSOR,
+            "winsor_q": WINSOR_Q,
+            "best_iteration": int(model.best_iteration),
+            "val_rmse": rmse(y_val, pred_val),
+            "val_mae": float(mean_absolute_error(y_val, pred_val)),
+            "cat_cols": cat_cols,
+            "out_of_core": True,
+        }
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    print("[Val] RMSE =", metrics["val_rmse"])
+    print("[Val] MAE  =", metrics["val_mae"])
+
+    model.save_model(MODEL_PATH)
+    print("[Saved model]", MODEL_PATH)
+
+    fi = pd.DataFrame({
+        "feature": feature_cols,
+        "importance_gain": model.feature_importance(importance_type="gain"),
+        "importance_split": model.feature_importance(importance_type="split"),
+    }).sort_values("importance_gain", ascending=False)
+
+    fi.to_csv(FEAT_IMP_PATH, index=False)
+    print("[Saved feat importance]", FEAT_IMP_PATH)
+
+    with open(METRICS_PATH, "w") as f:
+        json.dump(metrics, f, indent=2)
+    print("[Saved metrics]", METRICS_PATH)
+
+
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out-of-core", action="store_true", help="stream the CSV in chunks instead of loading it")
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    ap.add_argument("--spool-dir", default=None, help="where --out-of-core spools rows (default: temp dir)")
+    args = ap.parse_args()
+
+    if args.out_of_core:
+        main_out_of_core(args.chunksize, args.spool_dir)
+    else:
+        main()
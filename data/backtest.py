@@ -0,0 +1,545 @@
+"""Spatial-block / time-forward backtest for the baseline and residual models.
+
+A random train_test_split puts neighbouring parcels and same-month sales on
+both sides of the split, so its scores are optimistic. This harness holds
+out whole blocks (ZIP codes or grid cells) and/or later sale months, trains
+one LightGBM model per fold in a process pool, and reports MAE/RMSE in log
+and dollar space per fold and per neighbourhood (ZIP code).
+
+    python backtest.py --model residual --scheme spacetime --folds 5
+    python backtest.py --model baseline --scheme spatial --block grid --buffer 1
+
+The cleaned dataset is cached once as a pickle; pool workers load it in
+their initializer and receive only row indices per fold.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE / "Baseline_Model"))
+sys.path.insert(0, str(HERE / "Residual_Model"))
+
+import train_baseline as tb  # noqa: E402
+import train_residual as tr  # noqa: E402
+
+CACHE_DIR = HERE / ".backtest_cache"
+OUT_DIR = HERE / "backtest_output"
+
+# meta columns kept next to the features in the cache, never trained on
+META_BLOCK = "_block"
+META_MONTH = "_month"
+META_ZIP = "_zip"
+META_BASE = "_dollar_base"  # residual: assessed value the residual multiplies
+
+NUM_BOOST_ROUND = 5000
+EARLY_STOPPING = 200
+INNER_VAL_FRAC = 0.1
+
+
+# ---------------------------------------------------------------------------
+# data
+# ---------------------------------------------------------------------------
+
+
+def _grid_cell(lat: pd.Series, lng: pd.Series, cell_deg: float) -> pd.Series:
+    iy = np.floor(pd.to_numeric(lat, errors="coerce") / cell_deg)
+    ix = np.floor(pd.to_numeric(lng, errors="coerce") / cell_deg)
+    return iy.astype("Int64").astype(str) + "_" + ix.astype("Int64").astype(str)
+
+
+def prepare_baseline(path: str) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """Same cleaning as train_baseline.main(); y is log1p(TOTAL_VALUE_2025)."""
+    df = pd.read_csv(path)
+    df = tb.clean_numeric_with_commas(
+        df, ["LAND_SF", "GROSS_AREA", "LIVING_AREA", tb.TARGET]
+    )
+    df = df.dropna(subset=[tb.TARGET])
+    df = df[df[tb.TARGET] > 0].reset_index(drop=True)
+    if tb.USE_LABEL_CAP:
+        df[tb.TARGET] = df[tb.TARGET].clip(
+            upper=float(df[tb.TARGET].quantile(tb.LABEL_CAP_Q))
+        )
+
+    meta = pd.DataFrame(
+        {
+            "lat": pd.to_numeric(df.get("LATITUDE"), errors="coerce"),
+            "lng": pd.to_numeric(df.get("LONGITUDE"), errors="coerce"),
+            "zip": df["ZIP_CODE"].astype(str) if "ZIP_CODE" in df.columns else "all",
+            "month": np.nan,  # assessments have no sale date
+            "base": np.nan,
+        }
+    )
+
+    for col in tb.CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    y = np.log1p(df[tb.TARGET].astype(float))
+    X = df.drop(columns=[c for c in tb.DROP_COLS + [tb.TARGET] if c in df.columns])
+    return X, y, meta
+
+
+def prepare_residual(path: str) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """Same cleaning as train_residual.main(); y is the log residual."""
+    df = tr.maybe_trim(pd.read_csv(path)).reset_index(drop=True)
+
+    df = tb.clean_numeric_with_commas(df, ["TOTAL_VALUE_2025"])
+    base = df["TOTAL_VALUE_2025"] if "TOTAL_VALUE_2025" in df.columns else np.nan
+    month = np.nan
+    if "sale_year" in df.columns and "sale_month" in df.columns:
+        month = (
+            pd.to_numeric(df["sale_year"], errors="coerce") * 12
+            + pd.to_numeric(df["sale_month"], errors="coerce")
+            - 1
+        )
+    meta = pd.DataFrame(
+        {
+            "lat": pd.to_numeric(df.get("LATITUDE"), errors="coerce"),
+            "lng": pd.to_numeric(df.get("LONGITUDE"), errors="coerce"),
+            "zip": df["ZIP_CODE"].astype(str) if "ZIP_CODE" in df.columns else "all",
+            "month": month,
+            "base": base,
+        }
+    )
+
+    cat_cols = [c for c in tr.CATEGORICAL_COLS if c in df.columns]
+    df = tr.safe_to_category(df, cat_cols)
+    X, y, feature_cols = tr.build_X_y(df)
+    for c in feature_cols:
+        if X[c].dtype.name not in ["category", "bool"]:
+            X[c] = pd.to_numeric(X[c], errors="coerce")
+    return X, y, meta
+
+
+PREPARE = {"baseline": prepare_baseline, "residual": prepare_residual}
+DEFAULT_DATA = {
+    "baseline": HERE / "Baseline_Model" / tb.DATA_FILE,
+    "residual": HERE / "Residual_Model" / tr.DATA_PATH,
+}
+
+
+def load_cached(kind: str, path: str, block: str, cell_deg: float) -> Path:
+    """Clean once and cache features + y + meta as a pickle; returns its path."""
+    st = os.stat(path)
+    key = f"{kind}|{Path(path).resolve()}|{st.st_size}|{st.st_mtime_ns}|{block}|{cell_deg}"
+    CACHE_DIR.mkdir(exist_ok=True)
+    out = CACHE_DIR / f"{kind}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.pkl"
+    if out.exists():
+        print(f"[cache] hit {out.name}")
+        return out
+
+    t0 = time.time()
+    X, y, meta = PREPARE[kind](path)
+    if block == "grid":
+        if meta["lat"].isna().all():
+            raise SystemExit("--block grid needs LATITUDE/LONGITUDE in the data")
+        blocks = _grid_cell(meta["lat"], meta["lng"], cell_deg)
+    else:
+        blocks = meta["zip"]
+
+    df = X.copy()
+    df["_y"] = y.to_numpy()
+    df[META_BLOCK] = blocks.to_numpy()
+    df[META_MONTH] = meta["month"].to_numpy()
+    df[META_ZIP] = meta["zip"].to_numpy()
+    df[META_BASE] = meta["base"].to_numpy()
+    df.to_pickle(out)
+    print(f"[cache] built {out.name} rows={len(df)} in {time.time() - t0:.1f}s")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# folds
+# ---------------------------------------------------------------------------
+
+
+def spatial_fold_of_block(blocks: pd.Series, k: int, seed: int) -> dict:
+    """Assign blocks to k folds, largest block first into the lightest fold."""
+    sizes = blocks.value_counts()
+    rng = np.random.default_rng(seed)
+    # shuffle ties so equal-sized blocks do not always land in the same order
+    order = sizes.sample(frac=1.0, random_state=int(rng.integers(1 << 31))).sort_values(
+        ascending=False, kind="stable"
+    )
+    load = np.zeros(k, dtype=np.int64)
+    out = {}
+    for b, n in order.items():
+        f = int(np.argmin(load))
+        out[b] = f
+        load[f] += n
+    return out
+
+
+def _buffer_mask(blocks: pd.Series, test_blocks: set, radius: int) -> np.ndarray:
+    """Rows whose grid cell is within `radius` cells of a test cell."""
+    if radius <= 0:
+        return np.zeros(len(blocks), dtype=bool)
+    near = set()
+    for b in test_blocks:
+        try:
+            iy, ix = map(int, str(b).split("_"))
+        except ValueError:
+            continue
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                near.add(f"{iy + dy}_{ix + dx}")
+    return blocks.isin(near).to_numpy()
+
+
+def build_folds(
+    df: pd.DataFrame,
+    scheme: str,
+    k: int,
+    block: str,
+    buffer: int,
+    gap_months: int,
+    seed: int,
+):
+    """Yield (name, train_idx, test_idx) per fold."""
+    blocks = df[META_BLOCK]
+    months = df[META_MONTH]
+    if scheme in ("time", "spacetime") and months.isna().all():
+        raise SystemExit(
+            f"--scheme {scheme} needs sale_year/sale_month (residual data)"
+        )
+
+    fold_of = spatial_fold_of_block(blocks, k, seed) if scheme != "time" else None
+    spatial = blocks.map(fold_of).to_numpy() if fold_of else None
+
+    windows = None
+    if scheme != "spatial":
+        m = np.sort(months.dropna().unique())
+        # first half of the months is the initial training history
+        windows = np.array_split(m[len(m) // 2 :], k)
+
+    for i in range(k):
+        test = np.ones(len(df), dtype=bool)
+        train = np.ones(len(df), dtype=bool)
+        name = []
+        if spatial is not None:
+            test &= spatial == i
+            train &= spatial != i
+            if block == "grid":
+                test_blocks = set(blocks[spatial == i].unique())
+                train &= ~_buffer_mask(blocks, test_blocks, buffer)
+            name.append(f"space{i}")
+        if windows is not None:
+            w = windows[i]
+            if len(w) == 0:
+                continue
+            mv = months.to_numpy()
+            test &= (mv >= w[0]) & (mv <= w[-1])
+            train &= mv < (w[0] - gap_months)
+            name.append(f"months{int(w[0])}-{int(w[-1])}")
+        if test.sum() == 0 or train.sum() == 0:
+            continue
+        yield "/".join(name), np.flatnonzero(train), np.flatnonzero(test)
+
+
+# ---------------------------------------------------------------------------
+# workers
+# ---------------------------------------------------------------------------
+
+_DATA = None
+
+
+def _init_worker(cache_path: str):
+    global _DATA
+    _DATA = pd.read_pickle(cache_path)
+
+
+def _deadline_callback(deadline: float):
+    def _cb(env):
+        if time.time() > deadline:
+            raise lgb.callback.EarlyStopException(
+                env.iteration, env.evaluation_result_list
+            )
+
+    _cb.order = 30
+    return _cb
+
+
+def _to_dollars(y_log: np.ndarray, base: np.ndarray, kind: str) -> np.ndarray:
+    if kind == "baseline":
+        return np.expm1(y_log)
+    return base * np.exp(y_log)
+
+
+def _inner_val_mask(df: pd.DataFrame, train_idx, scheme: str, seed: int):
+    """Inner early-stopping rows of a fold's training set, never test rows.
+
+    Held out the way the fold's test set is: the latest training months for
+    --scheme time, a share of the training blocks otherwise.
+    """
+    if scheme == "time":
+        mv = df[META_MONTH].to_numpy()[train_idx]
+        return mv >= np.quantile(mv, 1.0 - INNER_VAL_FRAC)
+    rng = np.random.default_rng(seed)
+    tr_blocks = df[META_BLOCK].iloc[train_idx].unique()
+    val_blocks = set(
+        rng.choice(
+            tr_blocks, max(1, int(len(tr_blocks) * INNER_VAL_FRAC)), replace=False
+        )
+    )
+    return df[META_BLOCK].iloc[train_idx].isin(val_blocks).to_numpy()
+
+
+def run_fold(
+    kind, name, train_idx, test_idx, params, num_threads, deadline, seed, scheme
+):
+    if time.time() > deadline:
+        return {"fold": name, "skipped": True}
+    t0 = time.time()
+    df = _DATA
+    feats = [c for c in df.columns if c != "_y" and not c.startswith("_")]
+    cats = [c for c in feats if df[c].dtype.name == "category"]
+
+    is_val = _inner_val_mask(df, train_idx, scheme, seed)
+    fit_idx, val_idx = train_idx[~is_val], train_idx[is_val]
+    if len(fit_idx) == 0:
+        fit_idx, val_idx = train_idx, train_idx
+
+    X, y = df[feats], df["_y"]
+    dtrain = lgb.Dataset(
+        X.iloc[fit_idx],
+        label=y.iloc[fit_idx],
+        categorical_feature=cats,
+        free_raw_data=False,
+    )
+    dval = lgb.Dataset(
+        X.iloc[val_idx],
+        label=y.iloc[val_idx],
+        categorical_feature=cats,
+        reference=dtrain,
+    )
+
+    p = dict(params)
+    p["num_threads"] = num_threads
+    model = lgb.train(
+        p,
+        dtrain,
+        num_boost_round=NUM_BOOST_ROUND,
+        valid_sets=[dval],
+        valid_names=["val"],
+        callbacks=[
+            lgb.early_stopping(EARLY_STOPPING, verbose=False),
+            _deadline_callback(deadline),
+        ],
+    )
+    pred = model.predict(X.iloc[test_idx], num_iteration=model.best_iteration or None)
+    return {
+        "fold": name,
+        "skipped": False,
+        "test_idx": test_idx,
+        "pred": pred,
+        "n_train": int(len(fit_idx)),
+        "n_val": int(len(val_idx)),
+        "best_iteration": int(model.best_iteration or model.current_iteration()),
+        "hit_deadline": time.time() > deadline,
+        "seconds": time.time() - t0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# metrics
+# ---------------------------------------------------------------------------
+
+
+METRIC_COLUMNS = ["n", "mae_log", "rmse_log", "mae_usd", "rmse_usd"]
+
+
+def error_metrics(
+    y_log: np.ndarray, p_log: np.ndarray, base: np.ndarray, kind: str
+) -> dict:
+    e = p_log - y_log
+    out = {
+        "n": int(len(e)),
+        "mae_log": float(np.mean(np.abs(e))),
+        "rmse_log": float(np.sqrt(np.mean(e**2))),
+    }
+    yd = _to_dollars(y_log, base, kind)
+    pd_ = _to_dollars(p_log, base, kind)
+    ok = np.isfinite(yd) & np.isfinite(pd_)
+    if ok.any():
+        ed = pd_[ok] - yd[ok]
+        out["mae_usd"] = float(np.mean(np.abs(ed)))
+        out["rmse_usd"] = float(np.sqrt(np.mean(ed**2)))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", choices=["baseline", "residual"], default="residual")
+    ap.add_argument(
+        "--data", default=None, help="defaults to the training script's file"
+    )
+    ap.add_argument(
+        "--scheme", choices=["spatial", "time", "spacetime"], default="spatial"
+    )
+    ap.add_argument("--block", choices=["zip", "grid"], default="zip")
+    ap.add_argument(
+        "--cell-deg", type=float, default=0.01, help="grid cell size (~1 km)"
+    )
+    ap.add_argument(
+        "--buffer", type=int, default=1, help="grid cells dropped around test cells"
+    )
+    ap.add_argument(
+        "--gap-months",
+        type=int,
+        default=0,
+        help="months left out before each test window",
+    )
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=0, help="0 = min(folds, cores)")
+    ap.add_argument(
+        "--cpu-budget-s",
+        type=float,
+        default=3600.0,
+        help="total CPU-seconds; the wall-clock budget is this divided by the cores used",
+    )
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    kind = args.model
+    data = str(args.data or DEFAULT_DATA[kind])
+    if not os.path.exists(data):
+        raise SystemExit(f"Cannot find {data}")
+    params = dict(tb.PARAMS if kind == "baseline" else tr.PARAMS)
+
+    cache = load_cached(kind, data, args.block, args.cell_deg)
+    df = pd.read_pickle(cache)
+    folds = list(
+        build_folds(
+            df,
+            args.scheme,
+            args.folds,
+            args.block,
+            args.buffer,
+            args.gap_months,
+            args.seed,
+        )
+    )
+    if not folds:
+        raise SystemExit("no usable folds; try fewer --folds")
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or min(len(folds), cores)
+    threads = max(1, cores // workers)
+    wall_budget = args.cpu_budget_s / (workers * threads)
+    deadline = time.time() + wall_budget
+    print(
+        f"[backtest] model={kind} scheme={args.scheme} block={args.block} folds={len(folds)} "
+        f"workers={workers} threads/worker={threads} wall budget={wall_budget:.0f}s"
+    )
+
+    results = []
+    t0 = time.time()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(str(cache),)
+    ) as pool:
+        futs = [
+            pool.submit(
+                run_fold,
+                kind,
+                name,
+                tr_idx,
+                te_idx,
+                params,
+                threads,
+                deadline,
+                args.seed + i,
+                args.scheme,
+            )
+            for i, (name, tr_idx, te_idx) in enumerate(folds)
+        ]
+        for f in as_completed(futs):
+            r = f.result()
+            results.append(r)
+            if r["skipped"]:
+                print(f"[fold] {r['fold']}: skipped (budget spent)")
+            else:
+                print(
+                    f"[fold] {r['fold']}: test={len(r['test_idx'])} iters={r['best_iteration']} {r['seconds']:.1f}s"
+                )
+
+    y = df["_y"].to_numpy(dtype=float)
+    base = df[META_BASE].to_numpy(dtype=float)
+    oof = np.full(len(df), np.nan)
+    fold_rows = []
+    for r in sorted(results, key=lambda r: r["fold"]):
+        if r["skipped"]:
+            fold_rows.append({"fold": r["fold"], "skipped": True})
+            continue
+        idx = r["test_idx"]
+        oof[idx] = r["pred"]
+        m = error_metrics(y[idx], r["pred"], base[idx], kind)
+        fold_rows.append(
+            {
+                "fold": r["fold"],
+                "skipped": False,
+                "n_train": r["n_train"],
+                "best_iteration": r["best_iteration"],
+                "hit_deadline": r["hit_deadline"],
+                "seconds": round(r["seconds"], 2),
+                **m,
+            }
+        )
+
+    scored = np.isfinite(oof)
+    hood_rows = []
+    for z, g in pd.Series(np.flatnonzero(scored)).groupby(
+        df[META_ZIP].to_numpy()[scored]
+    ):
+        idx = g.to_numpy()
+        hood_rows.append({"zip": z, **error_metrics(y[idx], oof[idx], base[idx], kind)})
+
+    overall = (
+        error_metrics(y[scored], oof[scored], base[scored], kind)
+        if scored.any()
+        else {}
+    )
+    out = Path(args.out) if args.out else OUT_DIR / f"{kind}-{args.scheme}-{args.block}"
+    out.mkdir(parents=True, exist_ok=True)
+    folds_df = pd.DataFrame(fold_rows)
+    # no rows when the budget skipped every fold; keep the header
+    hoods_df = pd.DataFrame(hood_rows, columns=["zip", *METRIC_COLUMNS])
+    hoods_df = hoods_df.sort_values("n", ascending=False)
+    folds_df.to_csv(out / "folds.csv", index=False)
+    hoods_df.to_csv(out / "neighbourhoods.csv", index=False)
+    summary = {
+        "model": kind,
+        "data": data,
+        "scheme": args.scheme,
+        "block": args.block,
+        "cell_deg": args.cell_deg if args.block == "grid" else None,
+        "buffer": args.buffer if args.block == "grid" else None,
+        "folds": len(folds),
+        "folds_skipped": sum(r["skipped"] for r in results),
+        "workers": workers,
+        "threads_per_worker": threads,
+        "wall_budget_s": wall_budget,
+        "wall_s": time.time() - t0,
+        "overall": overall,
+    }
+    with open(out / "summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print("\n[folds]")
+    print(folds_df.to_string(index=False))
+    print("\n[overall]", json.dumps(overall))
+    print(f"\nSaved folds.csv, neighbourhoods.csv, summary.json to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Out-of-core LightGBM input shared by the training scripts.
+
+`pd.read_csv` on the whole file followed by the scripts' cleaning copies
+peaks at several times the dataset size. Here each cleaned CSV chunk is
+encoded to float64 rows and appended to a spool file on disk; LightGBM
+then reads the spool through its `Sequence` interface (random access for
+bin sampling, then batch by batch) to build the binned Dataset. Resident
+memory is the binned Dataset plus one chunk, the spool pages are
+file-backed.
+
+Categorical columns are stored as their codes in a fixed category list
+(missing -> NaN), which is what LightGBM does with pandas categoricals;
+`attach_pandas_categorical` writes the same lists into the model file so
+the API can keep passing pandas categoricals at prediction time.
+"""
+
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+
+class MemmapSequence(lgb.Sequence):
+    """A float64 spool file viewed as a LightGBM Sequence."""
+
+    def __init__(self, X: np.ndarray, batch_size: int = 4096):
+        self.X = X
+        self.batch_size = batch_size
+
+    def __getitem__(self, idx):
+        return self.X[idx]
+
+    def __len__(self) -> int:
+        return self.X.shape[0]
+
+
+class RowSpool:
+    """Append-only float64 row matrix on disk, plus its labels in memory."""
+
+    def __init__(self, path: str, n_cols: int):
+        self.path = path
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self._f = open(path, "wb")
+        self._labels: List[np.ndarray] = []
+
+    def append(self, X: np.ndarray, y: np.ndarray) -> None:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.shape[1] != self.n_cols:
+            raise ValueError(f"chunk has {X.shape[1]} columns, spool has {self.n_cols}")
+        self._f.write(X.tobytes())
+        self._labels.append(np.asarray(y, dtype=np.float64))
+        self.n_rows += X.shape[0]
+
+    def close(self) -> Tuple[np.ndarray, np.ndarray]:
+        self._f.close()
+        if self.n_rows == 0:
+            raise ValueError(f"no rows were written to {self.path}")
+        X = np.memmap(
+            self.path, dtype=np.float64, mode="r", shape=(self.n_rows, self.n_cols)
+        )
+        return X, np.concatenate(self._labels)
+
+
+def encode_chunk(
+    df: pd.DataFrame, feature_cols: List[str], categories: Dict[str, list]
+) -> np.ndarray:
+    """Cleaned chunk -> float64 rows in feature_cols order."""
+    out = np.empty((len(df), len(feature_cols)), dtype=np.float64)
+    for j, c in enumerate(feature_cols):
+        if c not in df.columns:
+            out[:, j] = np.nan
+        elif c in categories:
+            codes = pd.Categorical(df[c], categories=categories[c]).codes.astype(
+                np.float64
+            )
+            codes[codes < 0] = np.nan
+            out[:, j] = codes
+        else:
+            out[:, j] = pd.to_numeric(df[c], errors="coerce").to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+    return out
+
+
+def build_datasets(
+    chunks: Iterable[Tuple[pd.DataFrame, pd.Series, np.ndarray]],
+    feature_cols: List[str],
+    categories: Dict[str, list],
+    spool_dir: Optional[str] = None,
+    batch_size: int = 4096,
+):
+    """Spool (X, y, is_val) chunks and build the train/val LightGBM Datasets.
+
+    Returns (dtrain, dval, X_val, y_val, spool_dir); X_val is the memmapped
+    validation matrix for scoring. The caller removes spool_dir when done.
+    """
+    spool_dir = spool_dir or tempfile.mkdtemp(prefix="lgb-spool-")
+    os.makedirs(spool_dir, exist_ok=True)
+    train = RowSpool(os.path.join(spool_dir, "train.f64"), len(feature_cols))
+    val = RowSpool(os.path.join(spool_dir, "val.f64"), len(feature_cols))
+
+    for df, y, is_val in chunks:
+        X = encode_chunk(df, feature_cols, categories)
+        y = np.asarray(y, dtype=np.float64)
+        train.append(X[~is_val], y[~is_val])
+        val.append(X[is_val], y[is_val])
+        print(f"[spool] train rows={train.n_rows} val rows={val.n_rows}", flush=True)
+
+    X_train, y_train = train.close()
+    X_val, y_val = val.close()
+
+    cat_feats = [c for c in feature_cols if c in categories]
+    dtrain = lgb.Dataset(
+        MemmapSequence(X_train, batch_size),
+        label=y_train,
+        feature_name=feature_cols,
+        categorical_feature=cat_feats,
+    )
+    dval = lgb.Dataset(
+        MemmapSequence(X_val, batch_size),
+        label=y_val,
+        feature_name=feature_cols,
+        categorical_feature=cat_feats,
+        reference=dtrain,
+    )
+    return dtrain, dval, X_val, y_val, spool_dir
+
+
+def attach_pandas_categorical(
+    booster: lgb.Booster, feature_cols: List[str], categories: Dict[str, list]
+) -> None:
+    """Record category lists so the saved model maps pandas categoricals
+    exactly as a model trained from a DataFrame would."""
+    booster.pandas_categorical = [
+        [v.item() if isinstance(v, np.generic) else v for v in categories[c]]
+        for c in feature_cols
+        if c in categories
+    ]
+
+
+def holdout_mask(ids: pd.Series, n_buckets: int) -> np.ndarray:
+    """Stable 1-in-n_buckets holdout by id hash (same rows on every run)."""
+    h = pd.util.hash_pandas_object(ids.astype(str), index=False).to_numpy()
+    return (h % n_buckets) == 0